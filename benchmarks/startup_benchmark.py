@@ -0,0 +1,57 @@
+"""
+Start-up time benchmark for the SMART entry points defined in main.py.
+Each entry point is run in a fresh interpreter, so that the import cost of the heavy dependencies (pandas, matplotlib,
+bayes_opt) is measured the same way a user would pay for it on the command line.
+
+Usage (from the main SMART_Project directory):
+    python benchmarks/startup_benchmark.py [entry_point ...]
+"""
+import os
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["run_estimator", "run_smapper", "run_compiler", "run_searcher"]
+HEAVY_MODULES = ["pandas", "matplotlib", "bayes_opt", "sklearn", "scipy"]
+
+TIMING_SCRIPT = """
+import sys, time, io, contextlib
+start = time.perf_counter()
+import main
+import_time = time.perf_counter() - start
+with contextlib.redirect_stdout(io.StringIO()):
+    main.{entry_point}()
+run_time = time.perf_counter() - start - import_time
+heavy = [m for m in {heavy_modules} if m in sys.modules]
+print(import_time, run_time, ",".join(heavy) if heavy else "-")
+"""
+
+
+def time_entry_point(entry_point: str):
+    """
+    Runs one entry point of main.py in a fresh Python interpreter and times it
+    :param entry_point: name of the run_* function in main.py
+    :return: tuple (import_time, run_time, heavy_modules_loaded) with times in seconds
+    """
+    script = TIMING_SCRIPT.format(entry_point=entry_point, heavy_modules=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, "Entry point %s failed:\n%s" % (entry_point, result.stderr)
+    import_time, run_time, heavy = result.stdout.strip().splitlines()[-1].split(" ")
+    return float(import_time), float(run_time), heavy
+
+
+def run_benchmark(entry_points=None):
+    """
+    Times each of the given entry points and prints out a summary table
+    :param entry_points: list of entry point names. None means all entry points in ENTRY_POINTS
+    :return: None. Prints results on terminal
+    """
+    entry_points = entry_points if entry_points else ENTRY_POINTS
+    print("%-15s %12s %12s   %s" % ("Entry point", "Import (s)", "Run (s)", "Heavy modules loaded"))
+    for entry_point in entry_points:
+        import_time, run_time, heavy = time_entry_point(entry_point)
+        print("%-15s %12.3f %12.3f   %s" % (entry_point, import_time, run_time, heavy))
+
+
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1:])
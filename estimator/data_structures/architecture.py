@@ -1,10 +1,8 @@
 from collections import OrderedDict
-from estimator.utils import write_as_file
+from estimator.utils import write_as_file, VersionedDict
 from estimator.data_structures.primitive_component import PrimitiveComponent
 from estimator.data_structures.compound_component import compound_component_library, CompoundComponent
 from estimator.input_handler import database_handler
-from copy import deepcopy
-from functools import lru_cache
 
 
 def flatten_architecture(yaml_data):
@@ -25,17 +23,21 @@ def flatten_architecture(yaml_data):
     return flattened_arch_array
 
 
-def yaml_arch_factory(yaml_data: OrderedDict):
+def yaml_arch_factory(yaml_data: OrderedDict, session=None):
     """
     Creates an architecture from YAML data
+    :param yaml_data: YAML OrderedDict of an architecture template
+    :param session: SmartSession providing the IPCL and compound component library. None means the globals
     :return: Architecture object from yaml
     """
+    db = session.database_handler if session else database_handler
+    library = session.compound_component_library if session else compound_component_library
     assert "architecture" in yaml_data.keys(), "Not an architecture template!"
     yaml_data = yaml_data['architecture']
     arch = Architecture()
     arch.name = yaml_data['name']
     arch.version = yaml_data['version'] if 'version' in yaml_data else 1.0
-    arch.component_dict = OrderedDict()  # Flattened Architecture, contains { Name : Component Object }
+    arch.component_dict = VersionedDict()  # Flattened Architecture, contains { Name : Component Object }
 
     # Expand subtrees
     flattened_arch = flatten_architecture(yaml_data)
@@ -44,12 +46,12 @@ def yaml_arch_factory(yaml_data: OrderedDict):
         item_class = item['class']
         item_arguments = item['arguments'] if 'arguments' in item else None
         # Check whether it is a primitive component or compound component
-        if database_handler.is_primitive_component(item_class):
-            arch.component_dict[item_name] = PrimitiveComponent(item_name, item_class, item_arguments)  # Create PC
+        if db.is_primitive_component(item_class):
+            arch.component_dict[item_name] = PrimitiveComponent(item_name, item_class, item_arguments, db)  # Create PC
         else:
             # Find item from compound component library
             # print("Not a primitive component", item)
-            arch.component_dict[item_name] = deepcopy(compound_component_library[item_class])
+            arch.component_dict[item_name] = library[item_class].snapshot()
             arch.component_dict[item_name].name = item_name
     return arch
 
@@ -64,19 +66,36 @@ class Architecture:
         # Check is an architecture template
         self.name = str()
         self.version = float()
-        self.component_dict = OrderedDict()
+        self.component_dict = VersionedDict()
         self.config_label = {}  # Add in a misc label parameter
+        self.class_cache, self.class_cache_version = OrderedDict(), None  # See get_component_class
 
     def __repr__(self):
         return f"<{self.name} v{self.version}> {self.config_label}"
 
-    @lru_cache(None)
+    def structure_version(self):
+        """
+        :return: Token that changes whenever the components of the architecture (recursively) change, but not when
+        only their arguments change
+        """
+        return self.component_dict.version, tuple(c.structure_version() for c in self.component_dict.values()
+                                                  if isinstance(c, CompoundComponent))
+
     def get_component_class(self, component_class):
         """
-        Returns all components inside the architecture of this component class (eg. intmac) as a dict(name:comp)
+        Returns all components inside the architecture of this component class (eg. intmac) as a dict(name:comp).
+        Cached until the structure_version changes
         :param component_class: Class of the component to be searched (eg. intmac, sram). Needs to be Primitive.
         :return: Dict (name:comp) of all occurrences of this primitive component inside the architecture
         """
+        version = self.structure_version()
+        if self.class_cache_version != version:
+            self.class_cache, self.class_cache_version = OrderedDict(), version
+        if component_class not in self.class_cache:
+            self.class_cache[component_class] = self.__get_component_class(component_class)
+        return self.class_cache[component_class]
+
+    def __get_component_class(self, component_class):
         out_dict = OrderedDict()
         for k, v in self.component_dict.items():
             if isinstance(v, PrimitiveComponent) and v.comp_class == component_class:
@@ -116,4 +135,7 @@ class Architecture:
         write_as_file(out_text, "test/output/%s_reference_table.txt" % table_type)
 
     def clear_cache(self):
-        self.get_component_class.cache_clear()
+        """
+        Not needed when components are replaced (see structure_version). Only for changes the cache cannot see
+        """
+        self.class_cache, self.class_cache_version = OrderedDict(), None
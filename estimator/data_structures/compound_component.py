@@ -1,20 +1,22 @@
 import os, re
 from collections import OrderedDict
 from estimator.input_handler import database_handler
+from estimator.library_watcher import LibraryWatcher
 from estimator.data_structures.primitive_component import PrimitiveComponent
-from estimator.utils import parse_method_notation, read_yaml_file
-from copy import deepcopy
-from functools import lru_cache
+from estimator.utils import parse_method_notation, read_yaml_file, VersionedDict
+from copy import copy
 
 compound_component_library = OrderedDict()  # Ordered Dict representing all Compound Components
 
 
 # Compound Component Loader
-def load_compound_components(path="project_io/estimator_input/components", instance_order_file="_instance_order.yaml"):
+def load_compound_components(path="project_io/estimator_input/components", instance_order_file="_instance_order.yaml",
+                             session=None):
     """
     Will initiate CC objects in the order listed in instance_order_file
     :param path: directory containing compound components descriptions
     :param instance_order_file: A YAML folder containing a specific order to instantiate the CCs
+    :param session: SmartSession to load the CCs into. None means the global compound_component_library
     :return: None. Compound Components loaded in compound_component_library
     """
     # Detect the instance order YAML file
@@ -31,49 +33,65 @@ def load_compound_components(path="project_io/estimator_input/components", insta
         if type(yaml_data) != OrderedDict or 'compound_component' not in yaml_data:
             print("Incorrect formatting of compound component! File %s: " % file)
             continue
-        compound_component_factory(yaml_data['compound_component'])
+        compound_component_factory(yaml_data['compound_component'], session)
 
 
-def compound_component_factory(yaml_data: OrderedDict):
+def watch_compound_components(path="project_io/estimator_input/components",
+                              instance_order_file="_instance_order.yaml", session=None):
+    """
+    Creates a LibraryWatcher for a folder already loaded with load_compound_components. Calling check() on it reloads
+    the changed compound components (and their dependents) into compound_component_library
+    :param path: directory containing compound components descriptions
+    :param instance_order_file: A YAML folder containing a specific order to instantiate the CCs
+    :param session: SmartSession the folder was loaded into. None means the global compound_component_library
+    :return: LibraryWatcher object
+    """
+    return LibraryWatcher(path, 'compound_component',
+                          lambda yaml_data: compound_component_factory(yaml_data['compound_component'], session),
+                          instance_order_file, session.database_handler if session else database_handler)
+
+
+def compound_component_factory(yaml_data: OrderedDict, session=None):
+    db = session.database_handler if session else database_handler
+    library = session.compound_component_library if session else compound_component_library
     cc = CompoundComponent()
     cc.name = yaml_data['name'] if 'name' in yaml_data else None
     cc.comp_class = yaml_data['class'] if 'class' in yaml_data else yaml_data['name']
     cc.component_arguments = yaml_data['arguments'] if 'arguments' in yaml_data else OrderedDict()
-    cc.subcomponents = OrderedDict()
+    cc.subcomponents = VersionedDict()
     cc.operations = OrderedDict()
 
     for subcomponent in yaml_data['subcomponents']:
         instances = subcomponent['instances'] if 'instances' in subcomponent else 1
         # Determine if subcomponent is a primitive_component
-        if database_handler.is_primitive_component(subcomponent['class']):
+        if db.is_primitive_component(subcomponent['class']):
             # Get the primitive component
             sc_args = subcomponent['arguments'] if 'arguments' in subcomponent else None
             if instances > 1:
                 sc_name = subcomponent['name']
                 comps = OrderedDict({sc_name + "_" + str(i):
-                                         PrimitiveComponent(sc_name + "_" + str(i), subcomponent['class'], sc_args)
+                                         PrimitiveComponent(sc_name + "_" + str(i), subcomponent['class'], sc_args, db)
                                      for i in range(instances)})
                 cc.subcomponents.update(comps)
             else:
-                comp = PrimitiveComponent(subcomponent['name'], subcomponent['class'], sc_args)
+                comp = PrimitiveComponent(subcomponent['name'], subcomponent['class'], sc_args, db)
                 cc.subcomponents[comp.name] = comp
         else:
             print("Compound Component Subcomponent Detected: %s " % subcomponent['class'])
             # Check if compound component in CCL
-            assert subcomponent['class'] in compound_component_library, "Compound Component %s Not Found. Check " \
-                                                                        "instance order" % subcomponent['class']
-            comp = deepcopy(compound_component_library[subcomponent['class']])
+            assert subcomponent['class'] in library, "Compound Component %s Not Found. Check " \
+                                                     "instance order" % subcomponent['class']
+            comp = library[subcomponent['class']].snapshot()
             sc_name = subcomponent['name']
             if instances > 1:
-                comps = OrderedDict({sc_name + "_" + str(i):
-                                         deepcopy(compound_component_library[subcomponent['class']])
+                comps = OrderedDict({sc_name + "_" + str(i): library[subcomponent['class']].snapshot()
                                      for i in range(instances)})
                 cc.subcomponents.update(comps)
             else:
                 comp.name = subcomponent['name']
                 cc.subcomponents[comp.name] = comp
 
-    compound_component_library[cc.comp_class] = cc
+    library[cc.comp_class] = cc
     cc.set_operations(yaml_data['operations'])
     return cc
 
@@ -83,18 +101,36 @@ class CompoundComponent:
     Describes a compound component. A compound component can have either primitive components or compound components
     as subcomponents
     """
+    stat_cache_counters = OrderedDict({"hits": 0, "misses": 0, "invalidations": 0})  # Of all the instances
 
     def __init__(self):
         self.name = str()
         self.comp_class = str()
         self.component_arguments = OrderedDict()
-        self.subcomponents = OrderedDict()
+        self.subcomponents = VersionedDict()
         self.operations = OrderedDict()
         self.config_label = {}  # Misc label parameter to keep track of whats what
+        # Stats and component class lookups, for the stat_version / structure_version they were computed at
+        self.stat_cache, self.stat_cache_version = OrderedDict(), None
+        self.class_cache, self.class_cache_version = OrderedDict(), None
 
     def __repr__(self):
         return f"<{self.name} {self.comp_class} Compound Component> {self.config_label}"
 
+    def snapshot(self):
+        """
+        Structurally shared copy of the compound component: its own subcomponent dict and config label, but the same
+        subcomponent objects and operations. Compound components are not changed in place once they are built (a
+        primitive subcomponent with other arguments is a new object, see PrimitiveComponent.with_arguments), so this
+        is used instead of a deep copy
+        :return: <Compound Component> object
+        """
+        cc = copy(self)
+        cc.subcomponents = VersionedDict(self.subcomponents)
+        cc.config_label = dict(self.config_label)
+        cc.clear_caches()
+        return cc
+
     def set_operations(self, operations_yaml):
         for op in operations_yaml:
             op_name = op['name']
@@ -116,16 +152,43 @@ class CompoundComponent:
             {op_name: self.calculate_operation_stat(op_name, table_type) for op_name in self.operations})
         return values
 
-    @lru_cache(None)
+    def stat_version(self):
+        """
+        :return: Token that changes whenever the stats of the compound component may change, ie. its subcomponents
+        (which ones, and their own stat versions)
+        """
+        return self.subcomponents.version, tuple(sc.stat_version() for sc in self.subcomponents.values())
+
+    def structure_version(self):
+        """
+        :return: Token that changes whenever the subcomponents of the compound component (recursively) change. Unlike
+        stat_version, it does not change with the arguments of the primitive components
+        """
+        return self.subcomponents.version, tuple(sc.structure_version() for sc in self.subcomponents.values()
+                                                 if isinstance(sc, CompoundComponent))
+
     def calculate_operation_stat(self, operation_name: str, feature: str,
                                  runtime_arg: tuple = None) -> float:
         """
-        Gets the reference stats for one operation only
+        Gets the reference stats for one operation only. Cached per compound component until its stat_version changes
         :param runtime_arg: runtime args from current level
         :param operation_name: name of the operation
         :param feature:  str indicating the type of table to be loaded. Possibilities include 'energy' 'area' 'cycle'
         :return: float value for the stat in question
         """
+        version = self.stat_version()
+        if self.stat_cache_version != version:
+            self.stat_cache, self.stat_cache_version = OrderedDict(), version
+            self.stat_cache_counters["invalidations"] += 1
+        key = (operation_name, feature, runtime_arg)
+        if key in self.stat_cache:
+            self.stat_cache_counters["hits"] += 1
+        else:
+            self.stat_cache_counters["misses"] += 1
+            self.stat_cache[key] = self.__calculate_operation_stat(operation_name, feature, runtime_arg)
+        return self.stat_cache[key]
+
+    def __calculate_operation_stat(self, operation_name, feature, runtime_arg):
         # Check that operation is valid
         assert operation_name in self.operations, "Invalid operation name %s" % operation_name
         runtime_arg = OrderedDict({*runtime_arg}) if runtime_arg else OrderedDict()
@@ -180,13 +243,21 @@ class CompoundComponent:
                 break
         return out_value
 
-    @lru_cache(None)
     def get_component_class(self, component_class):
         """
         Searches for the primitive component 'component class' within the subcomponents of the compound component.
+        Cached until the structure_version changes
         :param component_class: Primitive component to be searched for
         :return: Dict (name:comp) of all occurrences of this primitive component inside this component
         """
+        version = self.structure_version()
+        if self.class_cache_version != version:
+            self.class_cache, self.class_cache_version = OrderedDict(), version
+        if component_class not in self.class_cache:
+            self.class_cache[component_class] = self.__get_component_class(component_class)
+        return self.class_cache[component_class]
+
+    def __get_component_class(self, component_class):
         out_dict = OrderedDict()
         for k, v in self.subcomponents.items():
             if isinstance(v, PrimitiveComponent) and v.comp_class == component_class:
@@ -196,8 +267,12 @@ class CompoundComponent:
         return out_dict
 
     def clear_caches(self):
-        self.get_component_class.cache_clear()
-        self.calculate_operation_stat.cache_clear()
+        """
+        Not needed when the subcomponents or their arguments change (see stat_version). Only for changes the caches
+        cannot see, eg. to the operations
+        """
+        self.stat_cache, self.stat_cache_version = OrderedDict(), None
+        self.class_cache, self.class_cache_version = OrderedDict(), None
 
 
 
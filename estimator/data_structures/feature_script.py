@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from functools import lru_cache
 
 """
 Provides a sandbox environment in order to run the exec() script on values in the database
@@ -10,6 +11,16 @@ ILLEGAL = ["open", "import", "exec", "eval", "compile", "__", "exit", "locals",
            "class ", "super", "object", "del ", "del\\", "delattr", "input", "dir", "self", "assert"]
 
 
+@lru_cache(None)
+def compile_script(script: str):
+    """
+    Compiles a formatted FeatureScript once per process, so that identical scripts share one code object
+    :param script: Formatted script, see FeatureScript constructor
+    :return: code object
+    """
+    return compile(script, "<FeatureScript>", "exec")
+
+
 class FeatureScript:
     """
     FeatureScript is a wrapper around a Python script as read in from the database. It cleans the script before
@@ -51,23 +62,38 @@ class FeatureScript:
         assert (self.check_is_clean(script))
         self.script = "def script({0}):\n\t{1}".format(",".join(arg_array), "\n\t".join(
             script.replace("\r", "").split("\n")) + "\nout_var = script(" + ",".join(arg_array) + ")")
+        # Compile once, so that each execute() only runs the code object instead of re-parsing the script
+        self.code = compile_script(self.script)
 
     def __repr__(self):
         return "Script with default args: " + str(self.default_values)
 
+    def __getstate__(self):
+        # Code objects cannot be pickled (eg. when an Architecture is sent to a worker process). Recompiled on load.
+        # default_values is a class attribute, so it is not in __dict__: a spawned worker would not have its values
+        state = self.__dict__.copy()
+        state.pop('code', None)
+        state['default_values'] = self.default_values
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.code = compile_script(self.script)
+
     def execute(self, runtime_args: OrderedDict = None):
         """
-        Executes the script once. Because script exec() happens in an object method, all local variables
-        created here are destroyed at the end of the method
+        Executes the script once. The script runs in its own variable dict, so all variables created here are
+        destroyed at the end of the method
         :return: out_var as defined in the script. See Constructor above
         """
         # print("Runtime args:", runtime_args)
         # Parse in runtime arguments and create local variables
+        script_variables = dict()
         for arg in self.default_values:
             value = runtime_args[arg] if (runtime_args and arg in runtime_args) else self.default_values[arg]
             # Check cleanliness again
             assert (self.check_is_clean(arg) and self.check_is_clean(value))
             if str(arg).strip() and str(value).strip():
-                exec(str(arg) + " = " + str(value))
-        exec(self.script)
-        return locals()['out_var']
\ No newline at end of file
+                exec(str(arg) + " = " + str(value), script_variables)
+        exec(self.code, script_variables)
+        return script_variables['out_var']
\ No newline at end of file
@@ -1,6 +1,7 @@
-from functools import lru_cache
 from estimator.input_handler import database_handler
+from estimator.utils import VersionedDict
 from collections import OrderedDict
+from copy import copy
 import time
 
 
@@ -9,23 +10,27 @@ class PrimitiveComponent:
     Describes each individual primitive component.
     Scripts is a nested dict(), Feature (Energy) -> Operation (Read) -> FeatureScript
     """
+    stat_cache_counters = OrderedDict({"hits": 0, "misses": 0, "invalidations": 0})  # Of all the instances
 
-    def __init__(self, name: str, comp_class: str, comp_arguments=None):
+    def __init__(self, name: str, comp_class: str, comp_arguments=None, db=None):
         """
         Constructor for a component object.
         :param name: The given name of the component
         :param comp_class: The class of the component. Corresponds to ComponentName in Database
+        :param db: DatabaseHandler to read the IPCL from (eg. a SmartSession's). None means the global database_handler
         """
+        db = db if db else database_handler
         self.scripts = {"energy": OrderedDict(), "area": OrderedDict(), "cycle": OrderedDict()}
         self.name = name
         self.comp_class = comp_class
         # Get the default arguments, then override
         user_args = comp_arguments if comp_arguments else OrderedDict()
-        self.comp_args = OrderedDict({**database_handler.get_default_arguments(self.comp_class), **user_args})
+        self.comp_args = VersionedDict({**db.get_default_arguments(self.comp_class), **user_args})
+        self.stat_cache = OrderedDict()  # (operation, table type, runtime args) : value, for stat_cache_version
+        self.stat_cache_version = self.comp_args.version
         for feature in self.scripts:
-            self.scripts[feature] = database_handler.get_component_feature(self.comp_class, feature,
-                                                                           list(self.comp_args.keys()),
-                                                                           list(self.comp_args.values()))
+            self.scripts[feature] = db.get_component_feature(self.comp_class, feature, list(self.comp_args.keys()),
+                                                             list(self.comp_args.values()))
         # print(self.name, self.comp_args)
 
     def __repr__(self):
@@ -41,20 +46,52 @@ class PrimitiveComponent:
         values = OrderedDict({op: self.calculate_operation_stat(op, feature) for op in self.scripts[feature]})
         return values
 
-    @lru_cache(None)
+    def stat_version(self):
+        """
+        :return: Token that changes whenever the stats of the component may change, ie. its arguments
+        """
+        return self.comp_args.version
+
+    def with_arguments(self, arguments):
+        """
+        Copy-on-write alternative to setting comp_args: a copy of the component with some arguments changed. The
+        scripts are shared with this component, which is left unchanged
+        :param arguments: dict {argument: value}
+        :return: <Primitive Component> object. This component itself if no argument changes
+        """
+        if all(k in self.comp_args and self.comp_args[k] == v for k, v in arguments.items()):
+            return self
+        component = copy(self)
+        component.comp_args = VersionedDict(self.comp_args)
+        component.comp_args.update(arguments)
+        component.stat_cache, component.stat_cache_version = OrderedDict(), component.comp_args.version
+        return component
+
     def calculate_operation_stat(self, operation_name: str, table_type: str,
                                  runtime_arg: tuple = None) -> float:
         """
-        Gets the reference stats for one operation only
+        Gets the reference stats for one operation only. Cached per component until its arguments change
         :param runtime_arg: runtime args
         :param operation_name: name of the operation
         :param table_type:  str indicating the type of table to be loaded.
         Possibilities include 'energy' 'area' 'cycle'
         :return: float value for the stat in question
         """
-        runtime_arg = runtime_arg if runtime_arg else tuple()
-        merged_args = OrderedDict({**self.comp_args, **dict({*runtime_arg})})
-        return self.scripts[table_type][operation_name].execute(merged_args)
+        if self.stat_cache_version is not self.comp_args.version:
+            self.stat_cache = OrderedDict()
+            self.stat_cache_version = self.comp_args.version
+            self.stat_cache_counters["invalidations"] += 1
+        key = (operation_name, table_type, runtime_arg)
+        if key in self.stat_cache:
+            self.stat_cache_counters["hits"] += 1
+        else:
+            self.stat_cache_counters["misses"] += 1
+            merged_args = OrderedDict({**self.comp_args, **dict({*runtime_arg})}) if runtime_arg else self.comp_args
+            self.stat_cache[key] = self.scripts[table_type][operation_name].execute(merged_args)
+        return self.stat_cache[key]
 
     def clear_cache(self):
-        self.calculate_operation_stat.cache_clear()
+        """
+        Not needed when the arguments change (see stat_version). Only for changes the cache cannot see
+        """
+        self.stat_cache = OrderedDict()
@@ -1,24 +1,31 @@
 from collections import OrderedDict
 from copy import deepcopy
-import pandas as pd
-import matplotlib.pyplot as plot
+from numbers import Integral
 import time, os
 from estimator.data_structures.architecture import yaml_arch_factory, Architecture
-from estimator.data_structures.compound_component import load_compound_components
+from estimator.session import default_session
 from estimator.input_handler import *
 
 # DEFAULT_DB_PATH = "estimator/database/intelligent_primitive_component_library.db"
 
+FEATURE_UNITS = {'energy': 'pJ', 'area': 'um^2', 'cycle': 'cycles'}
 
-def estimator_factory(arch_path: str, op_path: str, db_table, components_folder):
+
+def estimator_factory(arch_path: str, op_path: str, db_table, components_folder, session=None):
+    """
+    Creates an Estimator from an architecture file and an operations file
+    :param session: SmartSession to load the IPCL table and compound components into. None means default_session
+    :return: Estimator object
+    """
+    session = session if session else default_session
     # Primitive Components in IPCL
     if db_table:
-        database_handler.set_ipcl_table(db_table)
+        session.set_ipcl_table(db_table)
     # Compound Components in CC Folder
     if components_folder:
-        load_compound_components(components_folder)
+        session.load_compound_components(components_folder)
     # Architecture + Operations from two files
-    architecture = yaml_arch_factory(read_yaml_file(arch_path))
+    architecture = yaml_arch_factory(read_yaml_file(arch_path), session)
     operation_list = read_yaml_file(op_path)['operations']
     return Estimator(architecture, operation_list)
 
@@ -41,55 +48,73 @@ class Estimator:
         out_dir = out_dir if out_dir else self.out_dir
         out = []
         for f in features:
-            out.append(self.__estimate_feature(f, out_dir, analysis))
+            report = self.__estimate_feature(f)
+            if analysis:
+                report.write(out_dir)
+            out.append(report.total)
         return tuple(out)
 
-    def __estimate_feature(self, feature: str, out_dir, analysis=True):
+    def build_reports(self, features: list):
         """
-        Prints out energy estimation according to ERT values and operation dict. Key algorithm for Phase 1
-        :return: None
+        Estimates the features without writing anything, so that the reports can be kept and written later (see
+        FeatureReport.write)
+        :return: OrderedDict {feature: FeatureReport}
+        """
+        return OrderedDict((f, self.__estimate_feature(f)) for f in features)
+
+    def __estimate_feature(self, feature: str):
+        """
+        Estimation of one feature according to ERT values and operation dict. Key algorithm for Phase 1
+        :return: FeatureReport object
         """
         # Check if there is an operation dict available first
         assert self.operation_list is not None, "No operation count database available to conduct estimation."
         assert feature in ('energy', 'area', 'cycle'), "Error in feature definition"
         component_dict = self.architecture.component_dict
-        out_file = os.path.join(out_dir, "%s_estimation.txt" % feature)
-        csv_dir = os.path.join(out_dir, "%s_estimation_matrix.csv" % feature)
-        png_dir = os.path.join(out_dir, "%s_pie_chart_breakdown.png" % feature)
-        units = {'energy': 'pJ', 'area': 'um^2', 'cycle': 'cycles'}
         arch_total_feature = 0
-        # Dataframe with Rows = component, Columns = Operation, with a 'total' row at the bottom
+        # Component-Operation Matrix as { component : [value per operation] }, with a 'total' row at the bottom.
+        # Kept as plain lists so that pandas is only needed when exporting the matrix to CSV
         total_row = 'total'
-        comp_op_matrix = pd.DataFrame({**{c: [v.calculate_operation_stat('idle', feature)] *
-                                             len(self.operation_list) for c, v in component_dict.items()},
-                                       total_row: [0] * len(self.operation_list)}).transpose()
+        op_count = len(self.operation_list)
+        idle_values = OrderedDict((c, v.calculate_operation_stat('idle', feature)) for c, v in component_dict.items())
+        # Like the columns of a DataFrame, the matrix holds integers (eg. cycles) unless an idle value is a float, and
+        # every value stored into it is cast to that type
+        cell_type = int if all(isinstance(v, Integral) for v in idle_values.values()) else float
+        comp_op_matrix = OrderedDict({**{c: [cell_type(v)] * op_count for c, v in idle_values.items()},
+                                      total_row: [cell_type(0)] * op_count})
+
+        def column(index):
+            return [row[index] for row in comp_op_matrix.values()]
+
+        def store(row_name, index, value):
+            comp_op_matrix[row_name][index] = cell_type(value)
+
         op_type_map = OrderedDict()
         out_text = ""
         out_text += get_SMART_logo() + "\n"
         out_text += "===== %s Estimation ======\n" % feature.capitalize()
-        for operation_index in comp_op_matrix.columns:
+        for operation_index in range(op_count):
             operation = self.operation_list[operation_index]
             # If is an area feature, then should not be multiplied (since area independent of operation count)
             repeat = 1 if 'operation-times' not in operation or feature == "area" else operation['operation-times']
             # Multiply by count. Eg. if component idle for 32 cycles, then total idle energy should be 32 * idle energy
-            comp_op_matrix.loc[:][operation_index] *= repeat
+            for row_name, row in comp_op_matrix.items():
+                store(row_name, operation_index, row[operation_index] * repeat)
             op_type = operation['type']
             op_type_map[operation_index] = op_type
             if op_type == "serial":
                 obj, method, arg = parse_method_notation(operation['operation']).values()
                 data = component_dict[obj].calculate_operation_stat(method, feature, tuple(arg.items()))
-                comp_op_matrix.loc[obj][operation_index] = data * repeat
-                data_list = list(comp_op_matrix[:][operation_index])
-                comp_op_matrix.loc[total_row][operation_index] = \
-                    max(data_list) if feature == 'cycle' else sum(data_list)
+                store(obj, operation_index, data * repeat)
+                data_list = column(operation_index)
+                store(total_row, operation_index, max(data_list) if feature == 'cycle' else sum(data_list))
             elif op_type == "parallel":
                 for i in operation['operations']:
                     obj, method, arg = parse_method_notation(i).values()
                     data = component_dict[obj].calculate_operation_stat(method, feature, tuple(arg.items()))
-                    comp_op_matrix.loc[obj][operation_index] = data * repeat
-                    data_list = list(comp_op_matrix[:][operation_index])
-                    comp_op_matrix.loc[total_row][operation_index] = \
-                        max(data_list) if feature == 'cycle' else sum(data_list)
+                    store(obj, operation_index, data * repeat)
+                    data_list = column(operation_index)
+                    store(total_row, operation_index, max(data_list) if feature == 'cycle' else sum(data_list))
             elif op_type == "pipeline":
                 stages = operation['stages']
                 active_cycles = {c: 0 for c in component_dict.keys()}
@@ -106,48 +131,67 @@ class Estimator:
                     stage_stride = 1 if 'stride' not in stage else stage['stride']
                     total_offset += stage_offset
                     current_len = total_offset + (stage_stride * stage_count * stage_cycles)
-                    # print(f"currentlen: {current_len}")
                     total_cycles = current_len if current_len > total_cycles else total_cycles
-                    # print(total_cycles)
                     # Update the active operations
                     if active_cycles[obj] == 0:  # Currently only has idle energy
-                        comp_op_matrix.loc[obj][operation_index] = int(data * stage_count) * repeat
+                        store(obj, operation_index, int(data * stage_count) * repeat)
                     else:
-                        comp_op_matrix.loc[obj][operation_index] += int(data * stage_count) * repeat
+                        store(obj, operation_index, comp_op_matrix[obj][operation_index] +
+                              int(data * stage_count) * repeat)
                     active_cycles[obj] += stage_cycles * stage_count
                 if feature == "cycle":
-                    comp_op_matrix.loc[total_row][operation_index] = total_cycles * repeat
+                    store(total_row, operation_index, total_cycles * repeat)
                 elif feature == "energy":
                     # Add on the idle energy
-                    for k, v in comp_op_matrix.iterrows():
+                    for k, row in comp_op_matrix.items():
                         if k == total_row:
                             continue
                         idle_cycles = total_cycles - active_cycles[k]
                         idle_energy = component_dict[k].calculate_operation_stat('idle', 'energy')
-                        comp_op_matrix.loc[k][operation_index] += idle_energy * idle_cycles * repeat
+                        store(k, operation_index, row[operation_index] + idle_energy * idle_cycles * repeat)
                     # Calculate the sum, and place it in the total row
-                    data_list = list(comp_op_matrix.loc[:][operation_index])
-                    comp_op_matrix.loc[total_row][operation_index] = sum(data_list)
+                    store(total_row, operation_index, sum(column(operation_index)))
                 elif feature == "area":
-                    data_list = list(comp_op_matrix.loc[:][operation_index])
-                    comp_op_matrix.loc[total_row][operation_index] = sum(data_list)
+                    store(total_row, operation_index, sum(column(operation_index)))
         # Component Breakdowns
-        component_feature_dict = OrderedDict({k: v[0] for k, v in comp_op_matrix.iterrows()}) if feature == "area" \
-            else OrderedDict({k: sum(v) for k, v in comp_op_matrix.iterrows()})
-        arch_total_feature = comp_op_matrix.loc[total_row][0].sum() if feature == "area" \
-            else comp_op_matrix.loc[total_row][:].sum()
+        component_feature_dict = OrderedDict({k: v[0] for k, v in comp_op_matrix.items()}) if feature == "area" \
+            else OrderedDict({k: sum(v) for k, v in comp_op_matrix.items()})
+        arch_total_feature = comp_op_matrix[total_row][0] if feature == "area" \
+            else sum(comp_op_matrix[total_row])
         component_feature_dict.pop(total_row)  # Remove the total row
-        out_text += "\n".join([f"\tComponent: {comp}\n\tValue: {val} {units[feature]}\n"
+        out_text += "\n".join([f"\tComponent: {comp}\n\tValue: {val} {FEATURE_UNITS[feature]}\n"
                                for comp, val in component_feature_dict.items()])
         out_text += "\n" + ("=" * 20) + "\n"
         out_text += "Total %s Estimation: %s %s" % (feature.capitalize(),
-                                                    round(arch_total_feature, 5), units[feature]) + "\n"
-        if analysis:
-            # print(out_text)
-            plot.pie(x=component_feature_dict.values(), labels=component_feature_dict.keys(), autopct='%1.1f%%')
-            plot.title(f"Component Breakdown for {feature.capitalize()} (Unit: {units[feature]})")
-            plot.savefig(png_dir)
-            plot.close()
-            comp_op_matrix.to_csv(csv_dir)
-            write_as_file(out_text, out_file)
-        return arch_total_feature
+                                                    round(arch_total_feature, 5), FEATURE_UNITS[feature]) + "\n"
+        return FeatureReport(feature, comp_op_matrix, component_feature_dict, arch_total_feature, out_text)
+
+
+class FeatureReport:
+    """
+    Estimation of one feature: the Component-Operation matrix, the breakdown per component, the total and the text
+    report. Only holds plain lists, dicts and strings, so it can be kept after a search or sent to another process
+    """
+
+    def __init__(self, feature, comp_op_matrix, component_feature_dict, total, out_text):
+        self.feature = feature
+        self.comp_op_matrix = comp_op_matrix
+        self.component_feature_dict = component_feature_dict
+        self.total = total
+        self.out_text = out_text
+
+    def write(self, out_dir):
+        """
+        Writes the text report, the Component-Operation matrix (CSV) and the breakdown pie chart into out_dir
+        :return: None
+        """
+        # Plotting and CSV export are only needed for analysis, so import them here to keep start-up light
+        import matplotlib.pyplot as plot
+        import pandas as pd
+        plot.pie(x=self.component_feature_dict.values(), labels=self.component_feature_dict.keys(), autopct='%1.1f%%')
+        plot.title(f"Component Breakdown for {self.feature.capitalize()} (Unit: {FEATURE_UNITS[self.feature]})")
+        plot.savefig(os.path.join(out_dir, "%s_pie_chart_breakdown.png" % self.feature))
+        plot.close()
+        pd.DataFrame(self.comp_op_matrix).transpose().to_csv(os.path.join(out_dir,
+                                                                          "%s_estimation_matrix.csv" % self.feature))
+        write_as_file(self.out_text, os.path.join(out_dir, "%s_estimation.txt" % self.feature))
@@ -1,6 +1,5 @@
 import sqlite3, yaml, yamlordereddictloader
 from collections import OrderedDict
-from functools import lru_cache
 
 from estimator.data_structures.feature_script import FeatureScript
 from estimator.utils import *
@@ -19,6 +18,18 @@ class DatabaseHandler:
         self.connection = sqlite3.connect(db_path)
         self.cursor = self.connection.cursor()
         self.table = db_table if db_table else "PrimitiveComponents"
+        # Lookups of the current table, per handler: clearing them (see clear_cache) does not affect other sessions
+        self.primitive_component_cache = dict()  # Component name : whether it is a primitive component
+        self.default_arguments_cache = dict()  # Component name : {argument: default value}
+
+    def reconnect(self):
+        """
+        Opens a new SQLite connection to the same database. SQLite connections must not be shared across processes,
+        so a forked worker process should call this before its first query
+        :return: None
+        """
+        self.connection = sqlite3.connect(self.db_path)
+        self.cursor = self.connection.cursor()
 
     def set_ipcl_table(self, table_name: str):
         """
@@ -26,6 +37,8 @@ class DatabaseHandler:
         :param table_name: table to be set to
         :return: None
         """
+        if table_name != self.table:
+            self.clear_cache()  # The cached lookups below are only valid for one table
         self.table = table_name
 
     def get_component_feature(self, component_name, feature, args, vals):
@@ -44,25 +57,47 @@ class DatabaseHandler:
             action_dict[action] = FeatureScript(function, args, vals)
         return action_dict
 
-    @lru_cache(None)
     def is_primitive_component(self, component_name: str):
         """
         Checks if component_name is a primitive component as defined in DB
         :param component_name: component to be checked
         :return: Boolean whether in IPCL
         """
-        sql_results = self.cursor.execute("SELECT ComponentName FROM %s " % self.table +
-                                          "WHERE ComponentName = \"%s\"" % component_name)
-        return len(sql_results.fetchall()) != 0
+        if component_name not in self.primitive_component_cache:
+            sql_results = self.cursor.execute("SELECT ComponentName FROM %s " % self.table +
+                                              "WHERE ComponentName = \"%s\"" % component_name)
+            self.primitive_component_cache[component_name] = len(sql_results.fetchall()) != 0
+        return self.primitive_component_cache[component_name]
 
-    @lru_cache(None)
     def get_default_arguments(self, component_name):
-        sql_results = self.cursor.execute(f"SELECT Arguments, DefaultValues FROM {self.table} "
-                                          f"WHERE ComponentName = \"{component_name}\"")
+        if component_name not in self.default_arguments_cache:
+            sql_results = self.cursor.execute(f"SELECT Arguments, DefaultValues FROM {self.table} "
+                                              f"WHERE ComponentName = \"{component_name}\"")
+            args, vals = sql_results.fetchone()
+            args_list, vals_list = parse_as_list(args), parse_as_list(vals)
+            self.default_arguments_cache[component_name] = {args_list[i]: vals_list[i] for i in range(len(args_list))}
+        return self.default_arguments_cache[component_name]
 
-        args, vals = sql_results.fetchone()
-        args_list, vals_list = parse_as_list(args), parse_as_list(vals)
-        return {args_list[i]: vals_list[i] for i in range(len(args_list))}
+    def get_table_snapshot(self):
+        """
+        Gets a fingerprint of every primitive component in the current table, used to detect changes in the IPCL
+        :return: dict {ComponentName : hash of all of its rows}
+        """
+        sql_results = self.cursor.execute("SELECT ComponentName, Action, Arguments, DefaultValues, EnergyFunction, "
+                                          "AreaFunction, CycleFunction FROM \"%s\" ORDER BY ComponentName, Action"
+                                          % self.table)
+        rows = OrderedDict()
+        for row in sql_results.fetchall():
+            rows.setdefault(row[0], []).append(row)
+        return {name: hash(tuple(comp_rows)) for name, comp_rows in rows.items()}
+
+    def clear_cache(self):
+        """
+        Forgets the lookups of this handler only, eg. after its table changed
+        :return: None
+        """
+        self.primitive_component_cache.clear()
+        self.default_arguments_cache.clear()
 
 
 database_handler = DatabaseHandler()
\ No newline at end of file
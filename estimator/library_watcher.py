@@ -0,0 +1,105 @@
+import os
+from collections import OrderedDict
+from estimator.input_handler import database_handler
+from estimator.utils import read_yaml_file
+
+"""
+Change detection for long-running processes (eg. the batch runner or the SMART server). A LibraryWatcher remembers
+the state of a (meta) compound components folder and of the IPCL database, and on check() reloads only the compound
+components that changed, plus the ones that depend on them, in the order given by _instance_order.yaml
+"""
+
+
+class LibraryWatcher:
+    """
+    Watches a (meta) compound components folder and the IPCL table used to build it
+    """
+
+    def __init__(self, path, yaml_key, factory, instance_order_file="_instance_order.yaml", db=None):
+        """
+        Takes a snapshot of the folder and IPCL. The library is assumed to be already loaded from this folder
+        :param path: directory containing the compound component descriptions
+        :param yaml_key: top level key of each file, 'compound_component' or 'meta_compound_component'
+        :param factory: function(yaml_data) that creates a component from a whole file and puts it in its library
+        :param instance_order_file: YAML file listing the order to instantiate the components in
+        :param db: DatabaseHandler the components are built from. None means the global database_handler
+        """
+        self.path = path
+        self.yaml_key = yaml_key
+        self.factory = factory
+        self.instance_order_file = instance_order_file
+        self.db = db if db else database_handler
+        self.load_order = []
+        self.file_mtimes = dict()  # file : mtime, including the instance order file
+        self.file_classes = dict()  # file : (class of the component, classes of its subcomponents)
+        self.db_mtime, self.db_table = None, None
+        self.db_snapshot = dict()  # primitive class : hash of its IPCL rows
+        self.reloads = 0
+        self.snapshot()
+
+    def get_load_order(self):
+        if self.instance_order_file in os.listdir(self.path):
+            return list(read_yaml_file(os.path.join(self.path, self.instance_order_file)))
+        return sorted(os.listdir(self.path))
+
+    def get_mtimes(self, load_order):
+        files = load_order + [self.instance_order_file] if self.instance_order_file in os.listdir(self.path) \
+            else load_order
+        return {f: os.path.getmtime(os.path.join(self.path, f)) for f in files}
+
+    def snapshot(self):
+        """
+        Records the current state of the folder and IPCL table
+        :return: None
+        """
+        self.load_order = self.get_load_order()
+        self.file_mtimes = self.get_mtimes(self.load_order)
+        self.file_classes = {f: self.__read_classes(f) for f in self.load_order}
+        self.db_mtime, self.db_table = os.path.getmtime(self.db.db_path), self.db.table
+        self.db_snapshot = self.db.get_table_snapshot()
+
+    def check(self):
+        """
+        Detects changes to the component files and IPCL since the last check, and reloads the affected components.
+        A component is affected if its own file changed, or if any of its subcomponents (compound or primitive)
+        changed. Since dependents are listed after their subcomponents in the instance order, one pass in that order
+        also reloads the dependents of dependents.
+        :return: set of the changed classes (reloaded compound components + changed primitive components). Empty set
+        if nothing changed
+        """
+        changed_classes = set()
+        # IPCL: only compare the table contents if the database file was modified or the table was switched
+        db_mtime = os.path.getmtime(self.db.db_path)
+        if db_mtime != self.db_mtime or self.db.table != self.db_table:
+            db_snapshot = self.db.get_table_snapshot()
+            changed_classes.update(c for c in set(db_snapshot) | set(self.db_snapshot)
+                                   if db_snapshot.get(c) != self.db_snapshot.get(c))
+            self.db_mtime, self.db_table, self.db_snapshot = db_mtime, self.db.table, db_snapshot
+            if changed_classes:
+                self.db.clear_cache()
+        # Component files. A new instance order means the whole folder is reloaded
+        load_order = self.get_load_order()
+        mtimes = self.get_mtimes(load_order)
+        structural_change = load_order != self.load_order or \
+            mtimes.get(self.instance_order_file) != self.file_mtimes.get(self.instance_order_file)
+        changed_files = set(f for f in load_order if mtimes[f] != self.file_mtimes.get(f))
+        for file in load_order:
+            if file in changed_files or structural_change:
+                self.file_classes[file] = self.__read_classes(file)
+            if file not in self.file_classes or self.file_classes[file] is None:
+                continue
+            cc_class, subcomponent_classes = self.file_classes[file]
+            if file in changed_files or structural_change or changed_classes.intersection(subcomponent_classes):
+                self.factory(read_yaml_file(os.path.join(self.path, file)))
+                changed_classes.add(cc_class)
+                self.reloads += 1
+        self.load_order, self.file_mtimes = load_order, mtimes
+        return changed_classes
+
+    def __read_classes(self, file):
+        yaml_data = read_yaml_file(os.path.join(self.path, file))
+        if type(yaml_data) != OrderedDict or self.yaml_key not in yaml_data:
+            return None  # Not a component file, same as the library loaders
+        yaml_data = yaml_data[self.yaml_key]
+        cc_class = yaml_data['class'] if 'class' in yaml_data else yaml_data['name']
+        return cc_class, set(sc['class'] for sc in yaml_data['subcomponents'])
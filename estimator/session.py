@@ -0,0 +1,151 @@
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from estimator.input_handler import DatabaseHandler, database_handler, DEFAULT_DB_PATH, DEFAULT_TABLE
+from estimator.data_structures.compound_component import compound_component_library, load_compound_components, \
+    watch_compound_components
+
+"""
+A SmartSession owns everything that used to be process-wide: the IPCL handle, the compound component library and the
+meta compound component library. Passing a session to yaml_arch_factory, estimator_factory, Smapper or Searcher lets
+architectures built from different component folders (or IPCL tables) live in the same process. Code that does not pass
+a session uses default_session, whose libraries are the module globals, so existing scripts behave as before.
+"""
+
+
+class SmartSession:
+    """
+    Context object holding one IPCL connection and the component libraries built from it
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, db_table=DEFAULT_TABLE, handler=None, cc_library=None,
+                 meta_cc_library=None):
+        """
+        :param db_path: Path of the IPCL SQLite database. Ignored if a handler is given
+        :param db_table: IPCL table to read primitive components from. Ignored if a handler is given
+        :param handler: Existing DatabaseHandler to use instead of opening a new connection
+        :param cc_library: Existing compound component library (OrderedDict) to use. None means an empty library
+        :param meta_cc_library: Existing meta compound component library (OrderedDict). None means an empty library
+        """
+        self.database_handler = handler if handler else DatabaseHandler(db_path, db_table)
+        self.compound_component_library = cc_library if cc_library is not None else OrderedDict()
+        self.meta_compound_component_library = meta_cc_library if meta_cc_library is not None else OrderedDict()
+        self.sources = []  # (library, folder, instance order file) loaded through this session, in order
+        self.start_method = None  # multiprocessing start method of process_pool(). None means fork where available
+
+    def __repr__(self):
+        return f"<SmartSession {self.database_handler.table}> {[s[1] for s in self.sources]}"
+
+    def __deepcopy__(self, memo):
+        # Components and meta components keep a reference to their session. Copying them must not copy the session
+        return self
+
+    def __getstate__(self):
+        # A session is pickled as its recipe (IPCL + loaded folders), and rebuilt from it when unpickled. SQLite
+        # connections and the compiled FeatureScripts cannot be pickled
+        return {"db_path": self.database_handler.db_path, "db_table": self.database_handler.table,
+                "sources": self.sources}
+
+    def __setstate__(self, state):
+        self.__init__(state["db_path"], state["db_table"])
+        for library, folder, instance_order_file in state["sources"]:
+            self.load_library(library, folder, instance_order_file)
+
+    def set_ipcl_table(self, table_name: str):
+        self.database_handler.set_ipcl_table(table_name)
+
+    def load_compound_components(self, path, instance_order_file="_instance_order.yaml"):
+        """
+        Loads a compound components folder into this session's compound component library
+        :param path: directory containing compound components descriptions
+        :param instance_order_file: A YAML folder containing a specific order to instantiate the CCs
+        :return: None
+        """
+        self.load_library("compound_component", path, instance_order_file)
+
+    def load_meta_compound_components(self, path, instance_order_file="_instance_order.yaml"):
+        """
+        Loads a meta compound components folder into this session's meta compound component library
+        :param path: directory containing meta compound components descriptions
+        :param instance_order_file: A YAML folder containing a specific order to instantiate the meta CCs
+        :return: None
+        """
+        self.load_library("meta_compound_component", path, instance_order_file)
+
+    def load_library(self, library, path, instance_order_file="_instance_order.yaml"):
+        if library == "compound_component":
+            load_compound_components(path, instance_order_file, session=self)
+        else:
+            from searcher.meta_compound_component import load_meta_compound_component_library
+            load_meta_compound_component_library(path, instance_order_file, session=self)
+        if (library, path, instance_order_file) in self.sources:
+            self.sources.remove((library, path, instance_order_file))
+        self.sources.append((library, path, instance_order_file))
+
+    def watch(self, library, path, instance_order_file="_instance_order.yaml"):
+        """
+        Creates a LibraryWatcher for a folder already loaded into this session (see estimator.library_watcher)
+        :param library: 'compound_component' or 'meta_compound_component'
+        :return: LibraryWatcher object
+        """
+        if library == "compound_component":
+            return watch_compound_components(path, instance_order_file, session=self)
+        from searcher.meta_compound_component import watch_meta_compound_component_library
+        return watch_meta_compound_component_library(path, instance_order_file, session=self)
+
+    def reconnect(self):
+        self.database_handler.reconnect()
+
+    def fork(self):
+        """
+        Creates a new session with its own IPCL connection, starting from the libraries of this one. Nothing is
+        re-parsed: the libraries are shallow copies, which is safe since components are always deep-copied out of a
+        library before they are used. Loading more components into the fork does not affect this session
+        :return: SmartSession object
+        """
+        session = SmartSession(self.database_handler.db_path, self.database_handler.table,
+                               cc_library=OrderedDict(self.compound_component_library),
+                               meta_cc_library=OrderedDict(self.meta_compound_component_library))
+        session.sources = list(self.sources)
+        session.start_method = self.start_method
+        return session
+
+    def process_pool(self, max_workers=None, initializer=None, initargs=()):
+        """
+        Creates a ProcessPoolExecutor whose workers start from this session. Where fork is available the workers
+        inherit the already built libraries and only reopen the IPCL connection; otherwise (or with start_method
+        'spawn') the session and the initargs are pickled, and the session is rebuilt from its recipe once per worker.
+        Inside a worker, worker_session() returns the session
+        :param max_workers: Number of worker processes. None means os.cpu_count()
+        :param initializer: Optional extra initializer, called after the session is set up
+        :param initargs: Arguments of the extra initializer
+        :return: ProcessPoolExecutor object
+        """
+        start_method = self.start_method if self.start_method else \
+            "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+        context = multiprocessing.get_context(start_method) if start_method else None
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_session_worker,
+                                   initargs=(self, initializer, initargs))
+
+
+_worker_session = None  # Session of the current worker process, see SmartSession.process_pool
+
+
+def _init_session_worker(session, initializer, initargs):
+    global _worker_session
+    session.reconnect()  # SQLite connections must not be shared with the parent process
+    _worker_session = session
+    if initializer:
+        initializer(*initargs)
+
+
+def worker_session():
+    """
+    :return: The session of the current worker process (see SmartSession.process_pool), or default_session
+    """
+    return _worker_session if _worker_session else default_session
+
+
+# Wraps the module globals, so that code which does not pass a session keeps using them
+default_session = SmartSession(handler=database_handler, cc_library=compound_component_library)
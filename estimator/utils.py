@@ -1,8 +1,10 @@
 """
 Utility functions, used for tasks such as string handling
 """
+import itertools
+import operator
 from collections import OrderedDict
-from functools import lru_cache
+from functools import lru_cache, reduce
 
 import yaml, yamlordereddictloader
 
@@ -92,3 +94,174 @@ def read_yaml_file(yaml_path):
     with open(yaml_path) as f:
         yaml_data = yaml.load(f, Loader=yamlordereddictloader.Loader)
     return yaml_data
+
+
+class NearestPointIndex:
+    """
+    KD-tree over a fixed set of discrete points (eg. firmware tiles or hardware parameter combinations), used to snap
+    the continuous points suggested by a Bayesian optimizer to the nearest valid one. The tree is built once per
+    search, so each lookup is O(log n) instead of a sort over every point. Returns the same point as
+    sorted((euclidean_distance, point))[0]: the nearest one, and the smallest point on a distance tie
+    """
+
+    def __init__(self, points):
+        """
+        :param points: Iterable of equal length numeric tuples
+        """
+        # Only the Bayesian searches snap points, so scipy is only imported here
+        from scipy.spatial import cKDTree
+        import numpy as np
+        self.points = list(points)
+        self.coordinates = np.array(self.points, dtype=np.float64).reshape(len(self.points), -1)
+        self.tree = cKDTree(self.coordinates) if self.points else None
+
+    def __len__(self):
+        return len(self.points)
+
+    def nearest(self, point):
+        """
+        :param point: Continuous point, same dimensions as the indexed points
+        :return: The nearest indexed point (as given to the constructor)
+        """
+        return self.nearest_many([point])[0]
+
+    def nearest_many(self, points):
+        """
+        Snaps a batch of continuous points with one vectorized tree query
+        :param points: Sequence of continuous points
+        :return: list of the nearest indexed point of each point
+        """
+        import numpy as np
+        assert self.tree is not None, "Cannot snap to an empty set of points"
+        queries = np.array(points, dtype=np.float64).reshape(-1, self.coordinates.shape[1])
+        distances, _ = self.tree.query(queries)
+        nearest = []
+        for query, distance in zip(queries, distances):
+            # Points at (numerically) the same distance are compared exactly, as the original sort did
+            ties = self.tree.query_ball_point(query, distance * (1 + 1e-9) + 1e-12)
+            exact = np.sqrt(((self.coordinates[ties] - query) ** 2).sum(axis=1))
+            nearest.append(min((exact[i], self.points[row]) for i, row in enumerate(ties))[1])
+        return nearest
+
+
+def product(values):
+    """
+    Product of the values, like math.prod() (which needs Python 3.8)
+    :param values: Iterable of numbers
+    :return: Their product. 1 if there are none
+    """
+    return reduce(operator.mul, values, 1)
+
+
+class ProductSpace:
+    """
+    Lazy cartesian product of pools of values, in itertools.product order (the last pool changes fastest). The product
+    is never built: len() is the product of the pool sizes, and the item at an index is decoded from it in mixed radix
+    (one digit per pool). Slicing gives a lazy sub-space, eg. a shard of the indices. Pools can be ProductSpaces too
+    """
+
+    def __init__(self, pools, indices=None):
+        """
+        :param pools: Iterable of pools, each a sequence of values
+        :param indices: range of the indices of the full product covered by this space. None means all of them
+        """
+        self.pools = tuple(p if isinstance(p, ProductSpace) else tuple(p) for p in pools)
+        self.sizes = tuple(len(p) for p in self.pools)
+        self.indices = indices if indices is not None else range(product(self.sizes))
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ProductSpace(self.pools, self.indices[index])
+        return self.decode(self.indices[index])
+
+    def __iter__(self):
+        if len(self.indices) == product(self.sizes):
+            return itertools.product(*self.pools)
+        return map(self.decode, self.indices)
+
+    def decode(self, index):
+        """
+        :param index: Index in the full product
+        :return: tuple, one value of each pool
+        """
+        digits = []
+        for size in reversed(self.sizes):
+            index, digit = divmod(index, size)
+            digits.append(digit)
+        return tuple(pool[digit] for pool, digit in zip(self.pools, reversed(digits)))
+
+    def index(self, item):
+        """
+        Inverse of __getitem__
+        :param item: tuple, one value of each pool
+        :return: Index of the item in this space. Raises ValueError if it is not in it
+        """
+        index = 0
+        for pool, size, value in zip(self.pools, self.sizes, item):
+            index = index * size + pool.index(value)
+        return self.indices.index(index)
+
+    def shards(self, shard_size):
+        """
+        :param shard_size: Number of items per shard
+        :return: Generator of consecutive sub-spaces covering this space
+        """
+        return (self[start:start + shard_size] for start in range(0, len(self), shard_size))
+
+    def nearest(self, point):
+        """
+        Snaps a continuous point to the nearest item of a product of numeric pools. On a full product the Euclidean
+        distance is smallest when each coordinate is, so every pool is searched on its own, without a KD-tree over the
+        whole product. Same result as NearestPointIndex: the smallest value wins a distance tie
+        :param point: Continuous point, one coordinate per pool
+        :return: The nearest item
+        """
+        assert len(self.indices) == product(self.sizes), "Only a full product can be snapped to"
+        return tuple(min(pool, key=lambda value: (abs(value - x), value)) for pool, x in zip(self.pools, point))
+
+
+class VersionedDict(OrderedDict):
+    """
+    OrderedDict with a version token, replaced by a new object() on every change, so that caches can be keyed on it
+    (eg. the stats of a component on the version of its arguments). Setting a key to the value it already holds is not
+    a change. Tokens are compared by identity, so they stay unique across processes and copies
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.version = object()
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        old = self.get(key, self)
+        if old is value or (type(old) is type(value) and old == value):
+            return
+        super().__setitem__(key, value)
+        self.version = object()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version = object()
+
+    def pop(self, *args):
+        self.version = object()
+        return super().pop(*args)
+
+    def popitem(self, last=True):
+        self.version = object()
+        return super().popitem(last)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def move_to_end(self, key, last=True):
+        super().move_to_end(key, last)
+        self.version = object()
+
+    def clear(self):
+        super().clear()
+        self.version = object()
@@ -3,38 +3,58 @@ from estimator.estimator import Estimator, estimator_factory
 from estimator.input_handler import database_handler
 
 from mappers.smapper.smapper import Smapper
+import contextlib
+import json
+import sys
 import time
+import click
 from estimator.utils import read_yaml_file
 from searcher.meta_architecture import MetaArchitecture
 from searcher.searcher import yaml_searcher_factory
 from mappers.compiler.compiler import Compiler
+from service.job_runner import JobRunner, encode_result
 
 """
 Collection of scripts to run functionality for different parts of the project
 """
 
 
-def run_estimator():
-    est = estimator_factory("project_io/estimator_input/sample_architecture.yaml",
-                            "project_io/estimator_input/operations2.yaml",
-                            components_folder="project_io/estimator_input/components/",
-                            db_table="TH2Components")
+def run_estimator(arch_path="project_io/estimator_input/sample_architecture.yaml",
+                  op_path="project_io/estimator_input/operations2.yaml",
+                  components_folder="project_io/estimator_input/components/",
+                  db_table="TH2Components", analysis=True):
+    est = estimator_factory(arch_path, op_path, components_folder=components_folder, db_table=db_table)
 
     print(est.operation_list)
-    est.estimate(features=["cycle", "energy", "area"], analysis=True)
-
-
-def run_smapper():
-    sm = Smapper()
-    sm.set_architecture("project_io/mapper_input/architecture.yaml",
-                        components_folder="project_io/mapper_input/components/",
-                        database_table="TH2Components")
-    sm.set_nn("project_io/mapper_input/neural_network.yaml")
+    est.estimate(features=["cycle", "energy", "area"], analysis=analysis)
+
+
+def run_smapper(arch_path="project_io/mapper_input/architecture.yaml",
+                components_folder="project_io/mapper_input/components/",
+                db_table="TH2Components",
+                nn_path="project_io/mapper_input/neural_network.yaml",
+                algorithm="bayes",
+                out_path="project_io/ops_yaml.yaml",
+                workers=1,
+                verify_samples=0,
+                prune=True,
+                batch_size=1):
+    sm = Smapper(workers=workers)
+    sm.verify_samples = verify_samples
+    sm.prune = prune
+    sm.batch_size = batch_size
+    sm.set_architecture(arch_path, components_folder=components_folder, database_table=db_table)
+    sm.set_nn(nn_path)
     start_time = time.time()
-    sm.run_operationalizer()
-    fw_input, score, eac = sm.search_firmware()
-    print(f"\n\n========\nScore: {score}\nTile Size: {fw_input}\nEnergy, Area, Cycle: {eac}")
-    sm.write_best_ops('project_io/ops_yaml.yaml')
+    if len(sm.nn_list) > 1:
+        layer_inputs, score, eac = sm.search_network(algorithm)
+        tile_sizes = "".join(f"\n\t{name}: {fw_input}" for name, fw_input in layer_inputs.items())
+        print(f"\n\n========\nScore: {score}\nTile Sizes:{tile_sizes}\nEnergy, Area, Cycle: {eac}")
+    else:
+        sm.run_operationalizer()
+        fw_input, score, eac = sm.search_firmware(algorithm)
+        print(f"\n\n========\nScore: {score}\nTile Size: {fw_input}\nEnergy, Area, Cycle: {eac}")
+    sm.write_best_ops(out_path)
 
     end_time = time.time()
     # print(sm.get_operations_from_param((16, 440, 128, 1))) # Get operation set for this param
@@ -56,21 +76,174 @@ def run_arch_finder():
     print("Execution time: ", end_time - start_time, "seconds")
 
 
-def run_searcher():
+def run_searcher(meta_arch_path="project_io/searcher_input/original_arch/meta_architecture.yaml",
+                 meta_cc_path="project_io/searcher_input/original_arch/meta_components",
+                 nn_path="project_io/searcher_input/neural_network.yaml",
+                 top_solutions_num=3, hw_algorithm="bayes", fw_algorithm="bayes", verbose=False, batch_size=1,
+                 workers=1, surrogate="gp", queue_dir=None, shard_size=16, checkpoint=None, resume=False):
     start_time = time.time()
-    search = yaml_searcher_factory("project_io/searcher_input/original_arch/meta_architecture.yaml",
-                                   "project_io/searcher_input/original_arch/meta_components",
-                                   "project_io/searcher_input/neural_network.yaml")
-    search.search_combinations()
+    search = yaml_searcher_factory(meta_arch_path, meta_cc_path, nn_path)
+    search.batch_size, search.workers, search.surrogate = batch_size, workers, surrogate
+    if queue_dir:
+        from searcher.shard_queue import DirectoryShardQueue
+        search.shard_queue = DirectoryShardQueue(queue_dir)
+    search.shard_size = shard_size
+    search.checkpoint_path = checkpoint
+    search.search_combinations(top_solutions_num, hw_algorithm, fw_algorithm, verbose, resume)
     print("Execution time: ", time.time() - start_time, "seconds")
 
 
-def run_compiler():
-    comp = Compiler(read_yaml_file("mappers/compiler/compiler_io/neural_network_asr.yaml"))
+def run_search_worker(queue_dir, meta_arch_path="project_io/searcher_input/original_arch/meta_architecture.yaml",
+                      meta_cc_path="project_io/searcher_input/original_arch/meta_components",
+                      nn_path="project_io/searcher_input/neural_network.yaml",
+                      top_solutions_num=3, fw_algorithm="bayes", workers=1, idle_timeout=None):
+    from searcher.shard_queue import DirectoryShardQueue
+    search = yaml_searcher_factory(meta_arch_path, meta_cc_path, nn_path)
+    search.workers = workers
+    shards = search.work_shards(DirectoryShardQueue(queue_dir), top_solutions_num, fw_algorithm, idle_timeout)
+    print(f"Shards searched: {shards}")
+
+
+def run_compiler(nn_path="mappers/compiler/compiler_io/neural_network_asr.yaml",
+                 out_path="mappers/compiler/compiler_io/pure_compiled_descriptor.txt",
+                 comment_out_path="mappers/compiler/compiler_io/comment_compiled_descriptor.txt"):
+    comp = Compiler(read_yaml_file(nn_path))
     comp.compile()
-    comp.write_out("mappers/compiler/compiler_io/pure_compiled_descriptor.txt", comment=False)
-    comp.write_out("mappers/compiler/compiler_io/comment_compiled_descriptor.txt", comment=True)
+    comp.write_out(out_path, comment=False)
+    comp.write_out(comment_out_path, comment=True)
+
+
+def run_batch(jobs_file, results_file):
+    """
+    Runs a JSONL file of jobs in one warm process, streaming one JSONL result per job. Anything the modules print
+    while running a job is sent to stderr so that the results stream stays valid JSONL
+    :param jobs_file: File object with one JSON job per line (see service.job_runner.JobRunner)
+    :param results_file: File object that the JSONL results are written to
+    :return: None
+    """
+    runner = JobRunner()
+    for line in jobs_file:
+        if not line.strip():
+            continue
+        with contextlib.redirect_stdout(sys.stderr):
+            result = runner.run_job(json.loads(line))
+        results_file.write(encode_result(result))
+        results_file.flush()
+
+
+FW_ALGORITHMS = click.Choice(["bayes", "linear", "analytical"])
+HW_ALGORITHMS = click.Choice(["bayes", "linear", "halving", "distributed"])
+
+
+@click.group(invoke_without_command=True)
+@click.pass_context
+def cli(ctx):
+    """SMART command-line interface. Runs the Smapper with its default inputs if no command is given."""
+    if ctx.invoked_subcommand is None:
+        run_smapper()
+
+
+@cli.command()
+@click.option("--architecture", default="project_io/estimator_input/sample_architecture.yaml", show_default=True)
+@click.option("--operations", default="project_io/estimator_input/operations2.yaml", show_default=True)
+@click.option("--components", default="project_io/estimator_input/components/", show_default=True)
+@click.option("--table", default="TH2Components", show_default=True, help="IPCL database table")
+@click.option("--analysis/--no-analysis", default=True, show_default=True,
+              help="Output the pie charts, TXT analysis and component-operation matrix")
+def estimator(architecture, operations, components, table, analysis):
+    """Estimate energy, area and cycle for an architecture + operations."""
+    run_estimator(architecture, operations, components, table, analysis)
+
+
+@cli.command()
+@click.option("--architecture", default="project_io/mapper_input/architecture.yaml", show_default=True)
+@click.option("--components", default="project_io/mapper_input/components/", show_default=True)
+@click.option("--table", default="TH2Components", show_default=True, help="IPCL database table")
+@click.option("--nn", default="project_io/mapper_input/neural_network.yaml", show_default=True)
+@click.option("--algorithm", type=FW_ALGORITHMS, default="bayes", show_default=True)
+@click.option("--out", default="project_io/ops_yaml.yaml", show_default=True, help="Best operations YAML output")
+@click.option("--workers", default=1, show_default=True,
+              help="Worker processes for the linear search, or for the layers of a multi-layer network")
+@click.option("--verify-samples", default=0, show_default=True,
+              help="Candidates checked against the Estimator before an analytical search")
+@click.option("--prune/--no-prune", default=True, show_default=True,
+              help="Skip the linear search candidates whose score bound cannot beat the best one")
+@click.option("--batch-size", default=1, show_default=True, help="Points suggested per Bayesian iteration")
+def smapper(architecture, components, table, nn, algorithm, out, workers, verify_samples, prune, batch_size):
+    """Search for the best firmware mapping of a neural network onto an architecture."""
+    run_smapper(architecture, components, table, nn, algorithm, out, workers, verify_samples, prune, batch_size)
+
+
+@cli.command()
+@click.option("--meta-architecture", default="project_io/searcher_input/original_arch/meta_architecture.yaml",
+              show_default=True)
+@click.option("--meta-components", default="project_io/searcher_input/original_arch/meta_components",
+              show_default=True)
+@click.option("--nn", default="project_io/searcher_input/neural_network.yaml", show_default=True)
+@click.option("--top", default=3, show_default=True, help="Number of top solutions to analyze")
+@click.option("--hw-algorithm", type=HW_ALGORITHMS, default="bayes", show_default=True)
+@click.option("--fw-algorithm", type=FW_ALGORITHMS, default="bayes", show_default=True)
+@click.option("--verbose", is_flag=True, help="Log every hardware-firmware combination searched")
+@click.option("--batch-size", default=1, show_default=True, help="Architectures suggested per Bayesian iteration")
+@click.option("--workers", default=1, show_default=True, help="Worker processes for the architectures of a batch")
+@click.option("--surrogate", type=click.Choice(["gp", "rf", "tpe"]), default="gp", show_default=True,
+              help="Surrogate model of the bayes hardware search: Gaussian Process, random forest or TPE")
+@click.option("--queue-dir", default=None, help="Shared directory of the distributed hardware search. Default: no "
+                                                "other workers, the searcher searches every shard itself")
+@click.option("--shard-size", default=16, show_default=True, help="Architectures per distributed search shard")
+@click.option("--checkpoint", default=None, help="JSONL file the firmware search of each architecture is saved to")
+@click.option("--resume", is_flag=True, help="Resume the search saved in --checkpoint")
+def searcher(meta_architecture, meta_components, nn, top, hw_algorithm, fw_algorithm, verbose, batch_size, workers,
+             surrogate, queue_dir, shard_size, checkpoint, resume):
+    """Search for the best hardware architectures within a meta-architecture."""
+    run_searcher(meta_architecture, meta_components, nn, top, hw_algorithm, fw_algorithm, verbose, batch_size,
+                 workers, surrogate, queue_dir, shard_size, checkpoint, resume)
+
+
+@cli.command("search-worker")
+@click.option("--queue-dir", required=True, help="Shared directory of the distributed hardware search")
+@click.option("--meta-architecture", default="project_io/searcher_input/original_arch/meta_architecture.yaml",
+              show_default=True)
+@click.option("--meta-components", default="project_io/searcher_input/original_arch/meta_components",
+              show_default=True)
+@click.option("--nn", default="project_io/searcher_input/neural_network.yaml", show_default=True)
+@click.option("--top", default=3, show_default=True, help="Number of top solutions of the coordinator's search")
+@click.option("--fw-algorithm", type=FW_ALGORITHMS, default="bayes", show_default=True)
+@click.option("--workers", default=1, show_default=True, help="Worker processes for the architectures of a shard")
+@click.option("--idle-timeout", type=float, default=None, help="Stop after this many seconds without a shard")
+def search_worker(queue_dir, meta_architecture, meta_components, nn, top, fw_algorithm, workers, idle_timeout):
+    """Search the shards of a distributed hardware search (searcher --hw-algorithm distributed --queue-dir)."""
+    run_search_worker(queue_dir, meta_architecture, meta_components, nn, top, fw_algorithm, workers, idle_timeout)
+
+
+@cli.command()
+@click.option("--nn", default="mappers/compiler/compiler_io/neural_network_asr.yaml", show_default=True)
+@click.option("--out", default="mappers/compiler/compiler_io/pure_compiled_descriptor.txt", show_default=True)
+@click.option("--comment-out", default="mappers/compiler/compiler_io/comment_compiled_descriptor.txt",
+              show_default=True)
+def compiler(nn, out, comment_out):
+    """Compile a neural network into TH2 NPU descriptors."""
+    run_compiler(nn, out, comment_out)
+
+
+@cli.command()
+@click.argument("jobs", type=click.File("r"), default="-")
+@click.option("--output", type=click.File("w"), default="-", help="JSONL results file. Default stdout")
+def batch(jobs, output):
+    """Run a JSONL file of jobs (default stdin) in one warm process, streaming JSONL results."""
+    run_batch(jobs, output)
+
+
+@cli.command()
+@click.option("--socket", "socket_path", default="/tmp/smart_server.sock", show_default=True,
+              help="Unix domain socket to listen on")
+@click.option("--port", type=int, default=None, help="Listen on this localhost TCP port instead of a Unix socket")
+@click.option("--workers", type=int, default=None, help="Number of worker processes. Default: CPU count")
+def serve(socket_path, port, workers):
+    """Run a long-lived local estimation server with warm caches (see service/server.py)."""
+    from service.server import SmartServer
+    SmartServer(socket_path, port, workers).run()
 
 
 if __name__ == "__main__":
-    run_smapper()
+    cli()
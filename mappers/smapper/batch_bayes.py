@@ -0,0 +1,69 @@
+import numpy as np
+
+"""
+Batched (q-point) Bayesian Optimization on top of the bayes_opt package. BayesianOptimization.maximize() suggests and
+evaluates one point at a time; batch_maximize() instead suggests q distinct points per iteration with the constant liar
+heuristic, and hands them to the caller as one batch, so that they can be evaluated at the same time (eg. on a process
+pool)
+"""
+
+
+def batch_maximize(evaluate, pbounds, init_points, n_iter, batch_size, kappa=1, random_state=10):
+    """
+    Batched equivalent of BayesianOptimization(pbounds=pbounds).maximize(init_points, n_iter, kappa=kappa), with the
+    UCB acquisition function
+    :param evaluate: function(list of {param: value} dicts) -> list of targets, in the same order. Evaluates a batch
+    :param pbounds: {param: (min, max)} bounds of the search space
+    :param init_points: Number of random points evaluated before the Gaussian Process is used. They are evaluated as
+    one batch
+    :param n_iter: Number of points suggested by the Gaussian Process, batch_size at a time
+    :param batch_size: Number of points suggested (and evaluated) per iteration
+    :param kappa: UCB exploration parameter
+    :param random_state: Seed of the random samples and of the acquisition function optimizer
+    :return: BayesianOptimization object holding all the observations (see its max and res fields)
+    """
+    from bayes_opt import BayesianOptimization, UtilityFunction
+    rng = np.random.RandomState(random_state)
+    optimizer = BayesianOptimization(f=None, pbounds=pbounds, random_state=rng, verbose=0)
+    utility = UtilityFunction(kind="ucb", kappa=kappa, xi=0.0)
+    init_batch = [optimizer.space.array_to_params(optimizer.space.random_sample()) for _ in range(max(init_points, 1))]
+    _register_batch(optimizer, init_batch, evaluate(init_batch))
+    iteration = 0
+    while iteration < n_iter:
+        batch = suggest_batch(optimizer, utility, min(batch_size, n_iter - iteration), rng)
+        _register_batch(optimizer, batch, evaluate(batch))
+        iteration += len(batch)
+    return optimizer
+
+
+def suggest_batch(optimizer, utility, batch_size, rng):
+    """
+    Constant liar: after each suggestion, a copy of the model is told that the point scored the lowest target seen so
+    far, which pushes the next suggestion away from it. The lies are never registered in the optimizer itself
+    :param optimizer: BayesianOptimization object with at least one observation
+    :param utility: bayes_opt UtilityFunction
+    :param batch_size: Maximum number of points suggested
+    :param rng: numpy RandomState used by the acquisition function optimizer
+    :return: list of distinct {param: value} dicts. Shorter than batch_size if the model suggests a point twice
+    """
+    from bayes_opt import BayesianOptimization
+    liar = BayesianOptimization(f=None, pbounds=dict(zip(optimizer.space.keys, optimizer.space.bounds)),
+                                random_state=rng, verbose=0)
+    for result in optimizer.res:
+        liar.register(result["params"], result["target"])
+    lie = optimizer.space.target.min()
+    batch = []
+    while len(batch) < batch_size:
+        params = liar.suggest(utility)
+        if liar.space.params_to_array(params) in liar.space:
+            break
+        batch.append(params)
+        liar.register(params, lie)
+    return batch if batch else [params]
+
+
+def _register_batch(optimizer, batch, targets):
+    for params, target in zip(batch, targets):
+        # The same point can be suggested again once the batch is over. Its target is already known
+        if optimizer.space.params_to_array(params) not in optimizer.space:
+            optimizer.register(params, target)
@@ -0,0 +1,127 @@
+import math
+import random
+from collections import OrderedDict
+
+import numpy
+
+from estimator.estimator import Estimator
+from estimator.utils import parse_method_notation
+from mappers.smapper.operationalizer import LazyOperationsMap
+
+"""
+Analytical cost model for the firmware pipelines built by the Operationalizer. Each candidate is a single pipeline with
+the same stages (eg. input read, weight read, MAC, output write), and only the stage counts and the operation-times
+change between candidates. The Estimator's pipeline arithmetic is therefore replayed once per stage on NumPy arrays,
+using per-component stats that are computed once per architecture, to get the energy, area and cycle of every
+candidate at the same time
+"""
+
+
+class AnalyticalCostModel:
+    """
+    Batch evaluator of the candidates of a LazyOperationsMap on one architecture. Follows Estimator.estimate() for a
+    single pipeline operation step by step (same stage order, same int() truncation and idle energy terms), so the
+    results match the Estimator up to floating point rounding. Use verify() to check this on sampled candidates
+    """
+
+    def __init__(self, architecture, param_op_map: LazyOperationsMap):
+        """
+        Precomputes the stats of each pipeline stage and the idle energy of each component
+        :param architecture: <Architecture> object the candidates are estimated on
+        :param param_op_map: LazyOperationsMap created by Smapper.run_operationalizer()
+        """
+        assert isinstance(param_op_map, LazyOperationsMap), "The analytical model needs the Operationalizer's " \
+                                                            "candidate arrays (LazyOperationsMap)"
+        self.architecture = architecture
+        self.param_op_map = param_op_map
+        self.params = list(param_op_map)
+        component_dict = architecture.component_dict
+        self.components = list(component_dict)
+        self.idle_energy = [component_dict[c].calculate_operation_stat('idle', 'energy') for c in self.components]
+        self.stages = []  # (component index, energy stat, cycle stat) of each pipeline stage
+        for operation in param_op_map.stage_operations:
+            obj, method, arg = parse_method_notation(operation).values()
+            stat = component_dict[obj].calculate_operation_stat
+            self.stages.append((self.components.index(obj), stat(method, 'energy', tuple(arg.items())),
+                                stat(method, 'cycle', tuple(arg.items()))))
+        # Area does not depend on the stage counts or operation-times, so it is the same for every candidate
+        self.area = Estimator(architecture, param_op_map[self.params[0]]).estimate(["area"], analysis=False)[0] \
+            if self.params else 0
+
+    def evaluate(self, positions=None):
+        """
+        Evaluates every candidate at once
+        :param positions: Positions (in param_op_map order) of the candidates to evaluate. None means all of them
+        :return: tuple of arrays (energy, area, cycle), in the order of the candidates in param_op_map (or positions)
+        """
+        # Stage counts and operation-times do not depend on the architecture, so they come from the (shared) map
+        counts, repeats = self.param_op_map.get_candidate_arrays()
+        if positions is not None:
+            counts, repeats = counts[positions], repeats[positions]
+        candidate_num = len(repeats)
+        # Pipeline length: each stage starts one cycle after the previous one (offset 1)
+        total_cycles = numpy.zeros(candidate_num)
+        for stage_index, (_, _, stage_cycle) in enumerate(self.stages):
+            total_cycles = numpy.maximum(total_cycles, (stage_index + 1) + counts[:, stage_index] * stage_cycle)
+        cycle = total_cycles * repeats
+        # Energy: components start at their idle energy, active stages replace (first) or add to it
+        rows = [idle * repeats for idle in self.idle_energy]
+        active_cycles = [numpy.zeros(candidate_num) for _ in self.components]
+        for stage_index, (c, stage_energy, stage_cycle) in enumerate(self.stages):
+            stage_total = numpy.trunc(stage_energy * counts[:, stage_index]) * repeats
+            rows[c] = numpy.where(active_cycles[c] == 0, stage_total, rows[c] + stage_total)
+            active_cycles[c] = active_cycles[c] + stage_cycle * counts[:, stage_index]
+        energy = numpy.zeros(candidate_num)
+        for c in range(len(self.components)):
+            # Idle energy for the cycles a component is not active in the pipeline
+            energy = energy + (rows[c] + self.idle_energy[c] * (total_cycles - active_cycles[c]) * repeats)
+        return energy, numpy.full(candidate_num, self.area, dtype=numpy.float64), cycle
+
+    def score_bounds(self):
+        """
+        Cheap upper bounds on the score of every candidate, for branch-and-bound pruning. Area and cycle are exact
+        (the pipeline length is a max over the stages); energy is bounded below by the active energy of the stages
+        (reads, MACs, writes), minus the idle energy the Estimator takes back when a component's stages overlap for
+        longer than the pipeline. The idle energy of the other cycles is left out, so no candidate scores higher than
+        its bound (if the idle energies are negative, the bounds are +inf and nothing can be pruned)
+        :return: array of score upper bounds, in the order of the candidates in param_op_map
+        """
+        from mappers.smapper.smapper import score_firmware
+        candidate_num = len(self.params)
+        if min(self.idle_energy, default=0) < 0:
+            return numpy.full(candidate_num, numpy.inf)
+        counts, repeats = self.param_op_map.get_candidate_arrays()
+        total_cycles = numpy.zeros(candidate_num)
+        active_cycles = [numpy.zeros(candidate_num) for _ in self.components]
+        active_energy = numpy.zeros(candidate_num)
+        for stage_index, (c, stage_energy, stage_cycle) in enumerate(self.stages):
+            total_cycles = numpy.maximum(total_cycles, (stage_index + 1) + counts[:, stage_index] * stage_cycle)
+            active_cycles[c] = active_cycles[c] + stage_cycle * counts[:, stage_index]
+            active_energy = active_energy + numpy.trunc(stage_energy * counts[:, stage_index])
+        overlap_energy = sum(self.idle_energy[c] * numpy.maximum(active_cycles[c] - total_cycles, 0)
+                             for c in range(len(self.components)))
+        energy = numpy.maximum((active_energy - overlap_energy) * repeats, numpy.finfo(float).tiny)
+        with numpy.errstate(divide="ignore"):
+            return score_firmware(energy, numpy.full(candidate_num, self.area, dtype=numpy.float64),
+                                  total_cycles * repeats)
+
+    def verify(self, samples=32, rel_tol=1e-9, seed=0):
+        """
+        Verification mode: compares the analytical results of randomly sampled candidates with the full Estimator
+        :param samples: Number of candidates to check. The whole map is checked if it is smaller
+        :param rel_tol: Relative tolerance allowed between the two results
+        :param seed: Random seed of the sample
+        :return: OrderedDict {params : (analytical (energy, area, cycle), estimator (energy, area, cycle))} of the
+        candidates that do not match. Empty if all of them match
+        """
+        energy, area, cycle = self.evaluate()
+        rows = random.Random(seed).sample(range(len(self.params)), min(samples, len(self.params)))
+        mismatches = OrderedDict()
+        for row in sorted(rows):
+            params = self.params[row]
+            analytical = (energy[row], area[row], cycle[row])
+            estimated = Estimator(self.architecture, self.param_op_map[params]).estimate(["energy", "area", "cycle"],
+                                                                                        analysis=False)
+            if not all(math.isclose(a, e, rel_tol=rel_tol) for a, e in zip(analytical, estimated)):
+                mismatches[params] = (analytical, estimated)
+        return mismatches
@@ -1,9 +1,102 @@
 from estimator.data_structures.architecture import Architecture
 from mappers.smapper.solver import Solver
 from collections import OrderedDict
+from collections.abc import Mapping
 from mappers.smapper.wrappers import Pipeline
 import math, numpy
 
+"""
+The Operationalizer turns the tiling solutions of the Solver into SMART operations for an architecture. All the tiling
+candidates are handled at once as NumPy arrays: the buffer size constraints are applied as boolean masks and the read,
+MAC and write counts are computed as array expressions. Pipeline dicts are only built for the feasible candidates
+"""
+
+OPERATIONS_CACHE_SIZE = 1024  # Default number of operation lists kept by a LazyOperationsMap
+# Arguments of the start/end buffers each layer type reads (see Operationalizer.dependency_key). Apart from the intmac
+# units, no other part of the architecture changes the candidates of a layer
+BUFFER_DEPENDENCIES = OrderedDict([("input", ("size", "width")), ("weights", ("size", "width")),
+                                   ("output", ("size", "width"))])
+LAYER_DEPENDENCIES = {"dnn": BUFFER_DEPENDENCIES, "cnn": BUFFER_DEPENDENCIES}
+
+
+def build_operations(repeat, stage_counts, stage_operations):
+    """
+    Builds the operations list of one tiling candidate
+    :param repeat: operation-times of the pipeline
+    :param stage_counts: Count of each pipeline stage
+    :param stage_operations: Operation of each pipeline stage, eg. data_sram.read()
+    :return: Operations list, containing one pipeline
+    """
+    pipeline = Pipeline(operation_times=repeat)
+    for operation, count in zip(stage_operations, stage_counts):
+        pipeline.add_stage(operation, count, offset=1)
+    return [pipeline.get_dict()]
+
+
+class LazyOperationsMap(Mapping):
+    """
+    Read-only {params : operations} map over the feasible candidates of an Operationalizer. The operations of a
+    candidate are only built when it is first accessed, and the most recently used ones are kept in a bounded cache.
+    Iterating over the keys, len() and `in` do not build anything. Nothing in the map depends on the cost of the
+    operations, so one map serves every architecture with the same Operationalizer.dependency_key()
+    """
+
+    def __init__(self, operationalizer, cache_size=OPERATIONS_CACHE_SIZE):
+        """
+        :param operationalizer: Operationalizer whose candidates have been created (see create_candidates)
+        :param cache_size: Maximum number of operation lists kept
+        """
+        self.candidates = operationalizer.candidates
+        self.repeats = operationalizer.repeats
+        self.stage_counts = operationalizer.stage_counts
+        self.stage_operations = operationalizer.stage_operations
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.builds = 0
+        self.nearest_index = None  # NearestPointIndex over the candidates, see get_nearest_index
+        self.candidate_arrays = None  # See get_candidate_arrays
+
+    def __getitem__(self, params):
+        if params in self.cache:
+            self.cache.move_to_end(params)
+            return self.cache[params]
+        row = self.candidates[params]
+        operations = build_operations(self.repeats[row], self.stage_counts[row].tolist(), self.stage_operations)
+        self.builds += 1
+        self.cache[params] = operations
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return operations
+
+    def __iter__(self):
+        return iter(self.candidates)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def __contains__(self, params):
+        return params in self.candidates
+
+    def get_candidate_arrays(self):
+        """
+        :return: tuple of arrays (stage counts rounded up as Pipeline.add_stage does, operation-times as floats), one
+        row per candidate in iteration order. Computed once per map, see AnalyticalCostModel
+        """
+        if self.candidate_arrays is None:
+            rows = numpy.fromiter(self.candidates.values(), dtype=numpy.int64, count=len(self.candidates))
+            self.candidate_arrays = (numpy.ceil(self.stage_counts[rows]),
+                                     numpy.asarray(self.repeats[rows], dtype=numpy.float64))
+        return self.candidate_arrays
+
+    def get_nearest_index(self):
+        """
+        :return: NearestPointIndex over the candidates, used to snap Bayesian suggestions. Built once per map
+        """
+        if self.nearest_index is None:
+            from estimator.utils import NearestPointIndex
+            self.nearest_index = NearestPointIndex(self.candidates)
+        return self.nearest_index
+
 
 class Operationalizer:
 
@@ -12,117 +105,176 @@ class Operationalizer:
         self.comp_dict = architecture.component_dict
         self.solver = solver
         self.param_operations_map = OrderedDict()  # Maps the parameters to the operations
+        self.candidates = OrderedDict()  # Feasible parameters : row in stage_counts
+        self.stage_counts = None  # 2D array, one row of pipeline stage counts per feasible candidate
+        self.repeats = None  # Array of the operation-times of each feasible candidate
+        self.stage_operations = []  # Operation of each pipeline stage, eg. data_sram.read()
+        self.print_map = False  # Whether create_operations prints the whole param_operations_map
         self.operation_creation_map = {"dnn": self.__create_dnn_operations, "cnn": self.__create_cnn_operations}
 
-    def create_operations(self):
+    def create_candidates(self):
+        """
+        Finds the feasible tiling candidates, without building their operations (see LazyOperationsMap)
+        :return: None. Populates self.candidates
+        """
         self.operation_creation_map[self.solver.nn.nn_type]()
-        # pass
 
-    def __create_dnn_operations(self, print_on=False):
-        nn = self.solver.nn
-        for params in self.solver.factor_comb:
-            in_w, in_h, out_h = params
-            repeat = (self.solver.original_tile / numpy.array(params)).prod()
-            if print_on: print(params)
-            # 1. Check the in + weight SRAM size
-            input_start = self.comp_dict[nn.start['input']].comp_args
-            weight_start = self.comp_dict[nn.start['weights']].comp_args
-            output_end = self.comp_dict[nn.end['output']].comp_args
-            # Check if the param is valid for the architecture. If it is not valid, then continue to next param set
-            if in_w * in_h > input_start['size']:
-                if print_on: print(f"Inputs: ({in_w}x{in_h}) greater than input buffer ({input_start['size']})")
-                continue
-            if in_h * out_h > weight_start['size']:
-                if print_on: print(f"Weights: ({in_h}x{out_h}) greater than weight buffer ({weight_start['size']}")
-                continue
-            if out_h * in_w > output_end['size']:
-                if print_on: print(f"Outputs: ({in_w}x{out_h}) greater than output buffer ({output_end['size']}")
-                continue
-            # Now create the corresponding operations
-            # Find the bus width of the two starting units
-            in_width, weight_width = int(input_start['width']), int(weight_start['width'])
-            in_read_times = math.ceil(in_h * in_w / (in_width))
-            w_read_times = math.ceil(in_h * out_h / (weight_width))
-            # Get how many bits can the intmac do. 8, 16, etc from architecture,
-            # through searching for intmac units in arch
-            mac_info = self.architecture.get_component_class('intmac')
-            mac_array_num, intmac_bits = len(mac_info), int(tuple(mac_info.items())[0][1].comp_args['datasize'])
-            # print(mac_array_num == 16)
-            pe_unit = tuple(mac_info.items())[0][0].split('.')[0]  # since the search result shows pe.mac_0
-            pe_mac_ops = math.ceil(in_h * in_w * out_h / (mac_array_num * intmac_bits))
-            # Find the output destination
-            out_width, out_bit = int(output_end['width']), 8
-            out_write_times = out_h * in_width / (out_width)
-            # Construct the pipeline
-            dnn_pipeline = Pipeline(operation_times=repeat)
-            dnn_pipeline.add_stage(f"{nn.start['input']}.read()", in_read_times, offset=1)
-            dnn_pipeline.add_stage(f"{nn.start['weights']}.read()", w_read_times, offset=1)
-            dnn_pipeline.add_stage(f"{pe_unit}.mac()", pe_mac_ops, offset=1)
-            dnn_pipeline.add_stage(f"{nn.end['output']}.write()", out_write_times, offset=1, stride=1)
-            self.param_operations_map[tuple(params)] = [dnn_pipeline.get_dict()]
-        if print_on:
+    def create_operations(self):
+        """
+        Finds the feasible tiling candidates and builds all of their operations into param_operations_map
+        :return: None
+        """
+        self.create_candidates()
+        for params in self.candidates:
+            self.param_operations_map[params] = self.get_operations(params)
+        if self.print_map:
             for k, v in self.param_operations_map.items():
                 print(k)
                 print(v)
                 print()
 
-    def __create_cnn_operations(self, print_on = True):
+    def get_operations(self, params: tuple):
+        """
+        Builds the operations of one feasible tiling candidate
+        :param params: Tiling parameters, as in self.candidates
+        :return: Operations list, containing one pipeline
+        """
+        row = self.candidates[params]
+        return build_operations(self.repeats[row], self.stage_counts[row].tolist(), self.stage_operations)
+
+    def dependency_key(self):
+        """
+        Dependency analysis of the candidates: the hardware parameters they depend on, ie. the arguments listed in
+        LAYER_DEPENDENCIES for the start/end buffers of the layer, plus the number, datasize and processing element of
+        the intmac units. Architectures with the same key have the same candidates and operations, whatever their other
+        components and whatever the costs of their operations
+        :return: Hashable tuple
+        """
+        nn = self.solver.nn
+        names = OrderedDict([("input", nn.start['input']), ("weights", nn.start['weights']),
+                             ("output", nn.end['output'])])
+        buffers = tuple((names[role], tuple(self.comp_dict[names[role]].comp_args.get(a) for a in arguments))
+                        for role, arguments in LAYER_DEPENDENCIES[nn.nn_type].items())
+        mac_info = self.__get_mac_info() if self.architecture.get_component_class('intmac') else None
+        return nn.nn_type, buffers, mac_info
+
+    def __get_buffers(self):
+        nn = self.solver.nn
+        return tuple(self.comp_dict[c].comp_args for c in (nn.start['input'], nn.start['weights'], nn.end['output']))
+
+    def __get_mac_info(self):
+        # Get how many bits can the intmac do. 8, 16, etc from architecture, through searching for intmac units in arch
+        mac_info = self.architecture.get_component_class('intmac')
+        mac_array_num, intmac_bits = len(mac_info), int(tuple(mac_info.items())[0][1].comp_args['datasize'])
+        pe_unit = tuple(mac_info.items())[0][0].split('.')[0]  # since the search result shows pe.mac_0
+        return mac_array_num, intmac_bits, pe_unit
+
+    def __set_candidates(self, feasible, repeats, stage_counts, stage_operations):
+        """
+        Keeps the feasible candidates, in the Solver's order. Repeated factor combinations keep their first position
+        """
+        rows = numpy.flatnonzero(feasible)
+        self.candidates = OrderedDict()
+        for new_row, row in enumerate(rows):
+            self.candidates[tuple(self.solver.factor_comb[row])] = new_row
+        self.repeats = repeats[rows]
+        self.stage_counts = numpy.stack([counts[rows] for counts in stage_counts], axis=1)
+        self.stage_operations = stage_operations
+
+    @staticmethod
+    def __print_rejections(factor_comb, checks):
+        """
+        Prints why each infeasible candidate was rejected (first failing buffer check)
+        :param checks: list of (fail mask, function(row) -> message)
+        """
+        for row, params in enumerate(factor_comb):
+            for fail_mask, message in checks:
+                if fail_mask[row]:
+                    print(message(row))
+                    break
+
+    def __create_dnn_operations(self, print_on=False):
+        nn = self.solver.nn
+        params = numpy.array(self.solver.factor_comb, dtype=numpy.int64).reshape(-1, 3)
+        in_w, in_h, out_h = params[:, 0], params[:, 1], params[:, 2]
+        repeats = (self.solver.original_tile / params).prod(axis=1)
+        # 1. Check the in + weight SRAM size
+        input_start, weight_start, output_end = self.__get_buffers()
+        # Check if the param is valid for the architecture
+        input_fail = in_w * in_h > input_start['size']
+        weight_fail = ~input_fail & (in_h * out_h > weight_start['size'])
+        output_fail = ~input_fail & ~weight_fail & (out_h * in_w > output_end['size'])
+        feasible = ~(input_fail | weight_fail | output_fail)
+        if print_on:
+            self.__print_rejections(self.solver.factor_comb, [
+                (input_fail, lambda i: f"Inputs: ({in_w[i]}x{in_h[i]}) greater than input buffer "
+                                       f"({input_start['size']})"),
+                (weight_fail, lambda i: f"Weights: ({in_h[i]}x{out_h[i]}) greater than weight buffer "
+                                        f"({weight_start['size']}"),
+                (output_fail, lambda i: f"Outputs: ({in_w[i]}x{out_h[i]}) greater than output buffer "
+                                        f"({output_end['size']}")])
+        if not feasible.any():
+            self.candidates = OrderedDict()
+            return
+        # Now create the corresponding operations
+        # Find the bus width of the two starting units
+        in_width, weight_width = int(input_start['width']), int(weight_start['width'])
+        in_read_times = numpy.ceil(in_h * in_w / in_width)
+        w_read_times = numpy.ceil(in_h * out_h / weight_width)
+        mac_array_num, intmac_bits, pe_unit = self.__get_mac_info()
+        pe_mac_ops = numpy.ceil(in_h * in_w * out_h / (mac_array_num * intmac_bits))
+        # Find the output destination
+        out_width = int(output_end['width'])
+        out_write_times = out_h * in_width / out_width
+        self.__set_candidates(feasible, repeats, [in_read_times, w_read_times, pe_mac_ops, out_write_times],
+                              [f"{nn.start['input']}.read()", f"{nn.start['weights']}.read()", f"{pe_unit}.mac()",
+                               f"{nn.end['output']}.write()"])
+        self.print_map = print_on
+
+    def __create_cnn_operations(self, print_on=False):
         print("Creating CNN operations")
         nn = self.solver.nn
         dim = nn.dimensions
-        fmap_dim = ["input_channel", "batch"]
-        kernel_dim = ["kernel_height", "kernel_width", "input_channel", "output_channel"]
-        psum_dim = ["output_channel", "batch"]
-        for out_tile in self.solver.factor_comb:
-            repeat = int(numpy.prod(numpy.array(self.solver.original_tile)/ numpy.array(out_tile)))
-            psum_height, psum_width = out_tile
-            # Size of fmap tile determined by size of psum tile
-            fmap_height, fmap_width = psum_height + dim['kernel_height'] - 1, psum_width + dim['kernel_width'] - 1
-            in_num = numpy.prod(numpy.array([fmap_height, fmap_width] + [dim[i] for i in fmap_dim]))
-            out_num = numpy.prod(numpy.array([psum_height, psum_width] + [dim[j] for j in psum_dim]))
-            weight_num = numpy.prod(numpy.array([dim[k] for k in kernel_dim]))
-            mac_num = weight_num * psum_width * psum_height
-            # print("in, out, weight, mac, repeat", in_num, out_num, weight_num, mac_num, repeat)
-            # Now the rest is very similar to DNN. We get target buffers from architecture, then size check and make ops
-            input_start = self.comp_dict[nn.start['input']].comp_args
-            weight_start = self.comp_dict[nn.start['weights']].comp_args
-            output_end = self.comp_dict[nn.end['output']].comp_args
-            # Size check
-            if in_num > input_start['size']:
-                if print_on: print(f"Inputs: ({in_num}) greater than input buffer ({input_start['size']})")
-                continue
-            if weight_num > weight_start['size']:
-                if print_on: print(f"Weights: ({weight_num}) greater than weight buffer ({weight_start['size']}")
-                continue
-            if out_num > output_end['size']:
-                if print_on: print(f"Outputs: ({out_num}) greater than output buffer ({output_end['size']}")
-                continue
-            # Write operations
-            # Find the bus width of the two starting units
-            in_width, weight_width, out_width = int(input_start['width']), int(weight_start['width']), int(output_end['width'])
-            in_read_times = math.ceil(in_num / (in_width))
-            w_read_times = math.ceil(weight_num / (weight_width))
-            out_read_times = math.ceil(out_num / (out_width))
-            # Get how many bits can the intmac do. 8, 16, etc from architecture,
-            # through searching for intmac units in arch
-            mac_info = self.architecture.get_component_class('intmac')
-            mac_array_num, intmac_bits = len(mac_info), tuple(mac_info.items())[0][1].comp_args['datasize']
-            pe_unit = tuple(mac_info.items())[0][0].split('.')[0]  # since the search result shows pe.mac_0
-            pe_mac_ops = mac_num / (mac_array_num * int(intmac_bits) / 8)
-
-            # Find the output destination
-            out_write_times = out_num / (out_width)
-            # Construct the pipeline
-            cnn_pipeline = Pipeline(operation_times=repeat)
-            cnn_pipeline.add_stage(f"{nn.start['input']}.read()", in_read_times, offset=1)
-            cnn_pipeline.add_stage(f"{nn.start['weights']}.read()", w_read_times, offset=1)
-            cnn_pipeline.add_stage(f"{nn.end['output']}.read()", w_read_times, offset=1)
-            cnn_pipeline.add_stage(f"{pe_unit}.mac()", pe_mac_ops, offset=1)
-            cnn_pipeline.add_stage(f"{nn.end['output']}.write()", out_write_times, offset=1, stride=1)
-            self.param_operations_map[tuple(out_tile)] = [cnn_pipeline.get_dict()]
+        out_tiles = numpy.array(self.solver.factor_comb, dtype=numpy.int64).reshape(-1, 2)
+        # Python ints, as the operation-times are written out to the operations YAML
+        repeats = (numpy.array(self.solver.original_tile) / out_tiles).prod(axis=1).astype(numpy.int64).astype(object)
+        psum_height, psum_width = out_tiles[:, 0], out_tiles[:, 1]
+        # Size of fmap tile determined by size of psum tile
+        fmap_height, fmap_width = psum_height + dim['kernel_height'] - 1, psum_width + dim['kernel_width'] - 1
+        in_num = fmap_height * fmap_width * dim['input_channel'] * dim['batch']
+        out_num = psum_height * psum_width * dim['output_channel'] * dim['batch']
+        weight_num = numpy.prod(numpy.array([dim[k] for k in ["kernel_height", "kernel_width", "input_channel",
+                                                              "output_channel"]]))
+        mac_num = weight_num * psum_width * psum_height
+        # Now the rest is very similar to DNN. We get target buffers from architecture, then size check and make ops
+        input_start, weight_start, output_end = self.__get_buffers()
+        # Size check
+        input_fail = in_num > input_start['size']
+        weight_fail = ~input_fail & numpy.full(len(out_tiles), weight_num > weight_start['size'])
+        output_fail = ~input_fail & ~weight_fail & (out_num > output_end['size'])
+        feasible = ~(input_fail | weight_fail | output_fail)
         if print_on:
-            for k, v in self.param_operations_map.items():
-                print(k)
-                print(v)
-                print()
-
+            self.__print_rejections(self.solver.factor_comb, [
+                (input_fail, lambda i: f"Inputs: ({in_num[i]}) greater than input buffer ({input_start['size']})"),
+                (weight_fail, lambda i: f"Weights: ({weight_num}) greater than weight buffer "
+                                        f"({weight_start['size']}"),
+                (output_fail, lambda i: f"Outputs: ({out_num[i]}) greater than output buffer "
+                                        f"({output_end['size']}")])
+        if not feasible.any():
+            self.candidates = OrderedDict()
+            return
+        # Write operations
+        # Find the bus width of the two starting units
+        in_width, weight_width, out_width = int(input_start['width']), int(weight_start['width']), \
+            int(output_end['width'])
+        in_read_times = numpy.ceil(in_num / in_width)
+        w_read_times = numpy.full(len(out_tiles), math.ceil(weight_num / weight_width))
+        mac_array_num, intmac_bits, pe_unit = self.__get_mac_info()
+        pe_mac_ops = mac_num / (mac_array_num * intmac_bits / 8)
+        # Find the output destination
+        out_write_times = out_num / out_width
+        self.__set_candidates(feasible, repeats, [in_read_times, w_read_times, w_read_times, pe_mac_ops,
+                                                  out_write_times],
+                              [f"{nn.start['input']}.read()", f"{nn.start['weights']}.read()",
+                               f"{nn.end['output']}.read()", f"{pe_unit}.mac()", f"{nn.end['output']}.write()"])
+        self.print_map = print_on
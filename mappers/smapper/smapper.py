@@ -1,17 +1,22 @@
+from copy import deepcopy
+
 import numpy as np
-from bayes_opt import BayesianOptimization
 
 from estimator.data_structures.architecture import yaml_arch_factory
-from estimator.data_structures.compound_component import load_compound_components
+from estimator.session import default_session
 from estimator.input_handler import *
 from estimator.estimator import Estimator
 from mappers.smapper.wrappers import *
 from mappers.smapper.solver import Solver
-from mappers.smapper.operationalizer import Operationalizer
-import matplotlib.pyplot as plt
+from mappers.smapper.operationalizer import Operationalizer, LazyOperationsMap
+import contextlib
 import time
 import math
 
+PARALLEL_CHUNK_MIN = 16  # Smallest number of firmware solutions sent to a worker at once
+SCORE_TOLERANCE = 1e-9  # Relative score difference treated as rounding noise (analytical ties, pruning bounds)
+OPERATIONS_MAP_CACHE_SIZE = 64  # LazyOperationsMaps kept by a Smapper, see run_operationalizer
+
 
 def score_firmware(energy, area, cycle):
     """
@@ -22,9 +27,62 @@ def score_firmware(energy, area, cycle):
     :param cycle: Cycle data, in cycles
     :return: Score of the firmware architecture. A higher score means better architecture.
     """
+    if isinstance(energy, np.ndarray):  # Batch of firmware solutions, see AnalyticalCostModel
+        return -1 * (np.log10(energy) + np.log10(area) + np.log10(cycle))
     return -1 * (math.log10(energy) + math.log10(area) + math.log10(cycle))
 
 
+def estimate_firmware(architecture, operations):
+    """
+    Estimates and scores one firmware solution (a set of operations) on an architecture
+    :param architecture: <Architecture> object
+    :param operations: Operations list of the firmware solution
+    :return: tuple (score, (energy, area, cycle))
+    """
+    estimation = Estimator(architecture=architecture, operations=operations).estimate(["energy", "area", "cycle"],
+                                                                                      False)
+    return score_firmware(*estimation), estimation
+
+
+_linear_search_state = None  # (architecture, param_op_map) of the current parallel linear search worker process
+
+
+def _init_linear_search_worker(architecture, param_op_map):
+    global _linear_search_state
+    _linear_search_state = (architecture, param_op_map)
+
+
+def _estimate_firmware_chunk(params):
+    """
+    Runs in a parallel linear search worker process
+    :param params: chunk of param_op_map keys
+    :return: list of (score, (energy, area, cycle)), in the same order as params
+    """
+    architecture, param_op_map = _linear_search_state
+    return [estimate_firmware(architecture, param_op_map[p]) for p in params]
+
+
+_layer_search_state = None  # (smapper, algorithm) of the current layer search worker process
+
+
+def _init_layer_search_worker(smapper, algorithm):
+    global _layer_search_state
+    smapper.workers = 1  # Pool workers cannot start pools of their own
+    _layer_search_state = (smapper, algorithm)
+
+
+def _search_layer(layer):
+    """
+    Runs in a layer search worker process, see Smapper.search_network
+    :param layer: NeuralNetwork of one layer
+    :return: tuple (result of Smapper.search_layer, (trial hits, trial misses) of the search)
+    """
+    smapper, algorithm = _layer_search_state
+    hits, misses = smapper.trial_stats.values()
+    result = smapper.search_layer(layer, algorithm)
+    return result, (smapper.trial_stats["hits"] - hits, smapper.trial_stats["misses"] - misses)
+
+
 class Smapper:
     """
     Smapper, aka. SMART Mapper, is the SMART system's firmware searcher/mapper module. Given a particular hardware
@@ -33,17 +91,52 @@ class Smapper:
     The user can decide which algorithm to use to conduct the search. Currently supports linear-exhaustive search
     (keyword: "linear", recommended for users with large compute for a precise/definite answer) and a
     Bayesian-Optimization based search (keyword "bayes", recommended for users with smaller compute and limited time)
+    The linear search can be sharded across worker processes by setting workers > 1, and uses branch-and-bound
+    pruning unless prune is False. With batch_size > 1 the Bayesian search suggests batch_size points per iteration
+    (see batch_bayes), which are estimated on the worker processes. The "analytical" algorithm is a linear search that
+    scores all candidates at once with the AnalyticalCostModel instead of the Estimator. search_firmware() maps the
+    first layer of the neural network, search_network() maps all of them
     """
-    def __init__(self):
+    def __init__(self, session=None, workers=1):
+        """
+        :param session: SmartSession the architectures are built in. None means default_session
+        :param workers: Number of worker processes for the linear search. 1 means a serial search
+        """
+        self.session = session if session else default_session
+        self.workers = workers
+        self.verify_samples = 0  # Candidates checked against the Estimator before an analytical search
+        self.prune = True  # Whether the linear search skips candidates whose score bound cannot beat the best one
+        self.batch_size = 1  # Points suggested per Bayesian iteration. Batches are estimated on `workers` processes
         self.architecture = None
-        self.nn_list = None
-        self.nn = None
+        self.nn_list = None  # NeuralNetwork of each layer, in order
+        self.nn = None  # Layer mapped by run_operationalizer and search_firmware
+        self.layer_solutions = OrderedDict()  # Layer name : (fw_input, score, eac, operations), see search_network
         self.param_cost_map = OrderedDict()
         self.param_op_map = OrderedDict()
         self.fw_param_labels = None
-        self.algorithm_map = {"bayes": self.__bayesian_optimization_search,
-                              "linear": self.__linear_search}
+        self.algorithm_map = self.__get_algorithm_map()
         self.best_ops = None
+        self.trial_stats = OrderedDict([("hits", 0), ("misses", 0)])  # Bayesian trials, over all searches
+        self.solver = None  # Solver of self.nn, see run_operationalizer
+        self.solvers = OrderedDict()  # NeuralNetwork : Solver, one per layer mapped so far
+        self.operations_map_cache = OrderedDict()  # (nn, Operationalizer.dependency_key) : LazyOperationsMap
+        self.operations_map_stats = OrderedDict([("hits", 0), ("misses", 0)])
+
+    def __getstate__(self):
+        # Bound private methods cannot be unpickled (they are looked up by their unmangled name), so algorithm_map is
+        # rebuilt instead. Smappers are pickled as the initargs of the process pools started with spawn
+        state = self.__dict__.copy()
+        del state["algorithm_map"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.algorithm_map = self.__get_algorithm_map()
+
+    def __get_algorithm_map(self):
+        return {"bayes": self.__bayesian_optimization_search,
+                "linear": self.__linear_search,
+                "analytical": self.__analytical_search}
 
     def set_architecture(self, arch_path, components_folder, database_table):
         """
@@ -54,40 +147,105 @@ class Smapper:
         :return: None
         """
         if database_table:
-            database_handler.set_ipcl_table(database_table)
+            self.session.set_ipcl_table(database_table)
         if components_folder:
-            load_compound_components(components_folder)
-        self.architecture = yaml_arch_factory(read_yaml_file(arch_path))
+            self.session.load_compound_components(components_folder)
+        self.architecture = yaml_arch_factory(read_yaml_file(arch_path), self.session)
 
     def set_nn(self, nn_file):
         """
-        Sets up the list of the neural network processes to be operationalized as a YAML
+        Sets up the list of the neural network processes to be operationalized as a YAML. Every layer is kept in
+        nn_list, and the first one is the layer mapped by search_firmware()
         :param nn_file: path of YAML file to be initialized as NN list
         :return: None
         """
-        n = read_yaml_file(nn_file)['neural_network'][0]  # Currently we consider only 1 layer
-        self.nn = NeuralNetwork(n['name'], n['nn_type'], n['dimensions'], n['start'], n['end'])
+        self.nn_list = [NeuralNetwork(n['name'], n['nn_type'], n['dimensions'], n['start'], n['end'])
+                        for n in read_yaml_file(nn_file)['neural_network']]
+        assert self.nn_list, f"{nn_file} does not describe any layer"
+        names = [layer.name for layer in self.nn_list]
+        assert len(set(names)) == len(names), f"Layer names of {nn_file} are not unique: {names}"
+        self.nn = self.nn_list[0]
+        self.solvers = OrderedDict()
 
     def run_operationalizer(self):
         """
-        Run the Operationalizer, which will populate the param_op_map for all of the different combinations identified
-        in the solver.
+        Run the Operationalizer, which will find the feasible tiling combinations identified in the solver. The
+        param_op_map is lazy: the operations of a combination are only built when the search first looks at it. It is
+        also shared by the architectures with the same Operationalizer.dependency_key() (eg. in a hardware search, the
+        ones that only differ in components the layer does not use), so only the costs are computed again for them
         :return: None
         """
-        solver = Solver(self.nn)
-        op = Operationalizer(self.architecture, solver)
-        op.create_operations()
-        self.param_op_map = op.param_operations_map
-        self.fw_param_labels = solver.param_labels
+        if self.nn not in self.solvers:
+            self.solvers[self.nn] = Solver(self.nn)  # The tiling solutions only depend on the neural network
+        self.solver = self.solvers[self.nn]
+        op = Operationalizer(self.architecture, self.solver)
+        key = (self.nn, op.dependency_key())
+        if key in self.operations_map_cache:
+            self.operations_map_stats["hits"] += 1
+            self.operations_map_cache.move_to_end(key)
+        else:
+            self.operations_map_stats["misses"] += 1
+            op.create_candidates()
+            self.operations_map_cache[key] = LazyOperationsMap(op)
+            if len(self.operations_map_cache) > OPERATIONS_MAP_CACHE_SIZE:
+                self.operations_map_cache.popitem(last=False)
+        self.param_op_map = self.operations_map_cache[key]
+        self.param_cost_map = OrderedDict()  # Costs of the previous architecture's candidates must not be compared
+        self.fw_param_labels = self.solver.param_labels
 
     def search_firmware(self, algorithm="bayes"):
         return self.algorithm_map[algorithm]()
 
+    def search_layer(self, layer, algorithm="bayes"):
+        """
+        Maps one layer: runs the Operationalizer and the firmware search for it. The layer becomes self.nn
+        :param layer: NeuralNetwork of the layer
+        :param algorithm: Firmware search algorithm, see search_firmware
+        :return: tuple (fw_input, score, (energy, area, cycle), operations of the best firmware)
+        """
+        self.nn = layer
+        self.run_operationalizer()
+        fw_input, score, eac = self.search_firmware(algorithm)
+        operations = self.get_operations_from_param(tuple(fw_input[x] for x in self.fw_param_labels))
+        return fw_input, score, eac, operations
+
+    def search_network(self, algorithm="bayes"):
+        """
+        Whole-network mapping: searches the firmware of every layer of nn_list, then estimates the network as the
+        concatenation of the best operations of its layers (in layer order). Layers with the same shape (see
+        NeuralNetwork.shape_key) are only searched once and share their solution. With workers > 1 the distinct layers
+        are searched at the same time, one per worker process, and each layer search is then serial
+        :param algorithm: Firmware search algorithm, see search_firmware
+        :return: tuple (OrderedDict {layer name: fw_input}, score, (energy, area, cycle)) of the whole network
+        """
+        shapes = OrderedDict()  # Shape key : first layer with this shape
+        for layer in self.nn_list:
+            shapes.setdefault(layer.shape_key(), layer)
+        if self.workers > 1 and len(shapes) > 1:
+            with self.session.process_pool(min(self.workers, len(shapes)), _init_layer_search_worker,
+                                           (self, algorithm)) as pool:
+                results = []
+                for result, (hits, misses) in pool.map(_search_layer, shapes.values()):
+                    self.trial_stats["hits"] += hits
+                    self.trial_stats["misses"] += misses
+                    results.append(result)
+        else:
+            results = [self.search_layer(layer, algorithm) for layer in shapes.values()]
+        shape_results = OrderedDict(zip(shapes, results))
+        self.layer_solutions = OrderedDict((layer.name, shape_results[layer.shape_key()]) for layer in self.nn_list)
+        # Copied per layer, since the layers of a shape share the same operations (they would become YAML aliases)
+        self.best_ops = [operation for solution in self.layer_solutions.values() for operation in deepcopy(solution[3])]
+        score, eac = estimate_firmware(self.architecture, self.best_ops)
+        return OrderedDict((name, solution[0]) for name, solution in self.layer_solutions.items()), abs(score), eac
+
     def __bayesian_optimization_search(self):
         """
         Employ Bayesian Optimization algorithm to search for optimal firmware solutions
         :return: tuple of len == 3: (solution_arguments, score, (energy, area, cycle))
         """
+        # bayes_opt pulls in scikit-learn/scipy, so only import it when the Bayesian search is actually used
+        from bayes_opt import BayesianOptimization
+
         def __bayesian_trial(**kwargs):
             """
             The 'black box function' implemented in the Bayesian Optimization method
@@ -97,27 +255,47 @@ class Smapper:
             param_dict = OrderedDict(locals()['kwargs'])
             # Make into discrete params
             discrete_params = __make_discrete_param(param_dict)
-            # Get the operations for this discrete param
-            architecture, operations = self.architecture, self.param_op_map[discrete_params]
-            estimator = Estimator(architecture, operations)
-            energy, area, cycle = estimator.estimate(["energy", "area", "cycle"], analysis=False)
-            return score_firmware(energy, area, cycle)
+            # Different suggestions often snap to the same tile, which is then only estimated once
+            if discrete_params in self.param_cost_map:
+                self.trial_stats["hits"] += 1
+            else:
+                self.trial_stats["misses"] += 1
+                # Get the operations for this discrete param
+                self.param_cost_map[discrete_params] = estimate_firmware(self.architecture,
+                                                                         self.param_op_map[discrete_params])
+            return self.param_cost_map[discrete_params][0]
+
+        def __bayesian_trials(batch, pool):
+            """
+            Evaluates a batch of suggestions at once (see batch_maximize). The tiles not estimated yet are sent to the
+            process pool, if there is one
+            :param batch: list of {param: value} dicts
+            :return: list of the scores of the batch
+            """
+            discrete_batch = [__make_discrete_param(param_dict) for param_dict in batch]
+            missing = list(OrderedDict.fromkeys(p for p in discrete_batch if p not in self.param_cost_map))
+            self.trial_stats["hits"] += len(discrete_batch) - len(missing)
+            self.trial_stats["misses"] += len(missing)
+            if pool:
+                self.__parallel_linear_estimate(missing, pool, chunk_size=math.ceil(len(missing) / self.workers))
+            else:
+                for p in missing:
+                    self.param_cost_map[p] = estimate_firmware(self.architecture, self.param_op_map[p])
+            return [self.param_cost_map[p][0] for p in discrete_batch]
 
         def __make_discrete_param(continuous_param_set: OrderedDict):
             """
             Round a continuous parameter set suggested by the Bayesian Model into a discrete parameter set that
-            is valid. Uses Euclidean distance algorithm
+            is valid. Uses Euclidean distance algorithm, through the NearestPointIndex of the param_op_map
             :param continuous_param_set: The set of continuous params, size N
             :return: The parameter set made discrete, as an OrderedDict().
             This will be put into **kwargs of Black Box Function
             """
             continuous_param_ordered = [continuous_param_set[i] for i in self.fw_param_labels]
-            continuous_param = np.array(tuple(continuous_param_ordered))
-            euclid_distance = lambda x, y: np.sqrt(((x - y) ** 2).sum(axis=0))
-            distances = sorted([[euclid_distance(np.array(p), continuous_param), p] for p in self.param_op_map])
-            return distances[0][1]
+            return param_index.nearest(continuous_param_ordered)
 
         b_start = time.time()
+        param_index = self.param_op_map.get_nearest_index()
         # Conduct Bayesian optimization over the firmware possibilities
         # Set the parameter boundaries
         param_bounds = OrderedDict()
@@ -130,38 +308,149 @@ class Smapper:
             param_bounds[self.fw_param_labels[i]] = (min_i, max_i)
         # Now apply the Bayesian model
         seed_num = math.ceil(len(self.param_op_map) * 0.01)
-        bayes_model = BayesianOptimization(f=__bayesian_trial,
-                                                pbounds=param_bounds,
-                                                random_state=10,
-                                                verbose=True)
-        bayes_model.maximize(seed_num * 3, seed_num, kappa=1)
+        if self.batch_size > 1:
+            from mappers.smapper.batch_bayes import batch_maximize
+            with (self.__process_pool() if self.workers > 1 else contextlib.nullcontext()) as pool:
+                bayes_model = batch_maximize(lambda batch: __bayesian_trials(batch, pool), param_bounds,
+                                             seed_num * 3, seed_num, self.batch_size, kappa=1, random_state=10)
+        else:
+            bayes_model = BayesianOptimization(f=__bayesian_trial,
+                                               pbounds=param_bounds,
+                                               random_state=10,
+                                               verbose=True)
+            bayes_model.maximize(seed_num * 3, seed_num, kappa=1)
         bayes_score = abs(bayes_model.max['target'])
         bayes_p = __make_discrete_param(bayes_model.max['params'])
         bayes_sol = {self.fw_param_labels[i]: bayes_p[i] for i in range(len(bayes_p))}
-        e = Estimator(self.architecture, self.param_op_map[bayes_p])
         self.best_ops = self.param_op_map[bayes_p]
-        bayes_eac = e.estimate(['energy', 'area', 'cycle'], analysis=False)
+        if bayes_p not in self.param_cost_map:
+            self.param_cost_map[bayes_p] = estimate_firmware(self.architecture, self.best_ops)
+        bayes_eac = self.param_cost_map[bayes_p][1]
         # print("Bayes Firmware Estimate:", bayes_sol, "Score of:", bayes_score)
         # print("Bayesian Time:", time.time() - b_start)
         return bayes_sol, bayes_score, bayes_eac
 
     def __linear_search(self):
+        """
+        Exhaustive linear search. With pruning on, only the candidates that could beat the best score are estimated,
+        so param_cost_map does not contain every candidate (see __branch_and_bound_estimate)
+        :return: tuple of len == 3: (solution_arguments, score, (energy, area, cycle))
+        """
         e_time = time.time()
         # Conduct a linear search
-        for k, v in self.param_op_map.items():
-            estimator = Estimator(architecture=self.architecture, operations=v)
-            estimation = estimator.estimate(["energy", "area", "cycle"], False)
-            energy, area, cycle = estimation
-            self.param_cost_map[k] = (score_firmware(energy, area, cycle), estimation)
+        if self.prune and len(self.param_op_map):
+            self.__branch_and_bound_estimate()
+        elif self.workers > 1 and len(self.param_op_map) >= self.workers * PARALLEL_CHUNK_MIN:
+            with self.__process_pool() as pool:
+                self.__parallel_linear_estimate(list(self.param_op_map), pool)
+        else:
+            for k, v in self.param_op_map.items():
+                self.param_cost_map[k] = estimate_firmware(self.architecture, v)
+        # print(len(self.param_cost_map), "combinations estimated")
+        # print("Exhaustive Linear Search Time: ", time.time() - e_time)
+        linear_sol, linear_score, linear_eac = self.__get_top_solution()
+        self.best_ops = self.param_op_map[tuple(linear_sol[x] for x in self.fw_param_labels)]
+        return linear_sol, linear_score, linear_eac
+
+    def __analytical_search(self):
+        """
+        Linear search where all candidates are scored at once by the AnalyticalCostModel. The candidates whose score
+        is within SCORE_TOLERANCE of the best are re-estimated with the Estimator, so the solution returned
+        (and its tie-breaking) is the same as the linear search's
+        :return: tuple of len == 3: (solution_arguments, score, (energy, area, cycle))
+        """
+        from mappers.smapper.cost_model import AnalyticalCostModel
+        model = AnalyticalCostModel(self.architecture, self.param_op_map)
+        if self.verify_samples:
+            mismatches = model.verify(self.verify_samples)
+            assert not mismatches, "Analytical cost model does not match the Estimator for %s" % dict(mismatches)
+        energy, area, cycle = model.evaluate()
+        scores = score_firmware(energy, area, cycle)
+        self.param_cost_map.update(zip(model.params, zip(scores.tolist(), zip(energy.tolist(), area.tolist(),
+                                                                               cycle.tolist()))))
+        if len(scores):
+            best_score = scores.max()
+            for row in np.flatnonzero(scores >= best_score - abs(best_score) * SCORE_TOLERANCE):
+                params = model.params[row]
+                self.param_cost_map[params] = estimate_firmware(self.architecture, self.param_op_map[params])
+        analytical_sol, analytical_score, analytical_eac = self.__get_top_solution()
+        # Operations of the best candidate, after it was verified by the Estimator above
+        self.best_ops = self.param_op_map[tuple(analytical_sol[x] for x in self.fw_param_labels)]
+        return analytical_sol, analytical_score, analytical_eac
+
+    def estimate_firmware_sample(self, fraction, seed=0):
+        """
+        Low fidelity version of search_firmware(), used as a proxy by the successive halving hardware search: the best
+        AnalyticalCostModel score over a random sample of the tiling candidates. run_operationalizer() must be run first
+        :param fraction: Fraction of the candidates sampled (at least one). 1 means all of them
+        :param seed: Random seed of the sample
+        :return: Best score of the sample (a higher score is better), or -inf if there is no candidate
+        """
+        from mappers.smapper.cost_model import AnalyticalCostModel
+        candidate_num = len(self.param_op_map)
+        if not candidate_num:
+            return -math.inf
+        model = AnalyticalCostModel(self.architecture, self.param_op_map)
+        positions = None
+        if fraction < 1:
+            positions = np.random.RandomState(seed).choice(candidate_num, max(1, math.ceil(candidate_num * fraction)),
+                                                           replace=False)
+        return score_firmware(*model.evaluate(positions)).max()
+
+    def __get_top_solution(self):
         top_solution = max(((*v, k) for k, v in self.param_cost_map.items()))
         linear_score = abs(top_solution[0])
         linear_eac, linear_p = top_solution[1], top_solution[2]
         linear_sol = {self.fw_param_labels[i]: linear_p[i] for i in range(len(linear_p))}
-        # print(len(self.param_cost_map), "combinations estimated")
-        # print("Exhaustive Linear Search Time: ", time.time() - e_time)
         return linear_sol, linear_score, linear_eac
 
+    def __branch_and_bound_estimate(self):
+        """
+        Estimates the candidates in decreasing order of their AnalyticalCostModel.score_bounds(), and stops at the first
+        candidate whose bound is below the best score found so far: neither it nor the ones after it can win. Candidates
+        tied with the best score are still estimated, so the result (and its tie-breaking) is the same as estimating
+        every candidate. With workers > 1, the candidates are estimated by the process pool in waves
+        :return: None. Populates param_cost_map
+        """
+        from mappers.smapper.cost_model import AnalyticalCostModel
+        model = AnalyticalCostModel(self.architecture, self.param_op_map)
+        bounds = model.score_bounds()
+        order = np.argsort(-bounds, kind="stable")
+        parallel = self.workers > 1 and len(order) >= self.workers * PARALLEL_CHUNK_MIN
+        wave_size = self.workers * PARALLEL_CHUNK_MIN if parallel else 1
+        best_score = -math.inf
+        with (self.__process_pool() if parallel else contextlib.nullcontext()) as pool:
+            for start in range(0, len(order), wave_size):
+                wave = [model.params[row] for row in order[start:start + wave_size]
+                        if bounds[row] >= best_score - abs(best_score) * SCORE_TOLERANCE]
+                if not wave:
+                    break
+                if parallel:
+                    self.__parallel_linear_estimate(wave, pool)
+                else:
+                    self.param_cost_map[wave[0]] = estimate_firmware(self.architecture, self.param_op_map[wave[0]])
+                best_score = max(best_score, *(self.param_cost_map[p][0] for p in wave))
+
+    def __process_pool(self):
+        return self.session.process_pool(self.workers, _init_linear_search_worker,
+                                         (self.architecture, self.param_op_map))
+
+    def __parallel_linear_estimate(self, params, pool, chunk_size=None):
+        """
+        Shards a list of param_op_map keys across a process pool (see __process_pool). The workers get the
+        architecture and param_op_map once, when they start, and are then sent chunks of param keys. Results come back
+        chunk by chunk in the order of params, so param_cost_map (and the tie-breaking on it) is the same as in a
+        serial search
+        :param chunk_size: Number of keys sent to a worker at once. None means at least PARALLEL_CHUNK_MIN
+        :return: None. Populates param_cost_map
+        """
+        chunk_size = chunk_size if chunk_size else max(PARALLEL_CHUNK_MIN, math.ceil(len(params) / (self.workers * 4)))
+        chunks = [params[i:i + chunk_size] for i in range(0, len(params), chunk_size)]
+        for chunk, results in zip(chunks, pool.map(_estimate_firmware_chunk, chunks)):
+            self.param_cost_map.update(zip(chunk, results))
+
     def graph_energy_cycle(self):
+        import matplotlib.pyplot as plt
         energy_data = tuple(math.log10(v[1][0]) for v in self.param_cost_map.values())
         cycle_data = tuple(math.log10(v[1][2]) for v in self.param_cost_map.values())
         plt.scatter(energy_data, cycle_data, marker='.')
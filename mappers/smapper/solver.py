@@ -23,8 +23,10 @@ class Solver:
         self.factor_comb = None
         self.param_labels = None
         self.original_tile = None  # Original tile
-        self.__solve_maps = {'dnn': self.__dnn_solve, 'cnn': self.__cnn_solve}
-        self.factor_comb = self.__solve_maps[self.nn.nn_type]()
+        # Not kept as an attribute: bound private methods cannot be unpickled, and Solvers are pickled with the
+        # Smapper to the process pools started with spawn
+        solve_maps = {'dnn': self.__dnn_solve, 'cnn': self.__cnn_solve}
+        self.factor_comb = solve_maps[self.nn.nn_type]()
 
     def __dnn_solve(self):
         """
@@ -19,6 +19,12 @@ class NeuralNetwork:
         self.start = start
         self.end = end
 
+    def shape_key(self):
+        """
+        :return: Hashable key of everything but the name. Layers with the same key have the same firmware solutions
+        """
+        return self.nn_type, tuple(self.dimensions.items()), tuple(self.start.items()), tuple(self.end.items())
+
 
 class Pipeline:
     def __init__(self, pipeline_dict=None, operation_times=1):
@@ -1,59 +1,149 @@
+import ast
 import itertools
+import operator
 from collections import OrderedDict
 from copy import deepcopy
-import numpy as np
+import numpy
 from estimator.data_structures.architecture import flatten_architecture, Architecture
 from estimator.data_structures.primitive_component import PrimitiveComponent
-from estimator.input_handler import database_handler
+from estimator.session import default_session
+from estimator.utils import ProductSpace, NearestPointIndex
 from searcher.meta_compound_component import *
 
 """
-Outputs a range of Architecture Options from a meta_arch param
+Outputs a range of Architecture Options from a meta_arch param. The argument combinations and the meta compound
+component combinations are lazy ProductSpaces, so no cartesian product is built, and compound components are only
+built (and kept in a bounded cache) when an architecture uses them
 """
 
+COMPOUND_COMPONENT_CACHE_SIZE = 1024  # Compound components kept by MetaArchitecture.get_compound_components
+CONSTRAINT_KEYS = ("max_area", "max_sram_size", "relations")  # See MetaArchitecture.check_constraints
+CONSTRAINT_CHUNK_SIZE = 65536  # Architecture indices pre-checked at once against the constraints
+SRAM_CLASS = "sram"  # Primitive component class whose size arguments count towards max_sram_size
+# Operators allowed in the constraint relations, see parse_relation
+RELATION_OPERATORS = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+                      ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Add: operator.add, ast.Sub: operator.sub,
+                      ast.Mult: operator.mul, ast.Div: operator.truediv, ast.USub: operator.neg,
+                      ast.And: numpy.logical_and, ast.Or: numpy.logical_or}
+
+
+def parse_relation(relation):
+    """
+    Parses a constraint relation of a meta-architecture, eg. "npu_pe.mac_instances * npu_pe.mac_datasize <= 128".
+    Relations come from library files, so they are not eval()'d: only numbers, names, <name>.<field>, the arithmetic
+    and comparison operators of RELATION_OPERATORS, and/or and parentheses are allowed
+    :param relation: Relation string
+    :return: function(namespace) -> value of the relation, where namespace is {name: value or {field: value}}. Values
+    can be numpy arrays, so that the relation is checked for many architectures at once
+    """
+    try:
+        tree = ast.parse(relation, mode="eval")
+    except SyntaxError:
+        raise AssertionError(f"Constraint relation '{relation}' is not a valid expression")
+    return _parse_relation_node(tree.body, relation)
+
+
+def _parse_relation_node(node, relation):
+    def operator_of(op):
+        assert type(op) in RELATION_OPERATORS, f"Operator {type(op).__name__} is not allowed in relation '{relation}'"
+        return RELATION_OPERATORS[type(op)]
+
+    def lookup(namespace, name, field=None):
+        assert name in namespace, f"Unknown name '{name}' in relation '{relation}'"
+        if field is None:
+            return namespace[name]
+        assert field in namespace[name], f"Unknown field '{name}.{field}' in relation '{relation}'"
+        return namespace[name][field]
+
+    if type(node).__name__ in ("Constant", "Num"):  # Numbers are Num nodes before Python 3.8
+        value = getattr(node, "value", getattr(node, "n", None))
+        assert isinstance(value, (int, float)) and not isinstance(value, bool), \
+            f"Only numbers are allowed as constants in relation '{relation}'"
+        return lambda namespace: value
+    if isinstance(node, ast.Name):
+        return lambda namespace: lookup(namespace, node.id)
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+        return lambda namespace: lookup(namespace, node.value.id, node.attr)
+    if isinstance(node, ast.UnaryOp):
+        op, operand = operator_of(node.op), _parse_relation_node(node.operand, relation)
+        return lambda namespace: op(operand(namespace))
+    if isinstance(node, ast.BinOp):
+        op = operator_of(node.op)
+        left, right = _parse_relation_node(node.left, relation), _parse_relation_node(node.right, relation)
+        return lambda namespace: op(left(namespace), right(namespace))
+    if isinstance(node, ast.BoolOp):
+        op, values = operator_of(node.op), [_parse_relation_node(v, relation) for v in node.values]
+
+        def bool_op(namespace):
+            result = values[0](namespace)
+            for value in values[1:]:
+                result = op(result, value(namespace))
+            return result
+        return bool_op
+    if isinstance(node, ast.Compare):
+        operands = [_parse_relation_node(n, relation) for n in [node.left] + node.comparators]
+        ops = [operator_of(op) for op in node.ops]
+
+        def compare(namespace):
+            # Chained comparisons, eg. a <= b <= c, are a <= b and b <= c
+            values = [operand(namespace) for operand in operands]
+            result = True
+            for op, left, right in zip(ops, values, values[1:]):
+                result = numpy.logical_and(result, op(left, right))
+            return result
+        return compare
+    raise AssertionError(f"{type(node).__name__} is not allowed in relation '{relation}'")
+
 
 class MetaArchitecture:
-    def __init__(self, yaml_data: OrderedDict, meta_cc_dir=None):
+    def __init__(self, yaml_data: OrderedDict, meta_cc_dir=None, session=None):
         """
         Defines the Meta-Architecture, which will contain the possibility space for all the different architectures
         that are possible, given the constraints defined in the meta-architecture template.
         :param yaml_data: File path to the meta-architecture YAML file containing the definition
         :param meta_cc_dir: File path to the folder containing the meta-compound-components to be used in this
         meta-architecture
+        :param session: SmartSession holding the IPCL and meta compound component library. None means default_session
         """
         assert "meta_architecture" in yaml_data, "Not a meta-architecture template!"
+        session = session if session else default_session
         if meta_cc_dir:
-            load_meta_compound_component_library(meta_cc_dir)
+            session.load_meta_compound_components(meta_cc_dir)
         yaml_data = yaml_data['meta_architecture']
         self.base_arch = Architecture()
         self.base_arch.name = yaml_data['name']
         self.base_arch.version = yaml_data['version']
         self.pc_arg_val = []  # (PC, arg, arg_array_vals)
-        self.meta_cc_combs = []  # 2d array, each item is a list of meta-cc possibilities
+        self.meta_cc_combs = None  # ProductSpace, each item is a tuple of the subcomponent param set of each meta-cc
         self.meta_cc_name_vars = [] # MCC name, MCC variables
-        self.argument_combs = None
+        self.argument_combs = None  # ProductSpace of the argument values, see load_argument_combinations
+        self.architecture_space = None  # ProductSpace (argument_combs x meta_cc_combs), in iter_architectures order
+        self.compound_component_cache = OrderedDict()  # (MCC index, param set) : <Compound Component>
+        self.constraints = yaml_data['constraints'] if yaml_data.get('constraints') else OrderedDict()
+        self.constraint_tables = None  # Per-dimension values and areas, built on the first check_constraints
+        self.feasible_index = None  # (NearestPointIndex, {point: index}, scales), see nearest_feasible_config
+        assert all(k in CONSTRAINT_KEYS for k in self.constraints), f"Constraints must be among {CONSTRAINT_KEYS}"
+        self.relations = [parse_relation(r) for r in self.constraints.get("relations", [])]
         self.param_architecture_map = None
         self.param_set_labels = []  # String tuple
         self.flatten_divider_character = None # See flatten in get_mcc_param_bounds
 
         flat_arch = flatten_architecture(yaml_data)
-        meta_cc_combs = []
         for item in flat_arch:
             item_name = item['name']
             item_class = item['class']
             item_arguments = item['arguments'] if 'arguments' in item else None
             # Check whether it is a primitive component or compound component
-            if database_handler.is_primitive_component(item_class):
-                pc = PrimitiveComponent(item_name, item_class)
+            if session.database_handler.is_primitive_component(item_class):
+                pc = PrimitiveComponent(item_name, item_class, db=session.database_handler)
                 self.base_arch.component_dict[item_name] = pc
                 if item_arguments:
                     self.pc_arg_val += [(pc, k, v) for k, v in item_arguments.items()]
                     self.param_set_labels += [f"hardware_{item_name}_{key}" for key in item_arguments]
             else:
-                mcc = deepcopy(meta_compound_component_library[item_class])
+                mcc = deepcopy(session.meta_compound_component_library[item_class])
                 self.meta_cc_name_vars.append((item_name, mcc))
-                meta_cc_combs.append(list(mcc.iter_compound_components()))
-        self.meta_cc_combs = list(itertools.product(*meta_cc_combs))
+        self.meta_cc_combs = ProductSpace(mcc.subcomponent_combs for _, mcc in self.meta_cc_name_vars)
         print(self.meta_cc_name_vars)
         print(self.param_set_labels)
 
@@ -61,8 +151,8 @@ class MetaArchitecture:
         # Used for Bayes Optim
         out_dict = {}
         for index, param_name in enumerate(self.param_set_labels):
-            minima = min([c[index] for c in self.argument_combs]) * 0.9
-            maxima = max([c[index] for c in self.argument_combs]) * 1.25
+            minima = min(self.argument_combs.pools[index]) * 0.9
+            maxima = max(self.argument_combs.pools[index]) * 1.25
             out_dict[param_name] = (minima, maxima)
         return out_dict
 
@@ -78,12 +168,13 @@ class MetaArchitecture:
 
     def load_argument_combinations(self):
         """
-        Loads the different argument combinations using itertools according to the different parameters specified in
-        the meta-architecture
-        :return: None. Updates the self.argument_combs field
+        Loads the different argument combinations according to the different parameters specified in the
+        meta-architecture, as a lazy cartesian product
+        :return: None. Updates the self.argument_combs and self.architecture_space fields
         """
         argument_pools = (p[2] if isinstance(p[2], list) else [p[2]] for p in self.pc_arg_val)
-        self.argument_combs = tuple(itertools.product(*argument_pools))  # Cartesian product
+        self.argument_combs = ProductSpace(argument_pools)
+        self.architecture_space = ProductSpace([self.argument_combs, self.meta_cc_combs])
 
     def iter_architectures(self):
         """
@@ -94,13 +185,211 @@ class MetaArchitecture:
         """
         # Return generator of the same base architecture but with different param sets
         # print((tuple(self.argument_combs)))
+        if self.constraints:
+            for index in self.iter_feasible_indices():
+                yield self.get_indexed_architecture(index)
+            return
         for param_set in self.argument_combs:
             self.update_base_arch(param_set)
-            for cc_comb in self.meta_cc_combs:
-                self.update_cc_from_comb(cc_comb)
-                self.base_arch.clear_cache()
+            for cc_param_sets in self.meta_cc_combs:
+                self.update_cc_from_comb(self.get_compound_components(cc_param_sets))
                 yield self.base_arch
 
+    def count_architectures(self):
+        return len(self.architecture_space)
+
+    def get_indexed_architecture(self, index):
+        """
+        Random access version of iter_architectures()
+        :param index: Position of the architecture in iter_architectures(), in [0, count_architectures())
+        :return: Architecture object: base_arch, updated to the architecture at that position
+        """
+        param_set, cc_param_sets = self.architecture_space[index]
+        self.update_base_arch(param_set)
+        self.update_cc_from_comb(self.get_compound_components(cc_param_sets))
+        return self.base_arch
+
+    def get_indexed_config(self, index):
+        """
+        :param index: Position of the architecture in iter_architectures()
+        :return: Discrete architecture parameters of the architecture at that position, as returned by snap_config
+        """
+        param_set, cc_param_sets = self.architecture_space[index]
+        return param_set, cc_param_sets if self.meta_cc_name_vars else None
+
+    def iter_feasible_indices(self, start=0, stop=None):
+        """
+        Indices of the architectures that meet the constraints of the meta-architecture, pre-checked
+        CONSTRAINT_CHUNK_SIZE indices at a time by check_constraints(), so that no architecture is built for it
+        :param start: First index checked
+        :param stop: End of the indices checked. None means all of them
+        :return: Generator of ints, in increasing order
+        """
+        stop = len(self.architecture_space) if stop is None else stop
+        if not self.constraints:
+            yield from range(start, stop)
+            return
+        for chunk_start in range(start, stop, CONSTRAINT_CHUNK_SIZE):
+            indices = numpy.arange(chunk_start, min(chunk_start + CONSTRAINT_CHUNK_SIZE, stop), dtype=numpy.int64)
+            yield from indices[self.check_constraints(indices)].tolist()
+
+    def count_feasible_architectures(self):
+        if not self.constraints:
+            return self.count_architectures()
+        architecture_num = self.count_architectures()
+        return sum(int(self.check_constraints(numpy.arange(start, min(start + CONSTRAINT_CHUNK_SIZE,
+                                                                      architecture_num))).sum())
+                   for start in range(0, architecture_num, CONSTRAINT_CHUNK_SIZE))
+
+    def is_feasible(self, discrete_config):
+        """
+        :param discrete_config: Discrete architecture parameters, see snap_config
+        :return: Whether the architecture meets the constraints of the meta-architecture
+        """
+        if not self.constraints:
+            return True
+        param_set, cc_param_sets = discrete_config
+        index = self.architecture_space.index((param_set, cc_param_sets if cc_param_sets else ()))
+        return bool(self.check_constraints(numpy.array([index], dtype=numpy.int64))[0])
+
+    def check_constraints(self, indices):
+        """
+        Vectorized pre-check of the `constraints` of the meta-architecture YAML, eg.
+            constraints:
+              max_area: 5.0E+7  # um^2
+              max_sram_size: 64000  # Sum of the size argument of the sram components
+              relations:
+              - data_sram.size >= sgemm_sram.size
+              - npu_pe.mac_instances * npu_pe.mac_datasize <= 128
+        Relations are arithmetic comparisons (see parse_relation) over <component>.<argument> (for a meta compound
+        component, its subcomponent comb labels without the "hardware_" prefix), `area` and `sram_size`. Each
+        architecture index is decoded into one value index per dimension (see get_discrete_dimensions), and the values
+        and areas are looked up in tables computed once per component. The area is operation-independent: the sum of
+        the idle area of the components, which is the area the Estimator reports
+        :param indices: numpy int array of architecture indices, see get_indexed_architecture
+        :return: numpy bool array, True where the architecture meets all the constraints
+        """
+        if self.constraint_tables is None:
+            self.constraint_tables = self.__build_constraint_tables()
+        values, areas, constant_area, srams = self.constraint_tables
+        digits = self.__decode_indices(indices)
+        area = constant_area + sum(table[tuple(digits[d] for d in dims)] for dims, table in areas)
+        sram_size = sum(source if d is None else values[d][1][source][digits[d]] for d, source in srams)
+        feasible = numpy.ones(len(indices), dtype=bool)
+        if "max_area" in self.constraints:
+            feasible &= area <= self.constraints["max_area"]
+        if "max_sram_size" in self.constraints:
+            feasible &= numpy.asarray(sram_size) <= self.constraints["max_sram_size"]
+        namespace = OrderedDict((c.name, OrderedDict(c.comp_args)) for c in self.base_arch.component_dict.values()
+                                if isinstance(c, PrimitiveComponent))
+        for d, (name, fields) in enumerate(values):
+            namespace.setdefault(name, OrderedDict()).update((k, v[digits[d]]) for k, v in fields.items())
+        namespace.update(area=area, sram_size=sram_size)
+        for relation in self.relations:
+            result = relation(namespace)
+            feasible &= numpy.broadcast_to(numpy.asarray(result, dtype=bool), feasible.shape)
+        return feasible
+
+    def nearest_feasible_config(self, discrete_config):
+        """
+        Snaps an architecture that does not meet the constraints to the nearest one that does, so that the Bayesian
+        hardware search can score its suggestion by the nearest feasible architecture and by how far it is from it,
+        instead of a flat penalty. The distance is Euclidean over the architecture parameters and the subcomponent
+        parameters of the meta compound components, each divided by the range of its values among the feasible
+        architectures. The index over the feasible architectures is built on the first call
+        :param discrete_config: Discrete architecture parameters, see snap_config
+        :return: tuple (discrete architecture parameters of the nearest feasible architecture, distance to it).
+        (discrete_config, 0) if it is feasible
+        """
+        if self.is_feasible(discrete_config):
+            return discrete_config, 0
+        if self.feasible_index is None:
+            indices = numpy.fromiter(self.iter_feasible_indices(), dtype=numpy.int64)
+            assert len(indices), "No architecture of the meta-architecture meets its constraints"
+            digits = self.__decode_indices(indices)
+            columns = []
+            for d, dimension in enumerate(self.get_discrete_dimensions()):
+                table = numpy.array(list(dimension), dtype=numpy.float64).reshape(len(dimension), -1)
+                columns.append(table[digits[d]])
+            coordinates = numpy.hstack(columns)
+            scales = coordinates.max(axis=0) - coordinates.min(axis=0)
+            scales[scales == 0] = 1
+            points = [tuple(row) for row in (coordinates / scales).tolist()]
+            self.feasible_index = (NearestPointIndex(points), dict(zip(points, indices.tolist())), scales)
+        point_index, point_indices, scales = self.feasible_index
+        param_set, cc_param_sets = discrete_config
+        coordinates = list(param_set) + [x for param_set in (cc_param_sets if cc_param_sets else ()) for x in param_set]
+        query = numpy.asarray(coordinates, dtype=numpy.float64) / scales
+        nearest = point_index.nearest(query)
+        distance = float(numpy.sqrt(((numpy.asarray(nearest) - query) ** 2).sum()))
+        return self.get_indexed_config(point_indices[nearest]), distance
+
+    def __decode_indices(self, indices):
+        """
+        :param indices: numpy int array of architecture indices, see get_indexed_architecture
+        :return: list of numpy int arrays, the value index of each architecture in each dimension of
+        get_discrete_dimensions()
+        """
+        digits, stride = [], len(self.architecture_space)
+        for size in (len(d) for d in self.get_discrete_dimensions()):
+            stride //= size
+            digits.append((indices // stride) % size)
+        return digits
+
+    def __build_constraint_tables(self):
+        """
+        :return: tuple (values, areas, constant area, srams). values: one (component name, {field: numpy array of its
+        value at each value index}) per dimension. areas: list of (dimensions, numpy array of the idle area of a
+        component at each combination of the value indices of these dimensions). srams: list of (dimension, "size")
+        of a swept sram size, or (None, size) for a fixed one
+        """
+        dimensions = self.get_discrete_dimensions()
+        values = [(None, None)] * len(dimensions)
+        pc_dimensions = OrderedDict()  # PC : dimensions of its arguments
+        for d, (pc, arg, _) in enumerate(self.pc_arg_val):
+            values[d] = (pc.name, {arg: numpy.asarray(dimensions[d])})
+            pc_dimensions.setdefault(pc, []).append(d)
+        areas, srams = [], []
+        constant_area = sum(c.calculate_operation_stat('idle', 'area') for c in self.base_arch.component_dict.values()
+                            if isinstance(c, PrimitiveComponent) and c not in pc_dimensions)
+        for pc, dims in pc_dimensions.items():
+            table = numpy.zeros([len(dimensions[d]) for d in dims])
+            for position in itertools.product(*(range(len(dimensions[d])) for d in dims)):
+                # Copies of the component, the one of the base architecture is shared with the built architectures
+                arguments = OrderedDict((self.pc_arg_val[d][1], dimensions[d][i]) for d, i in zip(dims, position))
+                table[position] = pc.with_arguments(arguments).calculate_operation_stat('idle', 'area')
+            areas.append((dims, table))
+        for c in self.base_arch.component_dict.values():
+            if isinstance(c, PrimitiveComponent) and c.comp_class == SRAM_CLASS:
+                swept = [d for d in pc_dimensions.get(c, []) if self.pc_arg_val[d][1] == "size"]
+                srams.append((swept[0], "size") if swept else (None, c.comp_args["size"]))
+        for m, (name, mcc) in enumerate(self.meta_cc_name_vars):
+            d = len(self.pc_arg_val) + m
+            combs = list(mcc.subcomponent_combs)
+            values[d] = (name, {label.replace("hardware_", "", 1): numpy.asarray([comb[k] for comb in combs])
+                                for k, label in enumerate(mcc.subcomponent_comb_labels)})
+            areas.append(([d], numpy.array([mcc.build_compound_component(comb).calculate_operation_stat('idle', 'area')
+                                            for comb in combs])))
+        return values, areas, constant_area, srams
+
+    def get_compound_components(self, cc_param_sets):
+        """
+        Builds the compound components of a meta_cc_combs item. The most recently used ones are kept in a bounded
+        cache, since consecutive architectures mostly share them
+        :param cc_param_sets: Subcomponent param set of each meta compound component (one of their subcomponent_combs)
+        :return: list of <Compound Component> objects, in meta_cc_name_vars order
+        """
+        cc_comb = []
+        for key in enumerate(cc_param_sets):
+            if key in self.compound_component_cache:
+                self.compound_component_cache.move_to_end(key)
+            else:
+                self.compound_component_cache[key] = self.meta_cc_name_vars[key[0]][1].build_compound_component(key[1])
+                if len(self.compound_component_cache) > COMPOUND_COMPONENT_CACHE_SIZE:
+                    self.compound_component_cache.popitem(last=False)
+            cc_comb.append(self.compound_component_cache[key])
+        return cc_comb
+
     def update_base_arch(self, param_set):
         """
         Update the base architecture from given a parameter set
@@ -109,8 +398,8 @@ class MetaArchitecture:
         """
         for i in range(len(self.pc_arg_val)):
             self.base_arch.config_label[self.param_set_labels[i]] = param_set[i]
+            # Only the components whose arguments actually change lose their cached stats (see VersionedDict)
             self.pc_arg_val[i][0].comp_args[self.pc_arg_val[i][1]] = param_set[i]
-            self.pc_arg_val[i][0].clear_cache()
 
     def create_arch_config_dicts(self, bayes_param_dict: dict):
         # Unpacks the BayesOpt kwargs dict
@@ -134,18 +423,73 @@ class MetaArchitecture:
         :param meta_cc_config_data: Nested dict: {MCC_Name: {mcc_config_label: mcc_config_data} }
         :return: Architecture object: base_arch
         """
-        continuous_param_set = np.array(tuple(arch_config_dict[label] for label in self.param_set_labels))
-        euclid_distance = lambda x, y: np.sqrt(((x - y) ** 2).sum(axis=0))
-        discrete_param_set = sorted([(euclid_distance(continuous_param_set, np.array(p)), p)
-                                     for p in self.argument_combs])[0][1]
+        return self.get_discrete_architecture(self.snap_config(arch_config_dict, meta_cc_config_data))
+
+    def snap_config(self, arch_config_dict, meta_cc_config_data=None):
+        """
+        Snaps a continuous configuration to the nearest valid architecture parameters, without building it
+        :param arch_config_dict: Architecture dict: {config_label: continuous_config_data}
+        :param meta_cc_config_data: Nested dict: {MCC_Name: {mcc_config_label: mcc_config_data} }
+        :return: tuple (discrete_param_set, tuple of the discrete param set of each MCC, or None). Hashable, so it
+        can be used to recognize repeated architectures
+        """
+        continuous_param_set = tuple(arch_config_dict[label] for label in self.param_set_labels)
+        discrete_param_set = self.argument_combs.nearest(continuous_param_set)
+        cc_param_sets = tuple(mcc.snap_config(meta_cc_config_data[name]) for name, mcc in self.meta_cc_name_vars) \
+            if meta_cc_config_data else None
+        return discrete_param_set, cc_param_sets
+
+    def get_discrete_dimensions(self):
+        """
+        Discrete search space of the architectures, used by the surrogate models of the hardware search
+        :return: list of tuples: the possible values of each architecture parameter (as in param_set_labels), then the
+        subcomponent combinations of each meta compound component
+        """
+        return list(self.argument_combs.pools) + [mcc.subcomponent_combs for _, mcc in self.meta_cc_name_vars]
+
+    def get_discrete_config(self, point):
+        """
+        :param point: One value index per dimension of get_discrete_dimensions()
+        :return: Discrete architecture parameters, as returned by snap_config
+        """
+        values = [dimension[i] for dimension, i in zip(self.get_discrete_dimensions(), point)]
+        param_num = len(self.pc_arg_val)
+        return tuple(values[:param_num]), tuple(values[param_num:]) if self.meta_cc_name_vars else None
+
+    def get_discrete_architecture(self, discrete_config):
+        """
+        :param discrete_config: Discrete architecture parameters, see snap_config
+        :return: Architecture object: base_arch
+        """
+        discrete_param_set, cc_param_sets = discrete_config
         print([(self.param_set_labels[i], discrete_param_set[i]) for i in range(len(self.param_set_labels))])
+        return self.get_configured_architecture(discrete_config)
+
+    def get_configured_architecture(self, discrete_config):
+        """
+        Same as get_discrete_architecture, without the log. The compound components come from
+        compound_component_cache, so they are shared with the other architectures that use them
+        :param discrete_config: Discrete architecture parameters, see snap_config
+        :return: Architecture object: base_arch, updated to the architecture
+        """
+        discrete_param_set, cc_param_sets = discrete_config
         self.update_base_arch(discrete_param_set)
-        # Now update_cc_from_comb as specified in mcc_config_data
-        if meta_cc_config_data:
-            cc_comb = [mcc.get_compound_component(meta_cc_config_data[name]) for name, mcc in self.meta_cc_name_vars]
-            self.update_cc_from_comb(cc_comb)
+        if cc_param_sets:
+            self.update_cc_from_comb(self.get_compound_components(cc_param_sets))
         return self.base_arch
 
+    def get_config_label(self, discrete_config):
+        """
+        Label of an architecture without building it, eg. for the compact solutions of the Searcher
+        :param discrete_config: Discrete architecture parameters, see snap_config
+        :return: dict {hardware label: value}, the config_label of the architecture
+        """
+        discrete_param_set, cc_param_sets = discrete_config
+        config_label = dict(zip(self.param_set_labels, discrete_param_set))
+        for (_, mcc), param_set in zip(self.meta_cc_name_vars, cc_param_sets if cc_param_sets else ()):
+            config_label.update(zip(mcc.subcomponent_comb_labels, param_set))
+        return config_label
+
     def update_cc_from_comb(self, cc_comb):
         """
         Update the compound components within the architecture given a compound component combination
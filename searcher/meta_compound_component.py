@@ -1,12 +1,11 @@
 import os
-import itertools
 import re
 from collections import OrderedDict
-import numpy as np
 from estimator.data_structures.primitive_component import PrimitiveComponent
-from estimator.utils import read_yaml_file
+from estimator.utils import read_yaml_file, ProductSpace
 from estimator.data_structures.compound_component import CompoundComponent
-from estimator.input_handler import database_handler as db
+from estimator.session import default_session
+from estimator.library_watcher import LibraryWatcher
 from copy import deepcopy
 
 """
@@ -14,17 +13,18 @@ Meta Compound Component Describes Compound Components that are able to be search
 the specified constraints (defined as a possibilities space)
 """
 
-meta_compound_component_library = OrderedDict()
+meta_compound_component_library = default_session.meta_compound_component_library
 
 
 def load_meta_compound_component_library(path="project_io/searcher_input/meta_components",
-                                         instance_order_file="_instance_order.yaml"):
+                                         instance_order_file="_instance_order.yaml", session=None):
     """
     Loads the meta-compound-components from a given folder, and places them into the global
     meta_compound_component_library
     :param path: Path of the compound components folder
     :param instance_order_file: File name of the _instance_order file, which describes the order in which the
     compound components should be initialized in.
+    :param session: SmartSession to load into. None means default_session (the meta_compound_component_library global)
     :return: None. Will Populate the meta_compound_component_library global.
     """
     meta_cc_load_order = []
@@ -42,8 +42,35 @@ def load_meta_compound_component_library(path="project_io/searcher_input/meta_co
             print("Incorrect formatting of compound component! File %s: " % file)
             continue
         # Create the Meta Compound Component
-        mcc = MetaCompoundComponent(yaml_data)
-        meta_compound_component_library[mcc.base_cc.comp_class] = deepcopy(mcc)
+        meta_compound_component_factory(yaml_data, session)
+
+
+def meta_compound_component_factory(yaml_data: OrderedDict, session=None):
+    """
+    Creates a Meta Compound Component from its YAML data and places it in the meta_compound_component_library
+    :param yaml_data: YAML data of a meta-compound-component file
+    :param session: SmartSession whose library the MCC is placed in. None means default_session
+    :return: The MetaCompoundComponent object
+    """
+    mcc = MetaCompoundComponent(yaml_data, session)
+    mcc.session.meta_compound_component_library[mcc.base_cc.comp_class] = deepcopy(mcc)
+    return mcc
+
+
+def watch_meta_compound_component_library(path="project_io/searcher_input/meta_components",
+                                          instance_order_file="_instance_order.yaml", session=None):
+    """
+    Creates a LibraryWatcher for a folder already loaded with load_meta_compound_component_library. Calling check() on
+    it reloads the changed meta-compound-components (and their dependents) into meta_compound_component_library
+    :param path: Path of the meta compound components folder
+    :param instance_order_file: File name of the _instance_order file
+    :param session: SmartSession the folder was loaded into. None means default_session
+    :return: LibraryWatcher object
+    """
+    session = session if session else default_session
+    return LibraryWatcher(path, 'meta_compound_component',
+                          lambda yaml_data: meta_compound_component_factory(yaml_data, session), instance_order_file,
+                          session.database_handler)
 
 
 class MetaCompoundComponent:
@@ -51,15 +78,21 @@ class MetaCompoundComponent:
     Class defining each meta-compound-component
     """
 
-    def __init__(self, yaml_data: OrderedDict):
+    def __init__(self, yaml_data: OrderedDict, session=None):
+        """
+        :param yaml_data: YAML data of a meta-compound-component file
+        :param session: SmartSession holding the IPCL and meta compound component library. None means default_session
+        """
         yaml_data = yaml_data['meta_compound_component']
+        self.session = session if session else default_session
+        db = self.session.database_handler
         self.base_cc = CompoundComponent()
         self.base_cc.name = yaml_data['name'] if 'name' in yaml_data else None
         self.base_cc.comp_class = yaml_data['class'] if 'class' in yaml_data else yaml_data['name']
         self.base_cc.component_arguments = yaml_data['arguments'] if 'arguments' in yaml_data else OrderedDict()
         self.base_cc.set_operations(yaml_data['operations'])
         self.subcomponent_var = []
-        self.subcomponent_combs = []
+        self.subcomponent_combs = ProductSpace([])  # Lazy cartesian product of the subcomponent possibilities
         self.subcomponent_comb_labels = []
 
         meta_combs = []
@@ -76,7 +109,7 @@ class MetaCompoundComponent:
                     meta_combs.append(ins_num)
                     self.subcomponent_comb_labels.append(f"hardware_{sc_name}_instances")
                 else:
-                    self.base_cc.subcomponents[sc_name] = PrimitiveComponent(sc_name, sc_class)
+                    self.base_cc.subcomponents[sc_name] = PrimitiveComponent(sc_name, sc_class, db=db)
                 # Check if there are arguments
                 if 'arguments' in subcomponent:
                     for a_key, a_val in subcomponent['arguments'].items():
@@ -85,12 +118,12 @@ class MetaCompoundComponent:
                         meta_combs.append(a_val_list)
                         self.subcomponent_comb_labels.append(f"hardware_{sc_name}_{a_key}")
                 # Get the subcomponent combs from meta_combs
-                self.subcomponent_combs = tuple(itertools.product(*meta_combs))
+                self.subcomponent_combs = ProductSpace(meta_combs)
             else:
                 # Deal with a compound subcomponent
                 #  raise NotImplementedError("Compound Component Subcomponents functionality not yet implemented!")
                 meta_combs = []
-                mcc = deepcopy(meta_compound_component_library[sc_class])
+                mcc = deepcopy(self.session.meta_compound_component_library[sc_class])
                 mcc_combs = mcc.subcomponent_combs
                 self.subcomponent_comb_labels.append(f"hardware_{sc_name}_configs_" + "_".join(
                     [string.replace("hardware_", "", 1) for string in mcc.subcomponent_comb_labels]))
@@ -102,15 +135,15 @@ class MetaCompoundComponent:
                         else [subcomponent['instances']]
                     meta_combs.append(ins_num)
                     self.subcomponent_comb_labels.append(f"hardware_{sc_name}_instances")
-                self.subcomponent_combs = tuple(itertools.product(*meta_combs))
+                self.subcomponent_combs = ProductSpace(meta_combs)
                 
 
     def get_param_bounds(self):
         # Used for Bayesian Optimization
         out_dict = {}
         for index, param_name in enumerate(self.subcomponent_comb_labels):
-            minima = min([c[index] for c in self.subcomponent_combs]) * 0.9
-            maxima = max([c[index] for c in self.subcomponent_combs]) * 1.25
+            minima = min(self.subcomponent_combs.pools[index]) * 0.9
+            maxima = max(self.subcomponent_combs.pools[index]) * 1.25
             out_dict[param_name] = (minima, maxima)
         return out_dict
 
@@ -128,16 +161,17 @@ class MetaCompoundComponent:
                     # Initiate the instances
                     for i in range(param_value):
                         n = sc_name + "_" + str(i)
-                        self.base_cc.subcomponents[n] = PrimitiveComponent(n, sc_class)
+                        self.base_cc.subcomponents[n] = PrimitiveComponent(n, sc_class,
+                                                                           db=self.session.database_handler)
                 elif param_info[1] == "argument":
                     sc_name = param_info[2]
-                    for k, v in self.base_cc.subcomponents.items():
+                    for k, v in list(self.base_cc.subcomponents.items()):
                         if re.match(f"{sc_name}_[0-9*]", k) and isinstance(v, PrimitiveComponent):
-                            v.comp_args[param_info[3]] = param_value
+                            # Copy-on-write: the previous compound components may share this subcomponent
+                            self.base_cc.subcomponents[k] = v.with_arguments({param_info[3]: param_value})
             else:
                 sc_name, mcc = param_info[2], param_info[3]
                 # We have a compound component here.
-                mcc_scc = tuple(mcc.subcomponent_combs)
                 if param_info[1] == "subcomponents":
                     curr_cc = next(mcc.iter_compound_components())
                     self.base_cc.subcomponents[sc_name] = curr_cc
@@ -151,16 +185,35 @@ class MetaCompoundComponent:
                         n = sc_name + "_" + str(i)
                         self.base_cc.subcomponents[n] = curr_cc
             self.base_cc.config_label[self.subcomponent_comb_labels[p_index]] = param_value
-        self.base_cc.clear_caches()
-        return deepcopy(self.base_cc)
+        return self.base_cc.snapshot()
+
+    def snap_config(self, config_dict):
+        """
+        Snaps a continuous configuration (eg. suggested by the Bayesian Optimization) to the nearest subcomponent
+        combination
+        :param config_dict: {subcomponent_comb_label: continuous value}
+        :return: Discrete parameter set, one of self.subcomponent_combs
+        """
+        continuous_param_set = tuple(config_dict[label] for label in self.subcomponent_comb_labels)
+        return self.subcomponent_combs.nearest(continuous_param_set)
 
     def get_compound_component(self, config_dict):
-        continuous_param_set = np.array(tuple(config_dict[label] for label in self.subcomponent_comb_labels))
-        euclid_distance = lambda x, y: np.sqrt(((x - y) ** 2).sum(axis=0))
-        discrete_param_set = sorted([(euclid_distance(continuous_param_set, p), p)
-                                     for p in self.subcomponent_combs])[0][1]
+        return self.get_discrete_compound_component(self.snap_config(config_dict))
+
+    def get_discrete_compound_component(self, discrete_param_set):
+        """
+        :param discrete_param_set: One of self.subcomponent_combs, see snap_config
+        :return: <Compound Component> object
+        """
         print(discrete_param_set)
-        return self.__get_cc_from_param_set(discrete_param_set)
+        return self.build_compound_component(discrete_param_set)
+
+    def build_compound_component(self, param_set):
+        """
+        :param param_set: One of self.subcomponent_combs
+        :return: <Compound Component> object
+        """
+        return self.__get_cc_from_param_set(param_set)
 
     def iter_compound_components(self):
         """
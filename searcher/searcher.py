@@ -3,43 +3,162 @@ from estimator.estimator import Estimator
 from searcher.meta_architecture import MetaArchitecture
 from estimator.utils import read_yaml_file
 from mappers.smapper.smapper import Smapper
+from estimator.session import default_session
 from searcher.logger import Logger
-from copy import deepcopy
+from collections import OrderedDict
+import contextlib
+import hashlib
+import json
+import socket
 import time
 import os
-from bayes_opt import BayesianOptimization
 import math
 
 
-def yaml_searcher_factory(meta_arch_path, meta_cc_path, nn_path):
+def yaml_searcher_factory(meta_arch_path, meta_cc_path, nn_path, session=None):
     """
     Initializes a Searcher object according to the parameters specified
     :param meta_arch_path: Path to the meta-architecture YAML file
     :param meta_cc_path: Path to the meta-compound-components folder
     :param nn_path: Path to the Neural Network YAML file
+    :param session: SmartSession to search in. None means default_session
     :return: Searcher object
     """
-    s = Searcher()
+    s = Searcher(session)
     s.set_nn(nn_path)
     s.set_meta_arch(meta_arch_path, meta_cc_path)
     return s
 
 
+HALVING_FIDELITIES = (1 / 16, 1 / 4, 1)  # Fraction of the firmware candidates scored in each successive halving round
+HALVING_ETA = 4  # Only the best 1 / HALVING_ETA of the architectures advance to the next round
+
+SHARD_LEASE = 3600  # Seconds a distributed search worker has to complete a shard, before it is published again
+SHARD_RETRIES = 3  # Times a shard can be published again before the distributed search fails
+SHARD_POLL = 1  # Seconds between two checks of the shard queue, when there is nothing to search
+CONSTRAINT_PENALTY = 1  # Score added per unit of distance from the constraints (see nearest_feasible_config)
+
+ANALYSIS_FEATURES = ["energy", "area", "cycle"]  # Features reported in the rank folders of the top solutions
+
+_hardware_search_state = None  # (meta_arch, firmware_mapper, fw_algorithm) of a hardware search worker
+
+
+def _init_hardware_search_worker(meta_arch, firmware_mapper, fw_algorithm):
+    global _hardware_search_state
+    firmware_mapper.workers = 1  # Pool workers cannot start pools of their own
+    _hardware_search_state = (meta_arch, firmware_mapper, fw_algorithm)
+
+
+def _search_discrete_architecture(discrete_config):
+    """
+    Runs in a batched Bayesian search worker process: firmware search of one architecture
+    :param discrete_config: Snapped architecture parameters, see MetaArchitecture.snap_config
+    :return: tuple (fw_input, score, eac, search_space, operations of the best firmware, (trial hits, trial misses) of
+    the firmware search)
+    """
+    meta_arch, firmware_mapper, fw_algorithm = _hardware_search_state
+    return _search_firmware(firmware_mapper, meta_arch.get_configured_architecture(discrete_config), fw_algorithm)
+
+
+def _search_indexed_architecture(index):
+    """
+    Runs in a parallel linear search worker process: firmware search of one architecture. Each worker builds the
+    architecture from its index on its own copy of the meta-architecture
+    :param index: Position of the architecture in MetaArchitecture.iter_architectures()
+    :return: see _search_discrete_architecture
+    """
+    meta_arch, firmware_mapper, fw_algorithm = _hardware_search_state
+    return _search_firmware(firmware_mapper, meta_arch.get_indexed_architecture(index), fw_algorithm)
+
+
+def _file_digest(path):
+    """
+    :return: SHA-256 hex digest of the content of the file at path
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _as_tuples(data):
+    """
+    Turns the lists of a JSON checkpoint entry back into tuples, so that its keys and results compare equal to the
+    original ones
+    """
+    return tuple(_as_tuples(x) for x in data) if isinstance(data, list) else data
+
+
+def _write_solution_analysis(meta_arch, solution):
+    """
+    Writes the reports of one top solution into its rank folder. Its architecture is built again and its best firmware
+    estimated with Estimator.build_reports(), from the operations kept by the search (no Operationalizer runs here)
+    :param solution: tuple (rank folder, discrete config, operations of the best firmware)
+    :return: None
+    """
+    solution_folder, discrete_config, operations = solution
+    architecture = meta_arch.get_configured_architecture(discrete_config)
+    for report in Estimator(architecture, list(operations)).build_reports(ANALYSIS_FEATURES).values():
+        report.write(solution_folder)
+
+
+def _write_solution_analysis_worker(solution):
+    """
+    Runs in an analysis worker process, see _write_solution_analysis
+    """
+    _write_solution_analysis(_hardware_search_state[0], solution)
+
+
+def _search_firmware(firmware_mapper, architecture, fw_algorithm):
+    """
+    Firmware search of one architecture. Its result keeps the operations of the best firmware, a short list, so that
+    the analysis of the top solutions does not have to run the Operationalizer again
+    :return: see _search_discrete_architecture
+    """
+    hits, misses = firmware_mapper.trial_stats.values()
+    firmware_mapper.architecture = architecture
+    firmware_mapper.run_operationalizer()
+    fw_input, score, eac = firmware_mapper.search_firmware(algorithm=fw_algorithm)
+    operations = firmware_mapper.get_operations_from_param(tuple(fw_input[x] for x in firmware_mapper.fw_param_labels))
+    return fw_input, score, eac, len(firmware_mapper.param_op_map), operations, \
+        (firmware_mapper.trial_stats["hits"] - hits, firmware_mapper.trial_stats["misses"] - misses)
+
+
 class Searcher:
     """
     SMART Searcher is a hardware searcher that will search for hardware architectures given a neural network and a
-    set of architecture constraints.
+    set of architecture constraints. With batch_size > 1 the Bayesian hardware search suggests batch_size architectures
+    per iteration, whose firmware searches run at the same time on `workers` processes (the linear hardware search
+    also runs on them). The surrogate model of the Bayesian hardware search is a Gaussian Process by default, or a
+    discrete model from searcher.surrogate
     """
-    def __init__(self):
+    def __init__(self, session=None):
+        """
+        :param session: SmartSession holding the IPCL and meta compound component library. None means default_session
+        """
+        self.session = session if session else default_session
+        self.batch_size = 1  # Architectures suggested per Bayesian iteration
+        self.workers = 1  # Processes the firmware searches of a batch (or of the linear search) run on
+        self.surrogate = "gp"  # Model of the Bayesian hardware search: "gp" (bayes_opt), or one of surrogate.SURROGATES
+        self.shard_queue = None  # ShardQueue of the distributed hardware search. None means a LocalShardQueue
+        self.shard_size = 16  # Architectures per shard of the distributed hardware search
+        self.checkpoint_path = None  # JSONL file the results of the firmware searches are saved to, see resume
+        self.checkpoint_file = None
+        self.checkpoint_results = OrderedDict()  # Checkpoint key : result of the firmware search, see _search_firmware
+        self.input_files = OrderedDict()  # "nn", "meta_arch" : (absolute path, SHA-256), described in the checkpoint
+        self.meta_cc_path = None
         self.meta_arch = None
-        self.firmware_mapper = Smapper()
+        self.firmware_mapper = Smapper(self.session)
         self.hw_fw_result = list()
         self.combinations_searched = 0
         self.bayes_percentile = []
         self.logger = Logger()
-        self.top_solutions = []
+        self.top_solutions = []  # [score, fw_input, (energy, area, cycle), discrete config], best first
+        # Discrete config : operations of its best firmware, kept for the top solutions, see _write_solution_analysis
+        self.solution_operations = OrderedDict()
+        self.trial_stats = OrderedDict([("hits", 0), ("misses", 0)])  # Bayesian hardware trials, see __bayes_trial
         self.algorithm_map = {"linear": self.__linear_hardware_search,
-                              "bayes": self.__bayes_hardware_search}
+                              "bayes": self.__bayes_hardware_search,
+                              "halving": self.__halving_hardware_search,
+                              "distributed": self.__distributed_hardware_search}
 
     def set_nn(self, nn_path):
         """
@@ -49,6 +168,7 @@ class Searcher:
         :return: None
         """
         self.firmware_mapper.set_nn(nn_path)
+        self.input_files["nn"] = (os.path.abspath(nn_path), _file_digest(nn_path))
 
     def set_meta_arch(self, meta_arch_path, meta_cc_path):
         """
@@ -59,25 +179,37 @@ class Searcher:
         :param meta_cc_path: Path to the meta-compound-component directory
         :return: None
         """
-        self.meta_arch = MetaArchitecture(read_yaml_file(meta_arch_path), meta_cc_path)
+        self.meta_arch = MetaArchitecture(read_yaml_file(meta_arch_path), meta_cc_path, self.session)
         self.meta_arch.load_argument_combinations()
+        self.input_files["meta_arch"] = (os.path.abspath(meta_arch_path), _file_digest(meta_arch_path))
+        self.meta_cc_path = os.path.abspath(meta_cc_path)
 
-    def search_combinations(self, top_solutions_num=3, hw_algorithm="bayes", fw_algorithm="bayes", verbose=False):
+    def search_combinations(self, top_solutions_num=3, hw_algorithm="bayes", fw_algorithm="bayes", verbose=False,
+                            resume=False):
         """
         Key algorithm to (1) search for different hardware-firmware combinations, (2) rank all these HW-FW combinations,
         and (3) output detailed component analysis for the top N architectures
         :param hw_algorithm: Algorithm used to search for hardware. Currently supports Bayesian Optimization ('bayes'),
-        which is default, and linear-exhaustive search ('linear')
+        which is default, linear-exhaustive search ('linear'), successive halving ('halving') and linear-exhaustive
+        search distributed over the workers of shard_queue ('distributed')
         :param top_solutions_num: Number of top solutions to be analyzed in detail
         :param fw_algorithm: Algorithm used to search for firmware. Currently supports Bayesian Optimization ('bayes'),
-        which is default, and linear-exhaustive search ('linear')
+        which is default, linear-exhaustive search ('linear') and analytical linear search ('analytical')
         :param verbose: Whether the output log should include details of all the different hardware-firmware
         combinations searched
-        :return: None. Will output search results in test_run folder, keeping track of search log details etc.
+        :param resume: Resume the search saved in checkpoint_path: the architectures it holds are not searched again
+        :return: Path of the output directory. Will output search results in test_run folder, keeping track of search
+        log details etc.
         """
 
         start_time = time.time()
-        self.algorithm_map[hw_algorithm](top_solutions_num, fw_algorithm, verbose)
+        self.__open_checkpoint(top_solutions_num, hw_algorithm, fw_algorithm, resume)
+        try:
+            self.algorithm_map[hw_algorithm](top_solutions_num, fw_algorithm, verbose)
+        finally:
+            if self.checkpoint_file:
+                self.checkpoint_file.close()
+                self.checkpoint_file = None
         end_time = time.time()
         # Summarize the search, create output directory
         run_id = time.time_ns()
@@ -85,76 +217,421 @@ class Searcher:
         os.mkdir(out_dir)
         self.logger.add_line("=" * 50)
         self.logger.add_line(f"Total: {self.combinations_searched} combinations searched")
+        if self.meta_arch.constraints:
+            self.logger.add_line(f"Constraints: {self.meta_arch.count_feasible_architectures()} of "
+                                 f"{self.meta_arch.count_architectures()} architectures are feasible")
+        for name, stats in (("Hardware", self.trial_stats), ("Firmware", self.firmware_mapper.trial_stats)):
+            if stats["hits"] + stats["misses"]:
+                self.logger.add_line(f"{name} Bayesian trials: {stats['hits'] + stats['misses']} "
+                                     f"({stats['hits']} repeated, answered from the trial cache)")
         self.logger.add_line("=" * 50)
         self.logger.add_line(f"Top solutions found:")
-        for solution_i in range(top_solutions_num):
-            solution = self.top_solutions[solution_i]
+        # Fewer than top_solutions_num if the constraints left fewer architectures to search
+        for solution_i, solution in enumerate(self.top_solutions):
             self.logger.add_line(f"#{solution_i + 1}\t\t{'*' * 20}")
             self.logger.add_line(f"\t\tScore: {solution[0]}")
             self.logger.add_line(f"\t\tEnergy (pJ), Area (um^2), Cycle: {solution[2]}")
-            self.logger.add_line(f"\t\tHardware: {solution[3].config_label}")
+            self.logger.add_line(f"\t\tHardware: {self.meta_arch.get_config_label(solution[3])}")
             self.logger.add_line(f"\t\tFirmware: {solution[1]}")
         self.logger.add_line(f"Execution time: {end_time - start_time} seconds")
         self.logger.write_out(os.path.join(out_dir, "search_log.txt"))
-        # Retrieve the optimal architecture + operations, and analyze in detail. (Pie charts)
-        #   Do this by running Estimator again with analysis = True
-        for i in range(top_solutions_num):
+        # Detailed analysis of the top solutions (Pie charts), from the reports kept during the search
+        self.__write_analysis(out_dir)
+        return out_dir
+
+    def __write_analysis(self, out_dir):
+        """
+        Writes the reports of each top solution into its rank folder, on `workers` processes. Only the final top
+        solutions are estimated, from the operations of their best firmware (see solution_operations)
+        :return: None
+        """
+        solutions = []
+        for i, (_, _, _, discrete_config) in enumerate(self.top_solutions):
             solution_folder = os.path.join(out_dir, f"rank{i + 1}")
-            os.mkdir(os.path.join(out_dir, f"rank{i + 1}"))
-            analysis_arch = self.top_solutions[i][3]
-            # Reset the firmware mapper to the winning architecture model
-            self.firmware_mapper.architecture = analysis_arch
-            self.firmware_mapper.run_operationalizer()  # To get the param_op map
-            firmware_config = self.top_solutions[i][1]
-            # print(firmware_config, self.firmware_mapper.fw_param_labels)
-            param_op = tuple(firmware_config[x] for x in self.firmware_mapper.fw_param_labels)
-            analysis_op = self.firmware_mapper.param_op_map[param_op]
-            analysis_estimator = Estimator(analysis_arch, analysis_op)
-            analysis_estimator.estimate(["energy", "area", "cycle"], analysis=True, out_dir=solution_folder)
+            os.mkdir(solution_folder)
+            solutions.append((solution_folder, discrete_config, self.solution_operations[discrete_config]))
+        if self.workers > 1 and len(solutions) > 1:
+            with self.session.process_pool(min(self.workers, len(solutions)), _init_hardware_search_worker,
+                                           (self.meta_arch, self.firmware_mapper, None)) as pool:
+                list(pool.map(_write_solution_analysis_worker, solutions))
+            return
+        for solution in solutions:
+            _write_solution_analysis(self.meta_arch, solution)
 
     def __bayes_hardware_search(self, top_solutions_num=3, fw_algorithm="bayes", verbose=False):
+        trial_cache = OrderedDict()  # Snapped architecture parameters : score of its firmware search
+        infeasible = [0]  # Suggestions that do not meet the constraints, snapped to the nearest feasible architecture
+
         def __bayes_trial(**kwargs):
             param_set = locals()['kwargs']
             a_params, mcc_params = self.meta_arch.create_arch_config_dicts(param_set)
-            architecture = self.meta_arch.get_architecture(a_params, mcc_params)
-            # Since we wish to maximize, we *-1
-            return -1 * self.__search_architecture(architecture, top_solutions_num, fw_algorithm, verbose)
-
-        bayes_model = BayesianOptimization(f=__bayes_trial,
-                                           pbounds={**self.meta_arch.get_param_bounds(),
-                                                    **self.meta_arch.get_mcc_param_bounds(flatten=True)},
-                                           random_state=10)
-
-        seed_num = math.ceil(len(self.meta_arch.argument_combs) * len(self.meta_arch.meta_cc_combs) * 0.05)
-        bayes_model.maximize(seed_num * 3, seed_num * 2, kappa=1)
-
-    def __search_architecture(self, architecture, top_solutions_num, fw_algorithm, verbose):
-        algorithm_names = {'bayes': 'Bayesian Opt', 'linear': 'linear search'}
-        self.firmware_mapper.architecture = architecture
-        self.firmware_mapper.run_operationalizer()
-        # Firmware operations search, using Bayesian Optimization algorithm
-        fw_input, score, eac = self.firmware_mapper.search_firmware(algorithm=fw_algorithm)
-        search_space = len(self.firmware_mapper.param_op_map)
+            # Different suggestions often snap to the same architecture, which is then only searched once
+            discrete_config = self.meta_arch.snap_config(a_params, mcc_params)
+            discrete_config, distance = self.meta_arch.nearest_feasible_config(discrete_config)
+            infeasible[0] += distance > 0
+            if discrete_config in trial_cache:
+                self.trial_stats["hits"] += 1
+            else:
+                self.trial_stats["misses"] += 1
+                trial_cache[discrete_config] = self.__search_architecture(discrete_config, top_solutions_num,
+                                                                          fw_algorithm, verbose, discrete_config)
+            # Since we wish to maximize, we *-1. Suggestions outside the constraints are penalized by their distance
+            return -1 * (trial_cache[discrete_config] + CONSTRAINT_PENALTY * distance)
+
+        def __bayes_trials(discrete_configs, pool):
+            """
+            Evaluates a batch of architectures at once (see batch_maximize and discrete_maximize). The architectures
+            not searched yet are searched on the process pool, if there is one. Architectures that do not meet the
+            constraints get the target of the nearest feasible one, penalized by their distance to it
+            :param discrete_configs: list of discrete architecture parameters, see MetaArchitecture.snap_config
+            :return: list of the targets of the batch
+            """
+            feasible, distances = zip(*(self.meta_arch.nearest_feasible_config(c) for c in discrete_configs))
+            infeasible[0] += sum(distance > 0 for distance in distances)
+            missing = list(OrderedDict.fromkeys(c for c in feasible if c not in trial_cache))
+            self.trial_stats["hits"] += len(feasible) - len(missing)
+            self.trial_stats["misses"] += len(missing)
+            if pool:
+                searched = [c for c in missing if c not in self.checkpoint_results]
+                results = OrderedDict(zip(searched, pool.map(_search_discrete_architecture, searched)))
+                for discrete_config in missing:
+                    if discrete_config in results:
+                        self.__save_checkpoint(discrete_config, results[discrete_config])
+                    else:
+                        results[discrete_config] = self.checkpoint_results[discrete_config]
+                    trial_cache[discrete_config] = self.__record_result(discrete_config, results[discrete_config],
+                                                                        top_solutions_num, fw_algorithm, verbose)
+            else:
+                for discrete_config in missing:
+                    trial_cache[discrete_config] = self.__search_architecture(discrete_config, top_solutions_num,
+                                                                              fw_algorithm, verbose, discrete_config)
+            return [-1 * (trial_cache[c] + CONSTRAINT_PENALTY * distance) for c, distance in zip(feasible, distances)]
+
+        seed_num = math.ceil(self.meta_arch.count_architectures() * 0.05)
+        if self.surrogate != "gp":
+            # Discrete surrogate: the suggestions are valid architectures, nothing needs to be snapped
+            from searcher.surrogate import SURROGATES, discrete_maximize
+            surrogate = SURROGATES[self.surrogate](self.meta_arch.get_discrete_dimensions(), random_state=10)
+            get_config = self.meta_arch.get_discrete_config
+            with self.__hardware_search_pool(fw_algorithm) as pool:
+                discrete_maximize(lambda batch: __bayes_trials([get_config(p) for p in batch], pool),
+                                  surrogate, seed_num * 3, seed_num * 2, self.batch_size)
+        else:
+            self.__gp_hardware_search(__bayes_trial, __bayes_trials, seed_num, fw_algorithm)
+        if infeasible[0]:
+            self.logger.add_line(f"{infeasible[0]} Bayesian suggestions did not meet the constraints, snapped to the "
+                                 f"nearest feasible architecture")
+
+    def __gp_hardware_search(self, bayes_trial, bayes_trials, seed_num, fw_algorithm):
+        """
+        Bayesian hardware search with the Gaussian Process of bayes_opt, whose suggestions are snapped to architectures
+        :param bayes_trial: function(**param_set) -> target, for one suggestion at a time
+        :param bayes_trials: function(list of discrete configs, process pool) -> targets, for batches of suggestions
+        """
+        from bayes_opt import BayesianOptimization
+        param_bounds = {**self.meta_arch.get_param_bounds(), **self.meta_arch.get_mcc_param_bounds(flatten=True)}
+        if self.batch_size > 1:
+            from mappers.smapper.batch_bayes import batch_maximize
+            snap = lambda param_set: self.meta_arch.snap_config(*self.meta_arch.create_arch_config_dicts(param_set))
+            with self.__hardware_search_pool(fw_algorithm) as pool:
+                batch_maximize(lambda batch: bayes_trials([snap(p) for p in batch], pool),
+                               param_bounds, seed_num * 3, seed_num * 2, self.batch_size, kappa=1, random_state=10)
+        else:
+            bayes_model = BayesianOptimization(f=bayes_trial,
+                                               pbounds=param_bounds,
+                                               random_state=10)
+            bayes_model.maximize(seed_num * 3, seed_num * 2, kappa=1)
+
+    def __halving_hardware_search(self, top_solutions_num=3, fw_algorithm="bayes", verbose=False):
+        """
+        Successive halving: every architecture is first scored with a cheap proxy, Smapper.estimate_firmware_sample()
+        on a small sample of its firmware candidates. Only the best 1 / HALVING_ETA (and at least
+        top_solutions_num * HALVING_ETA) advance to the next round, which samples more of the firmware, and the
+        finalists get a full firmware search with fw_algorithm
+        :return: None. Updates top_solutions
+        """
+        survivors = list(self.meta_arch.iter_feasible_indices())
+        for round_index, fraction in enumerate(HALVING_FIDELITIES):
+            scores = []
+            for index in survivors:
+                self.firmware_mapper.architecture = self.meta_arch.get_indexed_architecture(index)
+                self.firmware_mapper.run_operationalizer()
+                scores.append(self.firmware_mapper.estimate_firmware_sample(fraction, seed=index))
+            keep = max(top_solutions_num * HALVING_ETA, math.ceil(len(survivors) / HALVING_ETA))
+            # Architectures without any valid firmware are dropped. Ties keep the iter_architectures order
+            ranking = [i for i in sorted(range(len(survivors)), key=lambda i: -scores[i]) if scores[i] > -math.inf]
+            self.logger.add_line(f"Successive halving round {round_index + 1}: {len(survivors)} architectures scored "
+                                 f"on {fraction:.1%} of their firmware, {min(keep, len(ranking))} kept")
+            survivors = sorted(survivors[i] for i in ranking[:keep])
+        for index in survivors:
+            self.__search_architecture(self.meta_arch.get_indexed_config(index), top_solutions_num, fw_algorithm,
+                                       verbose, index)
+
+    def __hardware_search_pool(self, fw_algorithm):
+        if self.workers <= 1:
+            return contextlib.nullcontext()
+        return self.session.process_pool(self.workers, _init_hardware_search_worker,
+                                         (self.meta_arch, self.firmware_mapper, fw_algorithm))
+
+    def __search_architecture(self, discrete_config, top_solutions_num, fw_algorithm, verbose, key=None):
+        """
+        Firmware search of one architecture, unless the checkpoint of a resumed search already holds its result (then
+        the architecture is not even built)
+        :param discrete_config: Discrete architecture parameters, see MetaArchitecture.snap_config
+        :param key: Checkpoint key of the architecture: its index, or its discrete config for the Bayesian search. None
+        means that the result is not checkpointed
+        :return: score
+        """
+        if key is not None and key in self.checkpoint_results:
+            result = self.checkpoint_results[key]
+        else:
+            architecture = self.meta_arch.get_configured_architecture(discrete_config)
+            trial_stats = OrderedDict(self.firmware_mapper.trial_stats)
+            result = _search_firmware(self.firmware_mapper, architecture, fw_algorithm)
+            self.firmware_mapper.trial_stats.update(trial_stats)  # Added back from the result by __record_result
+            self.__save_checkpoint(key, result)
+        return self.__record_result(discrete_config, result, top_solutions_num, fw_algorithm, verbose)
+
+    def __open_checkpoint(self, top_solutions_num, hw_algorithm, fw_algorithm, resume):
+        """
+        Opens checkpoint_path, if there is one. Its first line describes the search (see __checkpoint_header), and each
+        of the next lines holds the key and the result of one firmware search. When resuming, the results are loaded
+        into checkpoint_results: the search then runs again from the start, but takes these results instead of
+        searching the architectures again. The Bayesian optimizers are seeded, so they suggest the same points again
+        and their models are rebuilt from the same observations, up to where the search stopped
+        :return: None
+        """
+        self.checkpoint_results = OrderedDict()
+        if not self.checkpoint_path:
+            assert not resume, "Resuming a search needs its checkpoint_path"
+            return
+        header = self.__checkpoint_header(top_solutions_num, hw_algorithm, fw_algorithm)
+        if resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                lines = f.read().splitlines()
+            saved = json.loads(lines[0]) if lines else OrderedDict()
+            changed = [name for name in header if saved.get(name) != header[name]]
+            assert not changed, f"{self.checkpoint_path} is the checkpoint of another search: its " \
+                                f"{', '.join(changed)} differ from the ones of this search"
+            for line in lines[1:]:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Last line cut short by the crash
+                self.checkpoint_results[_as_tuples(entry["key"])] = _as_tuples(entry["result"])
+            self.logger.add_line(f"Resumed from {self.checkpoint_path}: {len(self.checkpoint_results)} architectures "
+                                 f"already searched")
+        # Rewritten, so that a line cut short by a crash does not end up in the middle of the file
+        with open(f"{self.checkpoint_path}.tmp", "w") as f:
+            f.write(json.dumps(header) + "\n")
+            for key, result in self.checkpoint_results.items():
+                f.write(self.__encode_checkpoint_entry(key, result))
+        os.replace(f"{self.checkpoint_path}.tmp", self.checkpoint_path)
+        self.checkpoint_file = open(self.checkpoint_path, "a")
+
+    def __checkpoint_header(self, top_solutions_num, hw_algorithm, fw_algorithm):
+        """
+        A search can only be resumed from the checkpoint of the same search: same options, same input files (paths and
+        content) and same space of architectures
+        :return: OrderedDict describing the search, first line of its checkpoint
+        """
+        header = OrderedDict([("hw_algorithm", hw_algorithm), ("fw_algorithm", fw_algorithm),
+                              ("top_solutions_num", top_solutions_num)])
+        for name, (path, digest) in self.input_files.items():
+            header[f"{name}_path"] = path
+            header[f"{name}_sha256"] = digest
+        header["meta_cc_path"] = self.meta_cc_path
+        header["architectures"] = self.meta_arch.count_architectures()
+        header["feasible_architectures"] = self.meta_arch.count_feasible_architectures()
+        return header
+
+    def __save_checkpoint(self, key, result):
+        """
+        Appends the result of a firmware search to the checkpoint, which is flushed after every architecture
+        :return: None
+        """
+        if self.checkpoint_file and key is not None:
+            self.checkpoint_file.write(self.__encode_checkpoint_entry(key, result))
+            self.checkpoint_file.flush()
+
+    @staticmethod
+    def __encode_checkpoint_entry(key, result):
+        return json.dumps({"key": key, "result": result}, default=lambda o: o.item()) + "\n"
+
+    def __record_result(self, discrete_config, result, top_solutions_num, fw_algorithm, verbose):
+        """
+        Records the result of the firmware search of an architecture (see _search_firmware)
+        :return: score
+        """
+        fw_input, score, eac, search_space, operations, (hits, misses) = result
+        self.firmware_mapper.trial_stats["hits"] += hits
+        self.firmware_mapper.trial_stats["misses"] += misses
+        return self.__record_solution(discrete_config, fw_input, score, eac, search_space, operations,
+                                      top_solutions_num, fw_algorithm, verbose)
+
+    def __record_solution(self, discrete_config, fw_input, score, eac, search_space, operations, top_solutions_num,
+                          fw_algorithm, verbose):
+        """
+        Logs the best firmware found for an architecture, and keeps it if it is one of the top solutions. Solutions
+        keep the discrete config of their architecture, not a copy of it
+        :param operations: Operations of the best firmware, kept with the solution (see solution_operations)
+        :return: score
+        """
+        algorithm_names = {'bayes': 'Bayesian Opt', 'linear': 'linear search', 'analytical': 'analytical search'}
         if verbose:
             self.logger.add_line("=" * 50)
-            self.logger.add_line(f"Hardware param: {architecture.config_label}")
+            self.logger.add_line(f"Hardware param: {self.meta_arch.get_config_label(discrete_config)}")
             self.logger.add_line(f"Firmware param (Best from {algorithm_names[fw_algorithm]}): {fw_input}")
             self.logger.add_line(f"\t\tScore: {score}")
             self.logger.add_line(f"\t\tEnergy (pJ), Area (um^2), Cycle: {eac}")
             self.logger.add_line(f"Search space: {search_space} firmware possibilities")
         self.combinations_searched += search_space
         if len(self.top_solutions) < top_solutions_num:
-            self.top_solutions.append([score, fw_input, eac, deepcopy(architecture)])
+            self.top_solutions.append([score, fw_input, eac, discrete_config])
             self.top_solutions.sort(key=lambda x: x[0])
         elif score < self.top_solutions[-1][0]:
-            self.top_solutions[-1] = [score, fw_input, eac, deepcopy(architecture)]
+            self.solution_operations.pop(self.top_solutions[-1][3], None)
+            self.top_solutions[-1] = [score, fw_input, eac, discrete_config]
             self.top_solutions.sort(key=lambda x: x[0])
+        else:
+            return score
+        self.solution_operations[discrete_config] = operations
         return score
 
     def __linear_hardware_search(self, top_solutions_num=3, fw_algorithm="bayes", verbose=False):
         start_time = time.time()
-        algorithm_names = {'bayes': 'Bayesian Opt', 'linear': 'linear search'}
-        # Outer loop: hardware architecture search
-        for architecture in self.meta_arch.iter_architectures():
+        algorithm_names = {'bayes': 'Bayesian Opt', 'linear': 'linear search', 'analytical': 'analytical search'}
+        if self.workers > 1:
+            self.__parallel_linear_hardware_search(top_solutions_num, fw_algorithm, verbose)
+            return
+        # Outer loop: hardware architecture search. Architectures that do not meet the constraints are skipped
+        for index in self.meta_arch.iter_feasible_indices():
             # Inner loop: firmware operations search
-            self.__search_architecture(architecture, top_solutions_num, fw_algorithm, verbose)
+            self.__search_architecture(self.meta_arch.get_indexed_config(index), top_solutions_num, fw_algorithm,
+                                       verbose, index)
+
+    def __parallel_linear_hardware_search(self, top_solutions_num=3, fw_algorithm="bayes", verbose=False):
+        """
+        Linear hardware search on `workers` processes. iter_architectures() updates a single base architecture in
+        place, so the workers are sent architecture indices instead (see MetaArchitecture.get_indexed_architecture),
+        in chunks. Results come back in index order and are recorded in that order, so the top solutions (and their
+        tie-breaking) and combinations_searched are the same as in the serial search
+        :return: None. Updates top_solutions
+        """
+        feasible = list(self.meta_arch.iter_feasible_indices())
+        missing = [index for index in feasible if index not in self.checkpoint_results]
+        chunk_size = max(1, math.ceil(len(missing) / (self.workers * 4)))
+        with self.__hardware_search_pool(fw_algorithm) as pool:
+            results = pool.map(_search_indexed_architecture, missing, chunksize=chunk_size)
+            for index in feasible:
+                if index in self.checkpoint_results:
+                    result = self.checkpoint_results[index]
+                else:
+                    result = next(results)
+                    self.__save_checkpoint(index, result)
+                self.__record_result(self.meta_arch.get_indexed_config(index), result, top_solutions_num,
+                                     fw_algorithm, verbose)
+
+    def __distributed_hardware_search(self, top_solutions_num=3, fw_algorithm="bayes", verbose=False):
+        """
+        Coordinator of a distributed linear hardware search. The architecture indices are split into shards of
+        shard_size architectures, which are published to shard_queue. Workers (see work_shards(), eg. on other machines
+        sharing a DirectoryShardQueue) send back the top solutions of each shard, and the coordinator merges them. It
+        also searches shards itself while it waits, so with a LocalShardQueue it runs the whole search. Shards claimed
+        for more than SHARD_LEASE seconds without a result are published again, up to SHARD_RETRIES times. The results
+        are the same as the linear search, except that the verbose log only has one line per shard
+        :return: None. Updates top_solutions
+        """
+        from searcher.shard_queue import LocalShardQueue
+        queue = self.shard_queue if self.shard_queue else LocalShardQueue()
+        assert not queue.closed(), "The shard queue belongs to a search that is already over"
+        shards = OrderedDict()
+        for shard_id, shard_space in enumerate(self.meta_arch.architecture_space.shards(self.shard_size)):
+            shards[shard_id] = {"id": shard_id, "start": shard_space.indices.start, "stop": shard_space.indices.stop}
+            queue.publish(shards[shard_id])
+        results = OrderedDict()
+        retries = OrderedDict.fromkeys(shards, 0)
+        with self.__hardware_search_pool(fw_algorithm) as pool:
+            while len(results) < len(shards):
+                for shard_id, result in queue.collect().items():
+                    results.setdefault(shard_id, result)  # A shard published again can be completed twice
+                for shard_id in queue.expired(SHARD_LEASE):
+                    if shard_id in results:
+                        continue
+                    assert retries[shard_id] < SHARD_RETRIES, f"Shard {shard_id} was lost {SHARD_RETRIES + 1} times"
+                    retries[shard_id] += 1
+                    self.logger.add_line(f"Shard {shard_id} was not completed in {SHARD_LEASE} seconds, published "
+                                         f"again")
+                    queue.release(shard_id)
+                if len(results) < len(shards) and not self.__work_shard(queue, top_solutions_num, fw_algorithm, pool):
+                    time.sleep(SHARD_POLL)
+        queue.close()
+        solutions = []
+        for shard_id, shard in shards.items():
+            result = results[shard_id]
+            if verbose:
+                self.logger.add_line(f"Shard {shard_id}: architectures {shard['start']} to {shard['stop'] - 1}, "
+                                     f"{result['combinations']} combinations searched by {result['worker']}")
+            self.combinations_searched += result["combinations"]
+            self.firmware_mapper.trial_stats["hits"] += result["trials"][0]
+            self.firmware_mapper.trial_stats["misses"] += result["trials"][1]
+            solutions.extend(result["top"])
+        # Same tie-breaking as the linear search: the first architecture (in index order) wins
+        solutions.sort(key=lambda x: (x[2], x[0]))
+        for index, fw_input, score, eac, operations in solutions[:top_solutions_num]:
+            discrete_config = self.meta_arch.get_indexed_config(index)
+            self.top_solutions.append([score, fw_input, tuple(eac), discrete_config])
+            self.solution_operations[discrete_config] = operations
+
+    def work_shards(self, queue, top_solutions_num=3, fw_algorithm="bayes", idle_timeout=None):
+        """
+        Worker of a distributed hardware search: searches the shards of the queue until the coordinator closes it. The
+        meta-architecture and neural network must be the same as the coordinator's. With workers > 1, the
+        architectures of the shards are searched on a process pool, started once for all the shards
+        :param queue: ShardQueue shared with the coordinator
+        :param top_solutions_num: Number of top solutions of the coordinator's search
+        :param fw_algorithm: Firmware algorithm of the coordinator's search
+        :param idle_timeout: Seconds without any shard to search after which the worker stops. None means no limit
+        :return: Number of shards searched
+        """
+        shards_searched = 0
+        idle_since = time.time()
+        with self.__hardware_search_pool(fw_algorithm) as pool:
+            while not queue.closed():
+                if self.__work_shard(queue, top_solutions_num, fw_algorithm, pool):
+                    shards_searched += 1
+                    idle_since = time.time()
+                elif idle_timeout is not None and time.time() - idle_since > idle_timeout:
+                    break
+                else:
+                    time.sleep(SHARD_POLL)
+        return shards_searched
+
+    def __work_shard(self, queue, top_solutions_num, fw_algorithm, pool=None):
+        """
+        Claims a shard of the queue and completes it with a compact result: the top solutions of the shard (as
+        [index, fw_input, score, eac, operations] lists), the number of combinations searched and the firmware trial
+        stats
+        :param pool: Process pool of the hardware search (see __hardware_search_pool). None means a serial search
+        :return: False if there was no shard to claim, True otherwise
+        """
+        shard = queue.claim()
+        if shard is None:
+            return False
+        indices = list(self.meta_arch.iter_feasible_indices(shard["start"], shard["stop"]))
+        if pool:
+            results = list(pool.map(_search_indexed_architecture, indices))
+        else:
+            trial_stats = OrderedDict(self.firmware_mapper.trial_stats)
+            results = [_search_firmware(self.firmware_mapper, self.meta_arch.get_indexed_architecture(index),
+                                        fw_algorithm) for index in indices]
+            self.firmware_mapper.trial_stats.update(trial_stats)  # Counted by the coordinator, from the result
+        solutions = sorted(([index, fw_input, score, eac, operations]
+                            for index, (fw_input, score, eac, _, operations, _) in zip(indices, results)),
+                           key=lambda x: (x[2], x[0]))
+        queue.complete(shard["id"], {"id": shard["id"], "worker": f"{socket.gethostname()}:{os.getpid()}",
+                                     "top": solutions[:top_solutions_num],
+                                     "combinations": sum(result[3] for result in results),
+                                     "trials": [sum(result[5][0] for result in results),
+                                                sum(result[5][1] for result in results)]})
+        return True
@@ -0,0 +1,200 @@
+import json
+import os
+import time
+from collections import OrderedDict, deque
+
+"""
+Work queues between the coordinator of a distributed hardware search and its workers (see Searcher). The coordinator
+publishes shards, ie. JSON-serializable dicts with an "id" key, workers claim them and complete them with a compact
+result dict. A claimed shard that gets no result (eg. its worker was lost) can be released, so that another worker
+claims it again. LocalShardQueue lives in a single process; DirectoryShardQueue is a directory on a filesystem shared
+by the coordinator and the workers, so they can run on different machines
+"""
+
+
+class ShardQueue:
+    """
+    Interface of a shard queue
+    """
+
+    def publish(self, shard):
+        """
+        :param shard: Shard dict, with an "id" key
+        :return: None
+        """
+        raise NotImplementedError
+
+    def claim(self):
+        """
+        :return: A published shard that no worker has claimed yet, or None if there is none. The shard is then claimed
+        """
+        raise NotImplementedError
+
+    def release(self, shard_id):
+        """
+        Makes a claimed shard available again, eg. when its worker was lost
+        :return: None
+        """
+        raise NotImplementedError
+
+    def complete(self, shard_id, result):
+        """
+        :param shard_id: id of a claimed shard
+        :param result: JSON-serializable result dict
+        :return: None
+        """
+        raise NotImplementedError
+
+    def collect(self):
+        """
+        :return: OrderedDict {shard id: result} of the shards completed since the last call
+        """
+        raise NotImplementedError
+
+    def expired(self, lease):
+        """
+        :param lease: Seconds a worker has to complete a shard
+        :return: list of the ids of the shards claimed more than lease seconds ago, and still not completed
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Tells the workers that no more shards will be published
+        :return: None
+        """
+        raise NotImplementedError
+
+    def closed(self):
+        raise NotImplementedError
+
+
+class LocalShardQueue(ShardQueue):
+    """
+    In-memory queue, for a coordinator that searches all the shards itself (and for tests)
+    """
+
+    def __init__(self):
+        self.pending = deque()
+        self.claimed = OrderedDict()  # shard id : (shard, claim time)
+        self.results = OrderedDict()
+        self.is_closed = False
+
+    def publish(self, shard):
+        self.pending.append(shard)
+
+    def claim(self):
+        if not self.pending:
+            return None
+        shard = self.pending.popleft()
+        self.claimed[shard["id"]] = (shard, time.time())
+        return shard
+
+    def release(self, shard_id):
+        if shard_id in self.claimed:
+            self.pending.append(self.claimed.pop(shard_id)[0])
+
+    def complete(self, shard_id, result):
+        self.claimed.pop(shard_id, None)
+        self.results[shard_id] = result
+
+    def collect(self):
+        results, self.results = self.results, OrderedDict()
+        return results
+
+    def expired(self, lease):
+        now = time.time()
+        return [shard_id for shard_id, (_, claim_time) in self.claimed.items() if now - claim_time > lease]
+
+    def close(self):
+        self.is_closed = True
+
+    def closed(self):
+        return self.is_closed
+
+
+class DirectoryShardQueue(ShardQueue):
+    """
+    Queue kept in a shared directory, with one JSON file per shard in its pending/, claimed/ and results/ folders.
+    Claiming a shard is an os.rename() from pending/ to claimed/, which only one worker can win. Files are written to a
+    temporary name first and then renamed, so a reader never sees half a file
+    """
+
+    def __init__(self, root):
+        """
+        :param root: Path of the queue directory. Created if it does not exist
+        """
+        self.root = root
+        self.collected = set()
+        for folder in ("pending", "claimed", "results"):
+            os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    def publish(self, shard):
+        self.__write(os.path.join(self.root, "pending", self.__file_name(shard["id"])), shard)
+
+    def claim(self):
+        for file_name in sorted(os.listdir(os.path.join(self.root, "pending"))):
+            if not file_name.endswith(".json"):
+                continue
+            claimed_path = os.path.join(self.root, "claimed", file_name)
+            try:
+                os.rename(os.path.join(self.root, "pending", file_name), claimed_path)
+            except FileNotFoundError:
+                continue  # Claimed by another worker first
+            os.utime(claimed_path)  # Start of the lease
+            with open(claimed_path) as f:
+                return json.load(f)
+        return None
+
+    def release(self, shard_id):
+        file_name = self.__file_name(shard_id)
+        try:
+            os.rename(os.path.join(self.root, "claimed", file_name), os.path.join(self.root, "pending", file_name))
+        except FileNotFoundError:
+            pass  # Completed in the meantime
+
+    def complete(self, shard_id, result):
+        self.__write(os.path.join(self.root, "results", self.__file_name(shard_id)), result)
+        try:
+            os.remove(os.path.join(self.root, "claimed", self.__file_name(shard_id)))
+        except FileNotFoundError:
+            pass  # Released after its lease expired, and maybe claimed again
+
+    def collect(self):
+        results = OrderedDict()
+        for file_name in sorted(os.listdir(os.path.join(self.root, "results"))):
+            if file_name.endswith(".json") and file_name not in self.collected:
+                with open(os.path.join(self.root, "results", file_name)) as f:
+                    result = json.load(f)
+                results[result["id"]] = result
+                self.collected.add(file_name)
+        return results
+
+    def expired(self, lease):
+        now = time.time()
+        shard_ids = []
+        for file_name in sorted(os.listdir(os.path.join(self.root, "claimed"))):
+            try:
+                claim_time = os.path.getmtime(os.path.join(self.root, "claimed", file_name))
+            except FileNotFoundError:
+                continue
+            if file_name.endswith(".json") and now - claim_time > lease:
+                shard_ids.append(int(file_name[:-len(".json")]))
+        return shard_ids
+
+    def close(self):
+        open(os.path.join(self.root, "closed"), "w").close()
+
+    def closed(self):
+        return os.path.exists(os.path.join(self.root, "closed"))
+
+    @staticmethod
+    def __file_name(shard_id):
+        return f"{shard_id:06d}.json"
+
+    @staticmethod
+    def __write(path, data):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, default=lambda o: o.item())
+        os.replace(temp_path, path)
@@ -0,0 +1,138 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from estimator.utils import product
+
+"""
+Surrogate models for the Bayesian hardware search. The Gaussian Process of bayes_opt works on a continuous space (the
+suggestions are then snapped to a valid architecture) and scales cubically with the number of observations. The models
+here work directly on the discrete search space instead: a point is a tuple holding one value index per dimension, eg.
+the SRAM sizes of the meta-architecture, then the subcomponent combination of each meta compound component. They are
+used through discrete_maximize(), which keeps the same init points / iterations budget as the Gaussian Process search
+"""
+
+
+class Surrogate:
+    """
+    Interface of a surrogate model: suggests the next points to evaluate, from the points evaluated so far
+    """
+
+    def __init__(self, dimensions, random_state=10, candidates=1024):
+        """
+        :param dimensions: list of tuples, the possible values of each dimension
+        :param random_state: Seed of the model and of the candidate sampling
+        :param candidates: Number of points sampled (then ranked by the model) per suggestion
+        """
+        self.dimensions = dimensions
+        self.sizes = np.array([len(d) for d in dimensions], dtype=np.int64)
+        self.rng = np.random.RandomState(random_state)
+        self.candidates = candidates
+
+    def sample(self, count):
+        """
+        :param count: Number of points
+        :return: 2D array of random points, one row per point
+        """
+        return (self.rng.random_sample((count, len(self.sizes))) * self.sizes).astype(np.int64)
+
+    def suggest(self, points, targets, batch_size, exclude):
+        """
+        :param points: 2D array of the points evaluated so far
+        :param targets: Array of their targets (higher is better)
+        :param batch_size: Maximum number of points suggested
+        :param exclude: Container of the points (tuples) that must not be suggested
+        :return: list of distinct point tuples, best first. Empty if the model finds no new point
+        """
+        raise NotImplementedError
+
+    def _best_new(self, candidates, acquisition, batch_size, exclude):
+        suggestions = []
+        for row in np.argsort(-acquisition, kind="stable"):
+            point = tuple(int(i) for i in candidates[row])
+            if point not in exclude and point not in suggestions:
+                suggestions.append(point)
+                if len(suggestions) == batch_size:
+                    break
+        return suggestions
+
+
+class RandomForestSurrogate(Surrogate):
+    """
+    Random forest regression of the targets. The acquisition is an upper confidence bound, from the mean and spread of
+    the predictions of the trees. Candidates are random points plus the neighbours (one dimension changed by one step)
+    of the best points found so far
+    """
+
+    def __init__(self, dimensions, random_state=10, candidates=1024, trees=64, kappa=1):
+        super().__init__(dimensions, random_state, candidates)
+        self.trees = trees
+        self.kappa = kappa
+
+    def suggest(self, points, targets, batch_size, exclude):
+        from sklearn.ensemble import RandomForestRegressor
+        forest = RandomForestRegressor(n_estimators=self.trees, random_state=self.rng.randint(2 ** 31 - 1))
+        forest.fit(points, targets)
+        best = points[np.argsort(-targets, kind="stable")[:batch_size]]
+        neighbours = [np.clip(best + step * np.eye(len(self.sizes), dtype=np.int64)[d], 0, self.sizes - 1)
+                      for d in range(len(self.sizes)) for step in (-1, 1)]
+        candidates = np.unique(np.vstack([self.sample(self.candidates)] + neighbours), axis=0)
+        predictions = np.stack([tree.predict(candidates) for tree in forest.estimators_])
+        acquisition = predictions.mean(axis=0) + self.kappa * predictions.std(axis=0)
+        return self._best_new(candidates, acquisition, batch_size, exclude)
+
+
+class TPESurrogate(Surrogate):
+    """
+    Tree-structured Parzen Estimator: the observations are split into the best `gamma` fraction and the rest, and each
+    dimension gets a smoothed categorical distribution for both groups. Candidates are drawn from the distribution of
+    the best points, and ranked by the ratio of the two densities
+    """
+
+    def __init__(self, dimensions, random_state=10, candidates=1024, gamma=0.25):
+        super().__init__(dimensions, random_state, candidates)
+        self.gamma = gamma
+
+    def suggest(self, points, targets, batch_size, exclude):
+        order = np.argsort(-targets, kind="stable")
+        good_num = max(1, math.ceil(self.gamma * len(targets)))
+        good, bad = points[order[:good_num]], points[order[good_num:]]
+        candidates = np.empty((self.candidates, len(self.sizes)), dtype=np.int64)
+        log_ratio = np.zeros(self.candidates)
+        for d, size in enumerate(self.sizes):
+            # Add-one smoothing, so that values not seen yet can still be suggested
+            good_density = (np.bincount(good[:, d], minlength=size) + 1) / (len(good) + size)
+            bad_density = (np.bincount(bad[:, d], minlength=size) + 1) / (len(bad) + size)
+            candidates[:, d] = self.rng.choice(size, self.candidates, p=good_density)
+            log_ratio += np.log(good_density[candidates[:, d]]) - np.log(bad_density[candidates[:, d]])
+        return self._best_new(candidates, log_ratio, batch_size, exclude)
+
+
+SURROGATES = {"rf": RandomForestSurrogate, "tpe": TPESurrogate}
+
+
+def discrete_maximize(evaluate, surrogate: Surrogate, init_points, n_iter, batch_size=1):
+    """
+    Bayesian optimization loop over a discrete space
+    :param evaluate: function(list of point tuples) -> list of targets, in the same order. Evaluates a batch
+    :param surrogate: Surrogate object, which holds the dimensions of the space
+    :param init_points: Number of random points evaluated before the surrogate is used. Evaluated as one batch
+    :param n_iter: Number of points suggested by the surrogate, batch_size at a time
+    :param batch_size: Number of points suggested (and evaluated) per iteration
+    :return: OrderedDict {point: target} of all the evaluated points
+    """
+    space_size = product(int(s) for s in surrogate.sizes)
+    observations = OrderedDict()
+    init_batch = list(OrderedDict.fromkeys(tuple(int(i) for i in p) for p in surrogate.sample(max(init_points, 1))))
+    observations.update(zip(init_batch, evaluate(init_batch)))
+    iteration = 0
+    while iteration < n_iter and len(observations) < space_size:
+        points = np.array(list(observations), dtype=np.int64)
+        targets = np.array(list(observations.values()), dtype=np.float64)
+        batch = surrogate.suggest(points, targets, min(batch_size, n_iter - iteration), observations)
+        if not batch:
+            break
+        observations.update(zip(batch, evaluate(batch)))
+        iteration += len(batch)
+    return observations
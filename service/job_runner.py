@@ -0,0 +1,230 @@
+import json
+import os
+from collections import OrderedDict
+
+from estimator.data_structures.architecture import yaml_arch_factory
+from estimator.data_structures.compound_component import CompoundComponent
+from estimator.data_structures.primitive_component import PrimitiveComponent
+from estimator.estimator import Estimator
+from estimator.input_handler import DEFAULT_DB_PATH, DEFAULT_TABLE
+from estimator.session import SmartSession
+from estimator.utils import read_yaml_file, parse_method_notation
+from mappers.smapper.smapper import Smapper
+
+"""
+The Job Runner executes SMART jobs (estimator, smapper, searcher, compiler) described as dicts, inside one warm
+process. Parsed YAML files, the loaded component libraries and built Architectures are kept between jobs, so that a
+batch of jobs only pays the interpreter + library start-up cost once. Each components folder + IPCL table gets its own
+SmartSession, so jobs using different folders do not reload each other's libraries. Before each job, the loaded folders
+and the IPCL are checked for changes, and only the changed components and the cached Architectures using them are
+reloaded.
+"""
+
+JOB_MODES = ("estimator", "smapper", "searcher", "compiler")
+
+
+def encode_result(result):
+    """
+    Encodes a job result as one JSON line. numpy numbers are converted to their Python equivalent
+    :param result: Result dict, as returned by JobRunner.run_job()
+    :return: JSON string ending with a newline
+    """
+    return json.dumps(result, default=lambda o: o.item() if hasattr(o, "item") else str(o)) + "\n"
+
+
+class JobRunner:
+    """
+    Runs SMART jobs one after another while keeping the IPCL tables, component libraries, YAML files and
+    Architectures warm. A job is a dict with a 'mode' key (one of JOB_MODES) and the file paths for that mode, eg.
+    {"mode": "estimator", "architecture": "...", "operations": "...", "components": "...", "table": "TH2Components"}
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        """
+        :param db_path: Path of the IPCL SQLite database the sessions are opened on
+        """
+        self.db_path = db_path
+        self.yaml_cache = dict()  # (path, mtime) : YAML data
+        self.architecture_cache = dict()  # (arch path, mtime, session key) : Architecture
+        self.sessions = OrderedDict()  # (library, folder, table) : [SmartSession, LibraryWatcher or None]
+        self.hot_reloads = 0
+        self.jobs_run = 0
+        self.cache_counters = {"yaml": [0, 0], "architecture": [0, 0]}  # [hits, misses]
+        self.library_loads = 0
+        self.job_map = {"estimator": self.__run_estimator_job,
+                        "smapper": self.__run_smapper_job,
+                        "searcher": self.__run_searcher_job,
+                        "compiler": self.__run_compiler_job}
+
+    def run_job(self, job: dict):
+        """
+        Runs one job. Errors are caught and reported in the result, so that one bad job does not stop a batch
+        :param job: Job description dict, with a 'mode' key. An optional 'id' is copied into the result
+        :return: Result dict with 'id', 'mode', 'status' ('ok' or 'error'), and either the results or the error message
+        """
+        result = OrderedDict({"id": job.get("id", self.jobs_run), "mode": job.get("mode")})
+        self.jobs_run += 1
+        try:
+            self.check_for_changes()
+            assert job.get("mode") in self.job_map, "Invalid job mode %s. Valid modes: %s" % (job.get("mode"),
+                                                                                              ", ".join(JOB_MODES))
+            result.update(self.job_map[job["mode"]](job))
+            result["status"] = "ok"
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    def read_yaml(self, path):
+        """
+        Reads a YAML file, reusing the parsed data if the file has not been modified since it was last read
+        :param path: Path of the YAML file
+        :return: YAML data as OrderedDict
+        """
+        key = (os.path.abspath(path), os.path.getmtime(path))
+        self.__count("yaml", key in self.yaml_cache)
+        if key not in self.yaml_cache:
+            self.yaml_cache[key] = read_yaml_file(path)
+        return self.yaml_cache[key]
+
+    def get_session(self, library="compound_component", folder=None, table=None):
+        """
+        Gets the session with a (meta) compound components folder loaded on an IPCL table, creating it and its
+        LibraryWatcher the first time
+        :param library: 'compound_component' or 'meta_compound_component'
+        :param folder: Folder containing the components. None means no components, only the IPCL
+        :param table: IPCL database table. None means the default table
+        :return: tuple (session key, SmartSession)
+        """
+        key = (library, os.path.abspath(folder) if folder else None, table if table else DEFAULT_TABLE)
+        if key not in self.sessions:
+            session = SmartSession(self.db_path, key[2])
+            watcher = None
+            if folder:
+                session.load_library(library, folder)
+                watcher = session.watch(library, folder)
+                self.library_loads += 1
+            self.sessions[key] = [session, watcher]
+        return key, self.sessions[key][0]
+
+    def check_for_changes(self):
+        """
+        Hot-reload: checks the loaded component folders and the IPCL for changes. Changed components and their
+        dependents are reloaded into their session's library, and the cached Architectures of that session that use
+        any of them are dropped
+        :return: set of the changed component classes
+        """
+        all_changed_classes = set()
+        for session_key, (session, watcher) in self.sessions.items():
+            changed_classes = watcher.check() if watcher else set()
+            if not changed_classes:
+                continue
+            all_changed_classes.update(changed_classes)
+            stale_keys = [k for k, arch in self.architecture_cache.items()
+                          if k[2] == session_key and self.__uses_classes(arch.component_dict, changed_classes)]
+            for key in stale_keys:
+                self.architecture_cache.pop(key)
+        if all_changed_classes:
+            self.hot_reloads += 1
+        return all_changed_classes
+
+    def get_architecture(self, arch_path, components_folder=None, table=None):
+        """
+        Gets the Architecture for a file path, building it only if it is not already cached
+        :param arch_path: Path to the architecture YAML file
+        :param components_folder: Folder containing the compound components used in the architecture
+        :param table: IPCL database table
+        :return: tuple (SmartSession the architecture was built in, Architecture object)
+        """
+        session_key, session = self.get_session("compound_component", components_folder, table)
+        key = (os.path.abspath(arch_path), os.path.getmtime(arch_path), session_key)
+        self.__count("architecture", key in self.architecture_cache)
+        if key not in self.architecture_cache:
+            self.architecture_cache[key] = yaml_arch_factory(self.read_yaml(arch_path), session)
+        return session, self.architecture_cache[key]
+
+    def get_cache_stats(self):
+        """
+        Statistics of the caches kept warm by this runner, plus the stat caches of the components
+        :return: dict {cache name: {hits, misses, size}}. The component stat caches are per instance, so they report
+        {hits, misses, invalidations} instead
+        """
+        stats = OrderedDict()
+        for name, cache in (("yaml", self.yaml_cache), ("architecture", self.architecture_cache)):
+            hits, misses = self.cache_counters[name]
+            stats[name] = OrderedDict({"hits": hits, "misses": misses, "size": len(cache)})
+        stats["primitive_stat"] = OrderedDict(PrimitiveComponent.stat_cache_counters)
+        stats["compound_stat"] = OrderedDict(CompoundComponent.stat_cache_counters)
+        info = parse_method_notation.cache_info()
+        stats["method_notation"] = OrderedDict({"hits": info.hits, "misses": info.misses, "size": info.currsize})
+        stats["sessions"] = len(self.sessions)
+        stats["library_loads"] = self.library_loads
+        stats["hot_reloads"] = self.hot_reloads
+        stats["jobs_run"] = self.jobs_run
+        return stats
+
+    def __count(self, cache_name, hit):
+        self.cache_counters[cache_name][0 if hit else 1] += 1
+
+    def __uses_classes(self, component_dict, classes):
+        for component in component_dict.values():
+            if component.comp_class in classes:
+                return True
+            if isinstance(component, CompoundComponent) and self.__uses_classes(component.subcomponents, classes):
+                return True
+        return False
+
+    def __run_estimator_job(self, job):
+        _, architecture = self.get_architecture(job["architecture"], job.get("components"), job.get("table"))
+        operations = self.read_yaml(job["operations"])['operations']
+        features = job.get("features", ["energy", "area", "cycle"])
+        estimator = Estimator(architecture, operations)
+        values = estimator.estimate(features, analysis=job.get("analysis", False), out_dir=job.get("out_dir"))
+        return OrderedDict(zip(features, values))
+
+    def __run_smapper_job(self, job):
+        session, architecture = self.get_architecture(job["architecture"], job.get("components"), job.get("table"))
+        sm = Smapper(session, job.get("workers", 1))
+        sm.verify_samples = job.get("verify_samples", 0)
+        sm.prune = job.get("prune", True)
+        sm.batch_size = job.get("batch_size", 1)
+        sm.architecture = architecture
+        sm.set_nn(job["nn"])
+        if len(sm.nn_list) > 1:
+            layer_inputs, score, (energy, area, cycle) = sm.search_network(job.get("algorithm", "bayes"))
+            firmware = OrderedDict({"layers": layer_inputs})
+        else:
+            sm.run_operationalizer()
+            fw_input, score, (energy, area, cycle) = sm.search_firmware(job.get("algorithm", "bayes"))
+            firmware = OrderedDict({"firmware": fw_input})
+        if job.get("out"):
+            sm.write_best_ops(job["out"])
+        return OrderedDict({**firmware, "score": score, "energy": energy, "area": area, "cycle": cycle})
+
+    def __run_searcher_job(self, job):
+        from searcher.searcher import yaml_searcher_factory
+        _, session = self.get_session("meta_compound_component", job["meta_components"], job.get("table"))
+        search = yaml_searcher_factory(job["meta_architecture"], None, job["nn"], session)
+        search.batch_size, search.workers = job.get("batch_size", 1), job.get("workers", 1)
+        search.surrogate = job.get("surrogate", "gp")
+        if job.get("queue_dir"):
+            from searcher.shard_queue import DirectoryShardQueue
+            search.shard_queue = DirectoryShardQueue(job["queue_dir"])
+        search.shard_size = job.get("shard_size", 16)
+        search.checkpoint_path = job.get("checkpoint")
+        out_dir = search.search_combinations(top_solutions_num=job.get("top", 3),
+                                             hw_algorithm=job.get("hw_algorithm", "bayes"),
+                                             fw_algorithm=job.get("fw_algorithm", "bayes"),
+                                             verbose=job.get("verbose", False), resume=job.get("resume", False))
+        solutions = [OrderedDict({"score": score, "firmware": fw, "energy": eac[0], "area": eac[1], "cycle": eac[2],
+                                  "hardware": search.meta_arch.get_config_label(config)})
+                     for score, fw, eac, config in search.top_solutions]
+        return OrderedDict({"out_dir": out_dir, "combinations_searched": search.combinations_searched,
+                            "top_solutions": solutions})
+
+    def __run_compiler_job(self, job):
+        from mappers.compiler.compiler import Compiler
+        comp = Compiler(self.read_yaml(job["nn"]))
+        comp.compile()
+        comp.write_out(job["out"], comment=job.get("comment", False))
+        return OrderedDict({"out": job["out"], "lines": len(comp.compiled_binary)})
@@ -0,0 +1,184 @@
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from estimator.input_handler import database_handler
+from service.job_runner import JobRunner, encode_result
+
+"""
+The SMART Server is a long-lived local estimation service. An asyncio front end accepts JSON-lines requests over a
+Unix domain socket (or a localhost TCP port), and a pool of worker processes runs them. Each worker keeps its own warm
+JobRunner, so architectures, compiled FeatureScripts and stat caches stay resident between requests.
+
+Protocol: one JSON job per line (same format as the batch jobs, see service.job_runner.JobRunner), and one JSON result
+per line, written back as soon as the job completes (use the job 'id' to match results to requests). Two extra modes
+are handled by the front end itself: {"mode": "stats"} returns the server and per-worker cache statistics, and
+{"mode": "shutdown"} stops the server.
+"""
+
+DEFAULT_SOCKET_PATH = "/tmp/smart_server.sock"
+
+_worker_runner = None  # JobRunner of the current worker process
+
+
+def _init_worker():
+    """
+    Initializer of each worker process: opens its own IPCL connection and creates the warm JobRunner
+    :return: None
+    """
+    global _worker_runner
+    database_handler.reconnect()
+    _worker_runner = JobRunner()
+
+
+def _run_worker_job(job):
+    """
+    Runs a job inside a worker process. Anything printed by the modules is sent to stderr
+    :param job: Job description dict
+    :return: tuple (result dict, worker pid, cache stats of the worker)
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        result = _worker_runner.run_job(job)
+    return result, os.getpid(), _worker_runner.get_cache_stats()
+
+
+class SmartServer:
+    """
+    Asyncio front end + process pool back end. Requests from all clients are run concurrently, up to the number of
+    workers in the pool
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, port=None, workers=None):
+        """
+        :param socket_path: Path of the Unix domain socket to listen on. Ignored if a port is given
+        :param port: localhost TCP port to listen on instead of a Unix socket
+        :param workers: Number of worker processes. None means os.cpu_count()
+        """
+        self.socket_path = socket_path
+        self.port = port
+        self.workers = workers if workers else os.cpu_count()
+        self.pool = None
+        self.server = None
+        self.shutdown_event = None
+        self.start_time = None
+        self.requests_served = 0
+        self.requests_in_flight = 0
+        self.mode_counts = OrderedDict()
+        self.worker_stats = OrderedDict()  # worker pid : latest cache stats reported by that worker
+
+    def get_stats(self):
+        """
+        :return: dict of server statistics, including the latest cache statistics reported by each worker
+        """
+        return OrderedDict({"uptime": time.time() - self.start_time if self.start_time else 0,
+                            "workers": self.workers,
+                            "requests_served": self.requests_served,
+                            "requests_in_flight": self.requests_in_flight,
+                            "mode_counts": self.mode_counts,
+                            "worker_cache_stats": {str(pid): stats for pid, stats in self.worker_stats.items()}})
+
+    async def handle_request(self, job):
+        """
+        Runs one request, on the process pool unless it is a front end request (stats, shutdown)
+        :param job: Job description dict
+        :return: Result dict
+        """
+        mode = job.get("mode")
+        self.mode_counts[mode] = self.mode_counts.get(mode, 0) + 1
+        if mode == "stats":
+            return OrderedDict({"id": job.get("id"), "mode": mode, "status": "ok", "stats": self.get_stats()})
+        if mode == "shutdown":
+            self.shutdown_event.set()
+            return OrderedDict({"id": job.get("id"), "mode": mode, "status": "ok"})
+        self.requests_in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, pid, cache_stats = await loop.run_in_executor(self.pool, _run_worker_job, job)
+            self.worker_stats[pid] = cache_stats
+        finally:
+            self.requests_in_flight -= 1
+            self.requests_served += 1
+        return result
+
+    async def handle_client(self, reader, writer):
+        """
+        Reads JSON lines from one client, running each request as its own task so that requests from the same client
+        also run concurrently. Results are written back in completion order
+        """
+        write_lock = asyncio.Lock()
+
+        async def respond(line):
+            try:
+                result = await self.handle_request(json.loads(line))
+            except Exception as e:
+                result = OrderedDict({"id": None, "status": "error", "error": f"{type(e).__name__}: {e}"})
+            async with write_lock:
+                writer.write(encode_result(result).encode())
+                await writer.drain()
+
+        tasks = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                tasks.append(asyncio.ensure_future(respond(line)))
+        await asyncio.gather(*tasks)
+        writer.close()
+
+    async def serve(self):
+        """
+        Starts the worker pool and serves requests until a shutdown request is received
+        :return: None
+        """
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self.shutdown_event = asyncio.Event()
+        # Start all the workers before listening, so that the forked workers do not inherit any client connection
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, os.getpid) for _ in range(self.workers)))
+        self.start_time = time.time()
+        if self.port:
+            self.server = await asyncio.start_server(self.handle_client, "127.0.0.1", self.port)
+            print(f"SMART server listening on 127.0.0.1:{self.port} with {self.workers} workers", file=sys.stderr)
+        else:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self.server = await asyncio.start_unix_server(self.handle_client, self.socket_path)
+            print(f"SMART server listening on {self.socket_path} with {self.workers} workers", file=sys.stderr)
+        try:
+            await self.shutdown_event.wait()
+        finally:
+            self.server.close()
+            self.pool.shutdown()
+            if not self.port and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def run(self):
+        asyncio.run(self.serve())
+
+
+def send_jobs(jobs, socket_path=DEFAULT_SOCKET_PATH, port=None):
+    """
+    Simple blocking client: sends a list of jobs to a running SMART server and waits for all of their results
+    :param jobs: list of job description dicts
+    :param socket_path: Unix socket path of the server. Ignored if a port is given
+    :param port: localhost TCP port of the server
+    :return: list of result dicts, in completion order
+    """
+    if port:
+        client = socket.create_connection(("127.0.0.1", port))
+    else:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(socket_path)
+    with client, client.makefile("rw") as stream:
+        for job in jobs:
+            stream.write(json.dumps(job) + "\n")
+        stream.flush()
+        client.shutdown(socket.SHUT_WR)
+        return [json.loads(line) for line in stream if line.strip()]
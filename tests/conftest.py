@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+"""
+Shared fixtures of the regression tests. The project reads its inputs (project_io, the IPCL database) and writes its
+outputs relative to the main SMART_Project directory, so every test runs from there
+"""
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(REPO_DIR, "tests", "data")
+
+
+@pytest.fixture(autouse=True)
+def repo_dir(monkeypatch):
+    monkeypatch.chdir(REPO_DIR)
+    return REPO_DIR
@@ -0,0 +1,76 @@
+import contextlib
+import io
+
+import pytest
+
+from estimator.estimator import Estimator, estimator_factory
+from estimator.utils import read_yaml_file
+from mappers.smapper.smapper import Smapper
+from searcher.meta_architecture import MetaArchitecture
+
+"""
+Estimations of the list based Component-Operation Matrix against the ones of the original pandas DataFrame, values
+and types: cycles are integers when every idle value is
+"""
+
+# Operations : (energy, area, cycle), recorded with the original Estimator
+BASELINE_ESTIMATIONS = {
+    ("sample", None): (51795923.120469995, 10242261.98, 817),
+    (0, (1, 1, 1)): (13174962128.486399, 1157872.38, 4505600),
+    (0, (2, 11, 2)): (343439925.0432, 1157872.38, 122880),
+    (61, (1, 1, 1)): (1919454124967.5264, 165149440.38, 4505600),
+    (61, (2, 1, 1)): (959727062483.7632, 165149440.38, 2252800),
+    (61, (8, 11, 64)): (3839177185.3648, 165149440.38, 10880),
+}
+
+
+@pytest.fixture(scope="module")
+def meta_arch():
+    with contextlib.redirect_stdout(io.StringIO()):
+        meta_arch = MetaArchitecture(read_yaml_file("project_io/searcher_input/original_arch/meta_architecture.yaml"),
+                                     "project_io/searcher_input/original_arch/meta_components")
+        meta_arch.load_argument_combinations()
+    return meta_arch
+
+
+def estimate(architecture, operations):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Estimator(architecture, operations).estimate(["energy", "area", "cycle"], analysis=False)
+
+
+@pytest.mark.parametrize("case", list(BASELINE_ESTIMATIONS))
+def test_estimations_match_baseline(meta_arch, case):
+    index, param = case
+    if index == "sample":
+        with contextlib.redirect_stdout(io.StringIO()):
+            est = estimator_factory("project_io/estimator_input/sample_architecture.yaml",
+                                    "project_io/estimator_input/operations2.yaml", db_table="TH2Components",
+                                    components_folder="project_io/estimator_input/components/")
+        architecture, operations = est.architecture, est.operation_list
+    else:
+        smapper = Smapper()
+        smapper.architecture = architecture = meta_arch.get_indexed_architecture(index)
+        smapper.set_nn("project_io/searcher_input/neural_network.yaml")
+        with contextlib.redirect_stdout(io.StringIO()):
+            smapper.run_operationalizer()
+        operations = smapper.get_operations_from_param(param)
+    energy, area, cycle = estimate(architecture, operations)
+    expected_energy, expected_area, expected_cycle = BASELINE_ESTIMATIONS[case]
+    assert energy == pytest.approx(expected_energy, rel=1e-12)
+    assert area == pytest.approx(expected_area, rel=1e-12)
+    assert cycle == expected_cycle and isinstance(cycle, int)
+
+
+def test_reports_match_estimate(meta_arch, tmp_path):
+    smapper = Smapper()
+    smapper.architecture = meta_arch.get_indexed_architecture(0)
+    smapper.set_nn("project_io/searcher_input/neural_network.yaml")
+    with contextlib.redirect_stdout(io.StringIO()):
+        smapper.run_operationalizer()
+    estimator = Estimator(smapper.architecture, smapper.get_operations_from_param((2, 11, 2)))
+    reports = estimator.build_reports(["energy", "area", "cycle"])
+    assert tuple(r.total for r in reports.values()) == estimate(smapper.architecture, estimator.operation_list)
+    reports["cycle"].write(str(tmp_path))
+    estimation = (tmp_path / "cycle_estimation.txt").read_text()
+    assert "Total Cycle Estimation: 122880 cycles" in estimation
+    assert ".0 cycles" not in estimation
@@ -0,0 +1,100 @@
+import io
+import contextlib
+import itertools
+import math
+import os
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+from estimator.data_structures.primitive_component import PrimitiveComponent
+from estimator.utils import read_yaml_file
+from searcher.meta_architecture import MetaArchitecture, parse_relation
+from tests.conftest import DATA_DIR
+
+"""
+Constraints of the meta-architecture: parse_relation() against eval(), and the vectorized check_constraints() against
+the constraints checked on every architecture built one by one
+"""
+
+META_COMPONENTS = "project_io/searcher_input/original_arch/meta_components"
+CONSTRAINED_META_ARCH = os.path.join(DATA_DIR, "constrained_meta_architecture.yaml")
+
+
+@pytest.fixture(scope="module")
+def meta_arch():
+    with contextlib.redirect_stdout(io.StringIO()):
+        meta_arch = MetaArchitecture(read_yaml_file(CONSTRAINED_META_ARCH), META_COMPONENTS)
+        meta_arch.load_argument_combinations()
+    return meta_arch
+
+
+def is_feasible(architecture, constraints):
+    """
+    The constraints of constrained_meta_architecture.yaml, checked on a built architecture
+    """
+    components, labels = architecture.component_dict, architecture.config_label
+    area = sum(c.calculate_operation_stat('idle', 'area') for c in components.values())
+    sram_size = sum(c.comp_args["size"] for c in components.values()
+                    if isinstance(c, PrimitiveComponent) and c.comp_class == "sram")
+    return area <= constraints["max_area"] and sram_size <= constraints["max_sram_size"] and \
+        components["data_sram"].comp_args["size"] >= components["sgemm_sram"].comp_args["size"] and \
+        labels["hardware_mac_instances"] * labels["hardware_mac_datasize"] <= 128
+
+
+@pytest.mark.parametrize("relation", ["a.size >= b.size", "a.size * 2 + 1 <= b.size - c", "-a.size < c / 4",
+                                      "1 <= c <= b.size", "a.size == 8 or b.size != 8 and c > 2", "(a.size + c) > 9"])
+def test_parse_relation_matches_eval(relation):
+    check = parse_relation(relation)
+    for a, b, c in itertools.product((1, 8, 64), (1, 8, 1000), (0, 3, 10)):
+        expected = eval(relation, {}, {"a": SimpleNamespace(size=a), "b": SimpleNamespace(size=b), "c": c})
+        assert bool(check({"a": {"size": a}, "b": {"size": b}, "c": c})) == bool(expected)
+    # Vectorized over numpy arrays of values
+    sizes = numpy.array([1, 8, 64, 1000])
+    values = check({"a": {"size": sizes}, "b": {"size": sizes[::-1]}, "c": 3})
+    assert numpy.broadcast_to(values, sizes.shape).tolist() == \
+        [bool(check({"a": {"size": a}, "b": {"size": b}, "c": 3})) for a, b in zip(sizes, sizes[::-1])]
+
+
+@pytest.mark.parametrize("relation", ["__import__('os').system('true')", "a.size.__class__ == 1", "a[0] > 1",
+                                      "'a' < 'b'", "(lambda: 1)() == 1", "a if c else b", "c ** 2 > 1", "True",
+                                      "a.size >=", "open('f')"])
+def test_parse_relation_rejects(relation):
+    with pytest.raises(AssertionError):
+        parse_relation(relation)({"a": {"size": 1}, "b": {"size": 2}, "c": 3})
+
+
+def test_check_constraints_matches_built_architectures(meta_arch):
+    n = meta_arch.count_architectures()
+    feasible = meta_arch.check_constraints(numpy.arange(n))
+    expected = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(n):
+            expected.append(is_feasible(meta_arch.get_indexed_architecture(i), meta_arch.constraints))
+    assert feasible.tolist() == expected
+    assert list(meta_arch.iter_feasible_indices()) == [i for i in range(n) if expected[i]]
+    assert meta_arch.count_feasible_architectures() == sum(expected) > 0
+
+
+def test_nearest_feasible_config(meta_arch):
+    feasible = list(meta_arch.iter_feasible_indices())
+    for index in range(meta_arch.count_architectures()):
+        config = meta_arch.get_indexed_config(index)
+        nearest, distance = meta_arch.nearest_feasible_config(config)
+        if index in feasible:
+            assert (nearest, distance) == (config, 0)
+        else:
+            assert meta_arch.is_feasible(nearest)
+            assert distance > 0 and not math.isinf(distance)
+
+
+def test_check_constraints_leaves_base_architecture():
+    with contextlib.redirect_stdout(io.StringIO()):
+        meta_arch = MetaArchitecture(read_yaml_file(CONSTRAINED_META_ARCH), META_COMPONENTS)
+        meta_arch.load_argument_combinations()
+    components = [c for c in meta_arch.base_arch.component_dict.values() if isinstance(c, PrimitiveComponent)]
+    arguments = [(c.comp_args.version, OrderedDict(c.comp_args)) for c in components]
+    meta_arch.check_constraints(numpy.arange(meta_arch.count_architectures()))
+    assert [(c.comp_args.version, OrderedDict(c.comp_args)) for c in components] == arguments
@@ -0,0 +1,112 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+from estimator.utils import read_yaml_file
+from mappers.smapper.operationalizer import Operationalizer
+from mappers.smapper.smapper import Smapper
+from mappers.smapper.solver import Solver
+from searcher.meta_architecture import MetaArchitecture
+from tests.conftest import DATA_DIR
+
+"""
+Operations maps of the Operationalizer against the ones of the original Operationalizer. Each map is compared by its
+number of firmware candidates and a SHA-256 digest of its JSON (candidates and operations, in order)
+"""
+
+# (architecture, neural network) : (candidates, digest), recorded with the original Operationalizer. Architectures are
+# the mapper_input one, or an index of the original_arch meta-architecture
+BASELINE_OPERATIONS = {
+    ("mapper", "project_io/mapper_input/neural_network.yaml"):
+        (83, "40421c53ca21988ca12da587e0e0217b01792737c37cfd0acca9f3d0eb36e4a4"),
+    ("mapper", "project_io/searcher_input/neural_network.yaml"):
+        (640, "e330d22d5e3e1595873046c7ae27c6aa497960a85ce450a8a089ef2df4264b19"),
+    ("mapper", "project_io/searcher_input/cnn.yaml"):
+        (19, "b74027af6a10c5e15bbd775c301bfa88a3c7828438a60fd4cdde37bcb8f1ddbc"),
+    (0, "project_io/searcher_input/neural_network.yaml"):
+        (366, "0edaabf0f38b7ec519920ee81f52192fba0dfb772d17f0762ab4f229e02add38"),
+    (7, "project_io/searcher_input/neural_network.yaml"):
+        (490, "e0302d12ca6acf1b469c142827b63f33fc94a1c3120e0b99afc2c5f26ba7b417"),
+    (30, "project_io/searcher_input/neural_network.yaml"):
+        (544, "6907bcef6dc0bd35086119f4adc9b012d7fc95e95786746d1e2a3bd1cd3bb7f0"),
+    (61, "project_io/searcher_input/neural_network.yaml"):
+        (546, "018e25129eda3a1dbf78f0702cc7dcfd8f7de02f3e8ce359218697bf42154c26"),
+}
+
+
+def operations_digest(param_op_map):
+    items = [[list(params), operations] for params, operations in param_op_map.items()]
+    return len(items), hashlib.sha256(json.dumps(items).encode()).hexdigest()
+
+
+def create_operations(architecture, nn_path):
+    """
+    :return: param_operations_map of an Operationalizer of the first layer of the neural network
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        smapper = Smapper()
+        smapper.set_nn(nn_path)
+        operationalizer = Operationalizer(architecture, Solver(smapper.nn))
+        operationalizer.create_operations()
+    return operationalizer.param_operations_map
+
+
+@pytest.fixture(scope="module")
+def smapper():
+    with contextlib.redirect_stdout(io.StringIO()):
+        smapper = Smapper()
+        smapper.set_architecture("project_io/mapper_input/architecture.yaml", "project_io/mapper_input/components/",
+                                 "TH2Components")
+    return smapper
+
+
+@pytest.fixture(scope="module")
+def meta_arch():
+    with contextlib.redirect_stdout(io.StringIO()):
+        meta_arch = MetaArchitecture(read_yaml_file("project_io/searcher_input/original_arch/meta_architecture.yaml"),
+                                     "project_io/searcher_input/original_arch/meta_components")
+        meta_arch.load_argument_combinations()
+    return meta_arch
+
+
+@pytest.mark.parametrize("architecture, nn", list(BASELINE_OPERATIONS))
+def test_create_operations_match_baseline(smapper, meta_arch, architecture, nn):
+    arch = smapper.architecture if architecture == "mapper" else meta_arch.get_indexed_architecture(architecture)
+    assert operations_digest(create_operations(arch, nn)) == BASELINE_OPERATIONS[(architecture, nn)]
+
+
+@pytest.mark.parametrize("nn", [nn for architecture, nn in BASELINE_OPERATIONS if architecture == "mapper"])
+def test_lazy_operations_match_baseline(smapper, nn):
+    smapper.set_nn(nn)
+    with contextlib.redirect_stdout(io.StringIO()):
+        smapper.run_operationalizer()
+    assert operations_digest(smapper.param_op_map) == BASELINE_OPERATIONS[("mapper", nn)]
+    # Random access, in any order, builds the same operations
+    eager = create_operations(smapper.architecture, nn)
+    params = list(eager)[::-1]
+    assert [smapper.param_op_map[p] for p in params] == [eager[p] for p in params]
+    assert len(smapper.param_op_map) == len(eager) and all(p in smapper.param_op_map for p in params)
+
+
+@pytest.mark.parametrize("nn", ["project_io/searcher_input/neural_network.yaml",
+                                os.path.join(DATA_DIR, "dnn_without_sgemm.yaml")])
+def test_shared_operations_match_baseline(meta_arch, nn):
+    smapper = Smapper()
+    smapper.set_nn(nn)
+    for index in range(meta_arch.count_architectures()):
+        smapper.architecture = meta_arch.get_indexed_architecture(index)
+        hits = smapper.operations_map_stats["hits"]
+        with contextlib.redirect_stdout(io.StringIO()):
+            smapper.run_operationalizer()
+        digest = operations_digest(smapper.param_op_map)
+        if (index, nn) in BASELINE_OPERATIONS:
+            assert digest == BASELINE_OPERATIONS[(index, nn)]
+        if smapper.operations_map_stats["hits"] > hits or index % 9 == 0:
+            assert digest == operations_digest(create_operations(smapper.architecture, nn))
+    if nn.endswith("dnn_without_sgemm.yaml"):
+        # Architectures that only differ in the sgemm_sram share their operations map
+        assert smapper.operations_map_stats["hits"] > 0
@@ -0,0 +1,104 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+
+import pytest
+
+from mappers.smapper.smapper import Smapper
+from searcher.searcher import yaml_searcher_factory
+from tests.conftest import DATA_DIR
+
+"""
+Searches resumed from a checkpoint against the same searches run without interruption, and searches run on spawned
+workers against the same searches run serially
+"""
+
+NN_PATH = "project_io/searcher_input/neural_network.yaml"
+
+
+def run_search(checkpoint_path, hw_algorithm, resume=False, workers=1, start_method=None, batch_size=1,
+               nn_path=NN_PATH, top_solutions_num=3):
+    """
+    :param start_method: start method of the worker processes, None for the default one
+    :return: tuple (Searcher, top solutions as (score, fw_input, eac, config label))
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        searcher = yaml_searcher_factory("project_io/searcher_input/original_arch/meta_architecture.yaml",
+                                         "project_io/searcher_input/original_arch/meta_components",
+                                         nn_path)
+        searcher.checkpoint_path = checkpoint_path
+        searcher.workers = workers
+        searcher.batch_size = batch_size
+        searcher.session.start_method = start_method
+        try:
+            out_dir = searcher.search_combinations(top_solutions_num, hw_algorithm, "analytical", resume=resume)
+        finally:
+            searcher.session.start_method = None
+    searcher.rank_reports = [open(os.path.join(out_dir, "rank%d" % rank, "%s_estimation.txt" % metric)).read()
+                             for rank in (1, 2, 3) for metric in ("energy", "cycle")]
+    shutil.rmtree(out_dir)
+    return searcher, [(score, dict(fw_input), eac, searcher.meta_arch.get_config_label(config))
+                      for score, fw_input, eac, config in searcher.top_solutions]
+
+
+@pytest.mark.parametrize("hw_algorithm, workers", [("linear", 1), ("linear", 2), ("bayes", 1)])
+def test_resume_from_checkpoint(tmp_path, hw_algorithm, workers):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    uninterrupted, expected = run_search(checkpoint_path, hw_algorithm)
+    with open(checkpoint_path) as f:
+        lines = f.read().splitlines()
+    header, entries = lines[0], lines[1:]
+    assert len(entries) > 2
+    # Interrupted after half of the architectures, in the middle of writing the next one
+    kept = entries[:len(entries) // 2]
+    with open(checkpoint_path, "w") as f:
+        f.write("\n".join([header] + kept + [entries[len(kept)][:10]]))
+    searcher, resumed = run_search(checkpoint_path, hw_algorithm, resume=True, workers=workers)
+    assert resumed == expected
+    assert searcher.rank_reports == uninterrupted.rank_reports
+    assert len(searcher.checkpoint_results) == len(kept)
+    with open(checkpoint_path) as f:
+        resumed_entries = [json.loads(line) for line in f.read().splitlines()[1:]]
+    assert sorted(map(json.dumps, resumed_entries)) == sorted(map(json.dumps, map(json.loads, entries)))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_resume_from_complete_checkpoint(tmp_path, monkeypatch, workers):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    uninterrupted, expected = run_search(checkpoint_path, "linear")
+
+    def run_operationalizer(self):
+        raise AssertionError("The analysis of the top solutions must come from the operations in the checkpoint")
+
+    # Forked analysis workers inherit the patch
+    monkeypatch.setattr(Smapper, "run_operationalizer", run_operationalizer)
+    searcher, resumed = run_search(checkpoint_path, "linear", resume=True, workers=workers)
+    assert resumed == expected
+    assert searcher.rank_reports == uninterrupted.rank_reports
+
+
+@pytest.mark.parametrize("changes", [{"hw_algorithm": "bayes"}, {"top_solutions_num": 2},
+                                     {"nn_path": os.path.join(DATA_DIR, "dnn_without_sgemm.yaml")}])
+def test_resume_other_search(tmp_path, changes):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    run_search(checkpoint_path, "linear")
+    with pytest.raises(AssertionError, match="checkpoint of another search"):
+        run_search(checkpoint_path, **dict({"hw_algorithm": "linear", "resume": True}, **changes))
+
+
+def test_resume_from_moved_input(tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    run_search(checkpoint_path, "linear")
+    with pytest.raises(AssertionError, match="nn_path differ"):
+        run_search(checkpoint_path, "linear", resume=True, nn_path=shutil.copy(NN_PATH, tmp_path))
+
+
+@pytest.mark.parametrize("hw_algorithm, batch_size", [("linear", 1), ("bayes", 2), ("distributed", 1),
+                                                      ("halving", 1)])
+def test_search_on_spawned_workers(hw_algorithm, batch_size):
+    serial, expected = run_search(None, hw_algorithm, batch_size=batch_size)
+    spawned, solutions = run_search(None, hw_algorithm, workers=2, start_method="spawn", batch_size=batch_size)
+    assert solutions == expected
+    assert spawned.rank_reports == serial.rank_reports
@@ -0,0 +1,81 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+from estimator.utils import read_yaml_file
+from mappers.smapper.smapper import Smapper
+from tests.conftest import DATA_DIR
+
+"""
+Firmware searches of the Smapper against the original linear search, and the best operations they leave to
+write_best_ops(). Process pools are also started with spawn, where the Smapper is pickled to the workers
+"""
+
+# Result of the original linear search of the mapper_input architecture and neural network
+BASELINE_SOLUTION = ({'firmware_psum_height': 127, 'firmware_psum_width': 42}, 25.104825059845346,
+                     (36777122881.71324, 225314032.38, 1536240))
+
+
+@pytest.fixture
+def smapper():
+    with contextlib.redirect_stdout(io.StringIO()):
+        smapper = Smapper()
+        smapper.set_architecture("project_io/mapper_input/architecture.yaml", "project_io/mapper_input/components/",
+                                 "TH2Components")
+        smapper.set_nn("project_io/mapper_input/neural_network.yaml")
+        smapper.run_operationalizer()
+    return smapper
+
+
+def check_solution(smapper, solution, tmp_path):
+    fw_input, score, (energy, area, cycle) = solution
+    expected_fw_input, expected_score, (expected_energy, expected_area, expected_cycle) = BASELINE_SOLUTION
+    assert dict(fw_input) == expected_fw_input
+    assert score == pytest.approx(expected_score, rel=1e-12)
+    assert (energy, area) == pytest.approx((expected_energy, expected_area), rel=1e-12)
+    assert cycle == expected_cycle
+    # The operations of the best firmware are the ones written out
+    best_ops = smapper.get_operations_from_param(tuple(fw_input[x] for x in smapper.fw_param_labels))
+    assert smapper.best_ops == best_ops
+    smapper.write_best_ops(str(tmp_path / "ops.yaml"))
+    assert read_yaml_file(str(tmp_path / "ops.yaml")) == best_ops
+
+
+def test_parallel_linear_search_matches_baseline(smapper, tmp_path):
+    smapper.workers, smapper.prune = 2, False
+    check_solution(smapper, smapper.search_firmware("linear"), tmp_path)
+    assert len(smapper.param_cost_map) == len(smapper.param_op_map)
+
+
+def test_analytical_search_matches_baseline(smapper, tmp_path):
+    smapper.verify_samples = 8
+    check_solution(smapper, smapper.search_firmware("analytical"), tmp_path)
+
+
+@pytest.mark.parametrize("prune", [True, False])
+def test_linear_search_matches_baseline(smapper, prune, tmp_path):
+    smapper.prune = prune
+    check_solution(smapper, smapper.search_firmware("linear"), tmp_path)
+    if prune:
+        assert len(smapper.param_cost_map) < len(smapper.param_op_map)
+
+
+def test_search_network_on_spawned_workers():
+    results = []
+    for workers, start_method in [(1, None), (2, "spawn")]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            smapper = Smapper(workers=workers)
+            smapper.set_architecture("project_io/mapper_input/architecture.yaml",
+                                     "project_io/mapper_input/components/", "TH2Components")
+            smapper.set_nn(os.path.join(DATA_DIR, "three_layer_cnn.yaml"))
+        smapper.session.start_method = start_method
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results.append((smapper.search_network("linear"), smapper.best_ops))
+        finally:
+            smapper.session.start_method = None
+    assert results[1] == results[0]
+    solutions, _, _ = results[0][0]
+    assert list(solutions) == ["cnn_1", "cnn_2", "cnn_3"] and solutions["cnn_1"] == solutions["cnn_3"]
@@ -0,0 +1,85 @@
+import itertools
+import math
+
+import pytest
+
+from estimator.utils import NearestPointIndex, ProductSpace, VersionedDict, product
+
+"""
+Helpers of estimator.utils against the code they replaced
+"""
+
+POOLS = [(1, 2, 4), ("a", "b"), (0.5, 8, 16, 32)]
+NUMERIC_POOLS = [(1, 2, 4), (0.5, 8, 16, 32), (64, 1000, 8000)]
+QUERIES = [(0, 0, 0), (3, 12, 4500), (1.5, 24, 4500), (3, 33, 9000), (2.9, 7.9, 531)]
+
+
+def sorted_nearest(query, points):
+    """
+    The original snapping: the first point of the points sorted by their distance
+    """
+    return sorted((math.sqrt(sum((a - b) ** 2 for a, b in zip(query, p))), p) for p in points)[0][1]
+
+
+def test_nearest_point_index_matches_sorted_distances():
+    points = list(itertools.product(*NUMERIC_POOLS))
+    index = NearestPointIndex(points)
+    expected = [sorted_nearest(query, points) for query in QUERIES]
+    assert [index.nearest(query) for query in QUERIES] == expected
+    assert index.nearest_many(QUERIES) == expected
+
+
+def test_product():
+    assert product([]) == 1
+    assert product([3, 4, 5]) == 60
+    assert product(len(p) for p in POOLS) == 24
+
+
+def test_product_space_matches_itertools_product():
+    expected = list(itertools.product(*POOLS))
+    space = ProductSpace(POOLS)
+    assert len(space) == len(expected)
+    assert list(space) == expected
+    assert [space[i] for i in range(len(space))] == expected
+    assert [space.decode(i) for i in range(len(space))] == expected
+    assert [space.index(item) for item in expected] == list(range(len(expected)))
+
+
+def test_product_space_slices_and_shards():
+    expected = list(itertools.product(*POOLS))
+    space = ProductSpace(POOLS)
+    assert list(space[5:17]) == expected[5:17]
+    assert space[5:17].index(expected[9]) == 4
+    with pytest.raises(ValueError):
+        space[5:17].index(expected[3])
+    shards = list(space.shards(7))
+    assert [len(s) for s in shards] == [7, 7, 7, 3]
+    assert [item for shard in shards for item in shard] == expected
+
+
+def test_nested_product_space():
+    space = ProductSpace([ProductSpace(POOLS[:2]), POOLS[2]])
+    expected = list(itertools.product(itertools.product(*POOLS[:2]), POOLS[2]))
+    assert len(space) == len(expected)
+    assert list(space) == expected
+    assert [space[i] for i in range(len(space))] == expected
+
+
+def test_product_space_nearest_matches_sorted_distances():
+    space = ProductSpace(NUMERIC_POOLS)
+    points = list(itertools.product(*NUMERIC_POOLS))
+    assert [space.nearest(query) for query in QUERIES] == [sorted_nearest(query, points) for query in QUERIES]
+
+
+def test_versioned_dict():
+    d = VersionedDict(a=1)
+    version = d.version
+    d["a"] = 1
+    assert d.version is version
+    d["a"] = 1.0  # Same value, another type: a change
+    assert d.version is not version
+    version = d.version
+    d.setdefault("a", 2)
+    assert d.version is version
+    d.pop("a")
+    assert d.version is not version